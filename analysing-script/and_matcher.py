@@ -0,0 +1,151 @@
+"""
+Module responsible with confirming the signsrch AND signatures.
+The elements of an AND signature must all be found within about 3000 bytes. The element offsets are collected
+during the single scan pass and every signature is then confirmed with a sliding window over its element hits.
+"""
+from collections import namedtuple
+
+from signature_database import AND_WINDOW
+
+
+# An AND signature split into its distinct elements
+AndSignature = namedtuple("AndSignature", ["signature_id", "endian", "elements"])
+
+
+def split_elements(data, width):
+    """
+    Function that splits the data of an AND signature into its distinct elements, in order.
+    :param data: The signature bytes.
+    :param width: The element width in bytes.
+    :return: List of element bytes.
+    """
+    elements = []
+    for offset in range(0, len(data) - width + 1, width):
+        element = bytes(data[offset:offset + width])
+        if element not in elements:
+            elements.append(element)
+    return elements
+
+
+def find_windows(element_hits, element_count, window=AND_WINDOW):
+    """
+    Function that finds the windows holding every element of an AND signature.
+    The hits are walked once with two pointers, so the cost is linear in the number of hits.
+    :param element_hits: List of (offset, element index) tuples sorted by offset.
+    :param element_count: The number of distinct elements of the signature.
+    :param window: Optional. The maximum distance between the first and the last element.
+    :return: List of the offsets where the windows start. The windows do not overlap.
+    """
+    return _find_windows(element_hits, element_count, window)[0]
+
+
+def _find_windows(element_hits, element_count, window):
+    """
+    Find the windows holding every element of an AND signature, and where the search starts again after them.
+    :param element_hits: List of (offset, element index) tuples sorted by offset.
+    :param element_count: The number of distinct elements of the signature.
+    :param window: The maximum distance between the first and the last element.
+    :return: Tuple of (list of the offsets where the windows start, index of the first hit still in an open window).
+    """
+    starts = []
+    counts = [0] * element_count
+    covered = 0
+    left = 0
+    for right in range(len(element_hits)):
+        right_offset, right_element = element_hits[right]
+        if counts[right_element] == 0:
+            covered += 1
+        counts[right_element] += 1
+
+        # Drop the hits that fell out of the window
+        while right_offset - element_hits[left][0] >= window:
+            left_element = element_hits[left][1]
+            counts[left_element] -= 1
+            if counts[left_element] == 0:
+                covered -= 1
+            left += 1
+
+        if covered == element_count:
+            # Shrink the window to its first element, report it and start again after it
+            while counts[element_hits[left][1]] > 1:
+                counts[element_hits[left][1]] -= 1
+                left += 1
+            starts.append(element_hits[left][0])
+            counts = [0] * element_count
+            covered = 0
+            left = right + 1
+
+    return starts, left
+
+
+class AndMatcher:
+    """
+    Class that holds the AND signatures of a database and confirms them from the element hits of a scan.
+    """
+
+    def __init__(self, database, window=AND_WINDOW):
+        """
+        Split every AND signature of the database into its elements.
+        :param database: The SignatureDatabase.
+        :param window: Optional. The maximum distance between the elements of a match.
+        """
+        self.window = window
+        self.signatures = {}
+        for signature in database:
+            if not signature.is_and:
+                continue
+            elements = split_elements(signature.data, signature.width)
+            if elements:
+                self.signatures[signature.signature_id] = AndSignature(signature.signature_id, signature.endian,
+                                                                       elements)
+
+    def element_keys(self):
+        """
+        Method that returns the elements to be searched, with the signatures they belong to.
+        :return: Dictionary of element bytes to a tuple of (signature id, element index) tuples.
+        """
+        keys = {}
+        for and_signature in self.signatures.values():
+            for element_index, element in enumerate(and_signature.elements):
+                keys.setdefault(element, []).append((and_signature.signature_id, element_index))
+        return dict((element, tuple(references)) for element, references in keys.items())
+
+    def match(self, element_hits):
+        """
+        Method that confirms the AND signatures from the element hits of a scan.
+        :param element_hits: Dictionary of signature id to the list of (offset, element index) tuples,
+        sorted by offset.
+        :return: List of (signature id, offset, endian) tuples.
+        """
+        matches = []
+        for signature_id, hits in element_hits.items():
+            and_signature = self.signatures[signature_id]
+            if len(hits) < len(and_signature.elements):
+                continue
+            for offset in find_windows(hits, len(and_signature.elements), self.window):
+                matches.append((signature_id, offset, and_signature.endian))
+        return matches
+
+    def confirm(self, element_hits, end):
+        """
+        Method that confirms the AND signatures whose windows are complete, for scans reading the data in order.
+        The hits used by the windows found, and the hits too far behind the end to be in a window with the hits
+        still to come, are removed from the element hits, so they only hold the hits of the open windows.
+        :param element_hits: Dictionary of signature id to the list of (offset, element index) tuples, sorted by
+        offset, holding the hits not confirmed yet. It is updated in place.
+        :param end: The offset the next hits start at.
+        :return: List of (signature id, offset, endian) tuples.
+        """
+        matches = []
+        for signature_id, hits in list(element_hits.items()):
+            and_signature = self.signatures[signature_id]
+            starts, resume = _find_windows(hits, len(and_signature.elements), self.window)
+            for offset in starts:
+                matches.append((signature_id, offset, and_signature.endian))
+            # A hit this far behind is dropped by the windows of every hit to come
+            pending = [hit for hit in hits[resume:] if end - hit[0] < self.window]
+            if pending:
+                element_hits[signature_id] = pending
+            else:
+                del element_hits[signature_id]
+        return matches
@@ -0,0 +1,658 @@
+"""
+Module responsible with extracting the binaries from the downloaded archives.
+It replaces extracting_script.ps1, which starts WinRAR for every archive and waits for every WinRAR process to exit
+before the next one. The archives are spread across a pool of processes and read in process, the zip archives with
+zipfile, the tar archives with tarfile and the gz and xz files with gzip and lzma. The other formats, 7z and rar
+among them, are handed to an archiver command. Only the .bin members are extracted, like WinRAR x -ad does, under a
+directory named after the archive, and the encrypted members are tried with every configured password. The binaries
+can be added to the content addressed store instead, which keeps every distinct content once.
+The members are read into memory, the large ones into a memory mapped temporary file, so they can also be handed to
+the analysers without being extracted. The archives found inside an archive are expanded in turn, each distinct one
+once, within limits on the depth, the expanded size and the number of members, so an archive bomb cannot stall the
+extraction.
+"""
+from multiprocessing import Manager, Pool
+
+import gzip
+import hashlib
+import lzma
+import mmap
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tarfile
+import tempfile
+import zipfile
+import zlib
+
+from binary_store import BinaryStore
+
+
+DEFAULT_BINS_PATH = "bins"
+# The password extracting_script.ps1 gives WinRAR
+DEFAULT_PASSWORDS = ["password"]
+BINARY_EXTENSION = ".bin"
+# The larger members are spooled to a temporary file instead of being kept in memory
+SPOOL_LIMIT = 64 * 1024 * 1024
+# The limits of the expansion of an archive and of the archives nested in it
+DEFAULT_MAX_DEPTH = 4
+DEFAULT_MAX_SIZE = 4 * 1024 * 1024 * 1024
+DEFAULT_MAX_MEMBERS = 10000
+_COPY_BLOCK = 1 << 20
+
+# The archiver commands which can extract the formats read by no module, {password} is empty for no password and
+# {members} is a file listing the members to be extracted
+ARCHIVER_COMMANDS = {
+    "7z": ["7z", "x", "-y", "-bd", "-scsUTF-8", "-p{password}", "-o{destination}", "{archive}", "@{members}"],
+    "bsdtar": ["bsdtar", "-x", "-f", "{archive}", "-C", "{destination}", "--passphrase", "{password}",
+               "-T", "{members}"],
+}
+# The archiver commands listing the members with their size, before anything is extracted
+ARCHIVER_LIST_COMMANDS = {
+    "7z": ["7z", "l", "-slt", "-p{password}", "{archive}"],
+    "bsdtar": ["bsdtar", "-t", "-v", "-f", "{archive}", "--passphrase", "{password}"],
+}
+# The options giving the password which are left out, with the password, when there is none. bsdtar refuses an empty
+# passphrase, while 7z takes an empty -p for no password and does not prompt for one
+ARCHIVER_PASSWORD_OPTIONS = {"bsdtar": "--passphrase"}
+DEFAULT_ARCHIVER = "7z"
+# The seconds an archiver command may run before it is killed
+ARCHIVER_TIMEOUT = 10 * 60
+# The bsdtar -tv lines, like ls -l: mode, links, owner, group, size, date and name
+_BSDTAR_LISTING = re.compile(r"^(\S)\S*\s+\d+\s+\S+\s+\S+\s+(\d+)\s+\S+\s+\d+\s+\S+ (.*)$")
+
+# The errors of an encrypted member read with a wrong password
+_PASSWORD_ERRORS = (RuntimeError, zipfile.BadZipFile, zlib.error)
+# The zip compression methods zipfile reads, the archives with other ones, like Deflate64 or the WinZip AES
+# encryption, are handed to the archiver command
+_ZIP_METHODS = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA)
+
+
+class ArchiveError(Exception):
+    """
+    Exception raised when an archive cannot be read.
+    """
+    pass
+
+
+class ExpansionBudget:
+    """
+    Class that counts what the expansion of an archive, nested archives included, has read against its limits.
+    """
+
+    def __init__(self, max_depth=DEFAULT_MAX_DEPTH, max_size=DEFAULT_MAX_SIZE, max_members=DEFAULT_MAX_MEMBERS):
+        """
+        :param max_depth: Optional. The deepest nested archive expanded, 0 expands only the archive itself.
+        :param max_size: Optional. The number of bytes the members may expand to.
+        :param max_members: Optional. The number of members which may be listed.
+        """
+        self.max_depth = max_depth
+        self.max_size = max_size
+        self.max_members = max_members
+        self.size = 0
+        self.members = 0
+        # The nested archives left out, too deep or already expanded
+        self.skipped = []
+        # The (name, name of the first one) tuples of the nested archives already expanded
+        self.copies = []
+
+    def charge(self, size):
+        """
+        Method that counts the bytes read from a member.
+        :param size: The number of bytes.
+        """
+        self.size += size
+        if self.size > self.max_size:
+            raise ArchiveError("The archive expands to more than %d bytes" % self.max_size)
+
+    def count_member(self):
+        """
+        Method that counts a listed member.
+        """
+        self.members += 1
+        if self.members > self.max_members:
+            raise ArchiveError("The archive holds more than %d members" % self.max_members)
+
+
+def is_binary(name):
+    """
+    Function that tells whether an archive member is a binary, like the *.bin mask given to WinRAR.
+    :param name: The name of the member.
+    :return: True when its extension is .bin, in any case.
+    """
+    return name.lower().endswith(BINARY_EXTENSION)
+
+
+def is_archive(name):
+    """
+    Function that tells whether a file or an archive member is an archive which can be expanded.
+    :param name: The name of the file or of the member.
+    :return: True when its extension has a backend.
+    """
+    return os.path.splitext(name)[1].lower() in ARCHIVE_BACKENDS
+
+
+def _is_wanted(name):
+    """
+    Tell whether a member is read, the binaries and the nested archives are.
+    :param name: The name of the member.
+    :return: True when the member is a binary or an archive.
+    """
+    return is_binary(name) or is_archive(name)
+
+
+def _read_member(member, budget):
+    """
+    Read an archive member, into memory when it is small and into a memory mapped temporary file otherwise.
+    :param member: The file object of the member.
+    :param budget: The ExpansionBudget charged with the bytes read.
+    :return: bytes or a mmap.
+    """
+    # A member is never read past the budget, however much it claims to hold
+    data = member.read(min(SPOOL_LIMIT, budget.max_size - budget.size) + 1)
+    budget.charge(len(data))
+    if len(data) <= SPOOL_LIMIT:
+        return data
+    with tempfile.TemporaryFile() as spool:
+        spool.write(data)
+        block = member.read(_COPY_BLOCK)
+        while block:
+            budget.charge(len(block))
+            spool.write(block)
+            block = member.read(_COPY_BLOCK)
+        spool.flush()
+        # The map keeps the temporary file until it is closed
+        return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _release(buffer):
+    """
+    Close the buffer of a member once it was used.
+    :param buffer: bytes or a mmap.
+    """
+    if isinstance(buffer, mmap.mmap):
+        buffer.close()
+
+
+def _zip_members(archive_path, passwords, archiver, budget):
+    """
+    Read the binaries of a zip archive, an encrypted member is read with every password until its CRC matches.
+    An archive holding binaries compressed with a method zipfile does not read is extracted by the archiver instead.
+    :param archive_path: Path to the archive.
+    :param passwords: List of the passwords to be tried.
+    :param archiver: The archiver command used for the compression methods zipfile does not read.
+    :param budget: The ExpansionBudget of the archive.
+    :return: Generator of (member name, member buffer) tuples.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        infos = archive.infolist()
+        if all(info.compress_type in _ZIP_METHODS for info in infos if _is_wanted(info.filename)):
+            for info in infos:
+                budget.count_member()
+                if info.filename.endswith("/") or not _is_wanted(info.filename):
+                    continue
+                encrypted = info.flag_bits & 0x1
+                for password in passwords if encrypted else [None]:
+                    try:
+                        # The CRC of the member is checked once it is read to its end
+                        with archive.open(info, pwd=password.encode("utf-8") if encrypted else None) as member:
+                            data = _read_member(member, budget)
+                        break
+                    except _PASSWORD_ERRORS:
+                        if not encrypted:
+                            raise
+                else:
+                    raise ArchiveError("No password opens %s" % info.filename)
+                try:
+                    yield info.filename, data
+                finally:
+                    _release(data)
+            return
+    yield from _archiver_members(archive_path, passwords, archiver, budget)
+
+
+def _tar_members(archive_path, passwords, archiver, budget):
+    """
+    Read the binaries of a tar archive, compressed or not.
+    :param archive_path: Path to the archive.
+    :param passwords: Unused, tar archives are not encrypted.
+    :param archiver: Unused, the tar archives are read in process.
+    :param budget: The ExpansionBudget of the archive.
+    :return: Generator of (member name, member buffer) tuples.
+    """
+    with tarfile.open(archive_path, "r:*") as archive:
+        for member in archive:
+            budget.count_member()
+            if not member.isfile() or not _is_wanted(member.name):
+                # The members left out are still decompressed to reach the next ones
+                budget.charge(member.size)
+                continue
+            data = _read_member(archive.extractfile(member), budget)
+            try:
+                yield member.name, data
+            finally:
+                _release(data)
+
+
+def _compressed_members(archive_path, passwords, archiver, budget):
+    """
+    Read a gz or xz file, which holds either a tar archive or a single file named after the compressed file.
+    :param archive_path: Path to the compressed file.
+    :param passwords: Unused, gz and xz files are not encrypted.
+    :param archiver: Unused, the compressed files are read in process.
+    :param budget: The ExpansionBudget of the archive.
+    :return: Generator of (member name, member buffer) tuples.
+    """
+    if tarfile.is_tarfile(archive_path):
+        yield from _tar_members(archive_path, passwords, archiver, budget)
+        return
+    name, extension = os.path.splitext(os.path.basename(archive_path))
+    budget.count_member()
+    if _is_wanted(name):
+        with (gzip.open if extension.lower() == ".gz" else lzma.open)(archive_path) as compressed:
+            data = _read_member(compressed, budget)
+        try:
+            yield name, data
+        finally:
+            _release(data)
+
+
+def _run_archiver(commands, archiver, password, **fields):
+    """
+    Run an archiver command, killing it when it runs longer than ARCHIVER_TIMEOUT.
+    :param commands: ARCHIVER_COMMANDS or ARCHIVER_LIST_COMMANDS.
+    :param archiver: The name of the archiver command.
+    :param password: The password, empty for no password.
+    :param fields: The other fields of the command, like archive and destination.
+    :return: subprocess.CompletedProcess.
+    """
+    command = [argument.format(password=password, **fields) for argument in commands[archiver]]
+    option = ARCHIVER_PASSWORD_OPTIONS.get(archiver)
+    if not password and option in command:
+        del command[command.index(option):command.index(option) + 2]
+    try:
+        # The command has no terminal to prompt for a password on
+        return subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              timeout=ARCHIVER_TIMEOUT, start_new_session=True)
+    except subprocess.TimeoutExpired:
+        raise ArchiveError("%s ran longer than %d seconds" % (archiver, ARCHIVER_TIMEOUT))
+    except OSError as e:
+        raise ArchiveError("Cannot run %s - %s" % (archiver, e))
+
+
+def _parse_listing(archiver, listing):
+    """
+    Parse the members listed by an archiver command.
+    :param archiver: The name of the archiver command.
+    :param listing: The output of the command.
+    :return: List of (member name, size, True for a file) tuples.
+    """
+    members = []
+    if archiver == "7z":
+        # The archive itself is described before the line of dashes, then every member in a block of fields
+        for block in listing.replace("\r\n", "\n").partition("\n----------\n")[2].split("\n\n"):
+            fields = dict(line.split(" = ", 1) for line in block.splitlines() if " = " in line)
+            if "Path" in fields:
+                is_file = fields.get("Folder") != "+" and not fields.get("Attributes", "").startswith("D")
+                members.append((fields["Path"], int(fields.get("Size") or 0), is_file))
+    else:
+        for line in listing.splitlines():
+            match = _BSDTAR_LISTING.match(line)
+            if match:
+                members.append((match.group(3), int(match.group(2)), match.group(1) == "-"))
+    return members
+
+
+def _archiver_members(archive_path, passwords, archiver, budget):
+    """
+    Extract the binaries and the nested archives of an archive with an archiver command into a temporary directory
+    and read them. The archive is listed first, its members are counted and the size of the ones extracted is
+    checked against the budget before anything is written. The passwords are tried in turn until the commands
+    succeed.
+    :param archive_path: Path to the archive.
+    :param passwords: List of the passwords to be tried.
+    :param archiver: The name of the archiver command, a key of ARCHIVER_COMMANDS.
+    :param budget: The ExpansionBudget of the archive.
+    :return: Generator of (member name, member buffer) tuples.
+    """
+    archive_path = os.path.abspath(archive_path)
+    error = ""
+    for password in passwords or [""]:
+        completed = _run_archiver(ARCHIVER_LIST_COMMANDS, archiver, password, archive=archive_path)
+        if completed.returncode == 0:
+            break
+        error = completed.stderr.decode("utf-8", "replace").strip()
+    else:
+        raise ArchiveError("%s failed - %s" % (archiver, error))
+
+    wanted = []
+    wanted_size = 0
+    for name, size, is_file in _parse_listing(archiver, completed.stdout.decode("utf-8", "replace")):
+        budget.count_member()
+        if is_file and _is_wanted(name):
+            wanted.append(name)
+            wanted_size += size
+    if budget.size + wanted_size > budget.max_size:
+        raise ArchiveError("The archive expands to more than %d bytes" % budget.max_size)
+    if not wanted:
+        return
+
+    with tempfile.TemporaryDirectory() as destination:
+        # Only the members listed are extracted, the archiver reads their names from a file
+        members_path = os.path.join(destination, "members.lst")
+        with open(members_path, "w", encoding="utf-8") as members:
+            members.write("\n".join(wanted) + "\n")
+        extracted_path = os.path.join(destination, "members")
+        os.mkdir(extracted_path)
+        # The names may be listed without a password while the members are encrypted
+        for password in passwords or [""]:
+            completed = _run_archiver(ARCHIVER_COMMANDS, archiver, password, archive=archive_path,
+                                      destination=extracted_path, members=members_path)
+            if completed.returncode == 0:
+                break
+            error = completed.stderr.decode("utf-8", "replace").strip()
+        else:
+            raise ArchiveError("%s failed - %s" % (archiver, error))
+
+        for root, _, files in os.walk(extracted_path):
+            for file in sorted(files):
+                if _is_wanted(file):
+                    file_path = os.path.join(root, file)
+                    with open(file_path, "rb") as member:
+                        data = _read_member(member, budget)
+                    try:
+                        yield os.path.relpath(file_path, extracted_path).replace(os.sep, "/"), data
+                    finally:
+                        _release(data)
+
+
+# The archive extensions of extracting_script.ps1 and the function reading each of them
+ARCHIVE_BACKENDS = {
+    ".zip": _zip_members,
+    ".jar": _zip_members,
+    ".tar": _tar_members,
+    ".tgz": _tar_members,
+    ".gz": _compressed_members,
+    ".xz": _compressed_members,
+    ".7z": _archiver_members,
+    ".rar": _archiver_members,
+    ".cab": _archiver_members,
+    ".arj": _archiver_members,
+    ".lzh": _archiver_members,
+    ".lha": _archiver_members,
+    ".ace": _archiver_members,
+    ".iso": _archiver_members,
+    ".z": _archiver_members,
+}
+
+
+def _backend_members(archive_path, passwords, archiver, budget):
+    """
+    Read the binaries and the nested archives of an archive with the backend of its extension.
+    :param archive_path: Path to the archive.
+    :param passwords: List of the passwords tried on the encrypted members.
+    :param archiver: The archiver command used for the formats read by no module.
+    :param budget: The ExpansionBudget of the archive.
+    :return: Generator of (member name, member buffer) tuples.
+    """
+    backend = ARCHIVE_BACKENDS.get(os.path.splitext(archive_path)[1].lower())
+    if backend is None:
+        raise ArchiveError("Unknown archive format")
+    try:
+        yield from backend(archive_path, passwords, archiver, budget)
+    except (tarfile.TarError, zipfile.BadZipFile, lzma.LZMAError, EOFError, zlib.error, NotImplementedError) as e:
+        # zipfile raises NotImplementedError for the compression methods and the encryptions it does not read
+        raise ArchiveError(e)
+
+
+def archive_members(archive_path, passwords=DEFAULT_PASSWORDS, archiver=DEFAULT_ARCHIVER, budget=None, seen=None,
+                    depth=0, label=None):
+    """
+    Function that reads the binaries of an archive and of the archives nested in it.
+    A nested archive is written to a temporary file and expanded in turn, its binaries are named after the path of
+    the nested archive, like inner.zip/firmware.bin. The nested archives deeper than the budget allows or with the
+    same content as one expanded before are left out and listed in the budget.
+    The buffer of a member is bytes or a mmap, which is closed when the next member is read.
+    :param archive_path: Path to the archive.
+    :param passwords: Optional. List of the passwords tried on the encrypted members.
+    :param archiver: Optional. The archiver command used for the formats read by no module.
+    :param budget: Optional. The ExpansionBudget of the archive, the default limits by default.
+    :param seen: Optional. Dictionary of the SHA-256 digests of the nested archives expanded to their names, it may
+    be shared by several processes.
+    :param depth: Optional. The nesting depth of the archive.
+    :param label: Optional. The name of the archive in the skipped list, its path by default.
+    :return: Generator of (member name, member buffer) tuples.
+    """
+    if budget is None:
+        budget = ExpansionBudget()
+    if seen is None:
+        seen = {}
+    for member_name, data in _backend_members(archive_path, passwords, archiver, budget):
+        if not is_archive(member_name):
+            yield member_name, data
+            continue
+        name = "%s/%s" % (label or archive_path, member_name)
+        if depth >= budget.max_depth:
+            budget.skipped.append("%s is nested too deep" % name)
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        # setdefault is a single call, so two processes cannot both expand the same archive
+        first_name = seen.setdefault(digest, name)
+        if first_name != name:
+            budget.skipped.append("%s is a copy of %s" % (name, first_name))
+            budget.copies.append((name, first_name))
+            continue
+        with tempfile.TemporaryDirectory() as nested_path:
+            # The nested archive keeps its name, the extension chooses its backend
+            nested_archive = os.path.join(nested_path, os.path.basename(member_name.replace("\\", "/")))
+            with open(nested_archive, "wb") as nested:
+                nested.write(data)
+            for nested_name, nested_data in archive_members(nested_archive, passwords, archiver, budget, seen,
+                                                            depth + 1, name):
+                yield "%s/%s" % (member_name, nested_name), nested_data
+
+
+def member_path(bins_path, archive_path, member_name):
+    """
+    Function that returns the path a member is extracted to, like WinRAR x -ad, under a directory named after the
+    archive. The members cannot be written outside of it.
+    :param bins_path: The directory where the binaries are extracted.
+    :param archive_path: Path to the archive.
+    :param member_name: The name of the member in the archive.
+    :return: The path of the extracted member.
+    """
+    parts = [part for part in member_name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    archive_name = os.path.splitext(os.path.basename(archive_path))[0]
+    return os.path.join(bins_path, archive_name, *parts)
+
+
+def write_member(bins_path, archive_path, member_name, data):
+    """
+    Function that writes an extracted member.
+    :param bins_path: The directory where the binaries are extracted.
+    :param archive_path: Path to the archive.
+    :param member_name: The name of the member in the archive.
+    :param data: The buffer of the member.
+    :return: The path of the extracted member.
+    """
+    binary_path = member_path(bins_path, archive_path, member_name)
+    os.makedirs(os.path.dirname(binary_path), exist_ok=True)
+    # The workers may extract archives named alike, every one writes its own file and the last one wins
+    part_path = "%s.%d.part" % (binary_path, os.getpid())
+    with open(part_path, "wb") as binary:
+        binary.write(data)
+    os.replace(part_path, binary_path)
+    return binary_path
+
+
+def extract_archive(arguments):
+    """
+    Function run by the workers, it extracts the binaries of an archive and of the archives nested in it.
+    :param arguments: Tuple of (archive path, bins path, passwords, archiver, tuple of the budget limits, dictionary of
+    the nested archives expanded, store path or None).
+    :return: Tuple of (archive path, list of the extracted paths or of the digests of the stored contents, list of the
+    nested archives left out, list of the (name, name of the first one) tuples of the copies of the nested archives,
+    error message or None).
+    """
+    archive_path, bins_path, passwords, archiver, limits, seen, store_path = arguments
+    budget = ExpansionBudget(*limits)
+    extracted = []
+    store = BinaryStore(store_path) if store_path is not None else None
+    try:
+        for member_name, data in archive_members(archive_path, passwords, archiver, budget, seen):
+            if store is not None:
+                extracted.append(store.add_data(data, "%s/%s" % (archive_path, member_name))[0])
+            else:
+                extracted.append(write_member(bins_path, archive_path, member_name, data))
+    except (ArchiveError, OSError, sqlite3.Error) as e:
+        return archive_path, extracted, budget.skipped, budget.copies, "%s" % e
+    finally:
+        if store is not None:
+            store.close()
+    return archive_path, extracted, budget.skipped, budget.copies, None
+
+
+def find_archives(path):
+    """
+    Function that finds the archives under a directory, the largest first.
+    :param path: The directory to be walked.
+    :return: List of archive paths.
+    """
+    archives = []
+    for root, _, files in os.walk(path):
+        for file in files:
+            if os.path.splitext(file)[1].lower() in ARCHIVE_BACKENDS:
+                archive_path = os.path.join(root, file)
+                archives.append((os.path.getsize(archive_path), archive_path))
+    archives.sort(key=lambda archive: (-archive[0], archive[1]))
+    return [archive_path for _, archive_path in archives]
+
+
+def copy_binaries(source_path, bins_path, store=None):
+    """
+    Function that copies the binaries found under a directory to the bins directory, like the first step of
+    extracting_script.ps1, or adds them to the store.
+    :param source_path: The directory to be walked.
+    :param bins_path: The directory where the binaries are copied.
+    :param store: Optional. The BinaryStore the binaries are added to instead.
+    :return: The number of binaries copied.
+    """
+    copied = 0
+    for root, _, files in os.walk(source_path):
+        for file in files:
+            if is_binary(file):
+                try:
+                    if store is not None:
+                        store.add_file(os.path.join(root, file))
+                    else:
+                        shutil.copy2(os.path.join(root, file), os.path.join(bins_path, file))
+                    copied += 1
+                except (OSError, sqlite3.Error) as e:
+                    print("[ERROR]: An error occurred - %s" % e)
+    return copied
+
+
+def extract_archives(source_path, bins_path=DEFAULT_BINS_PATH, passwords=DEFAULT_PASSWORDS,
+                     archiver=DEFAULT_ARCHIVER, processes=None, limits=(DEFAULT_MAX_DEPTH, DEFAULT_MAX_SIZE,
+                                                                        DEFAULT_MAX_MEMBERS), store_path=None):
+    """
+    Function that copies the binaries and extracts the binaries of the archives found under a directory.
+    :param source_path: The directory holding the downloaded data.
+    :param bins_path: Optional. The directory where the binaries are written.
+    :param passwords: Optional. List of the passwords tried on the encrypted archives.
+    :param archiver: Optional. The archiver command used for the formats read by no module.
+    :param processes: Optional. The number of processes, defaults to the number of cores.
+    :param limits: Optional. Tuple of (depth, size, members) limits of every archive, see ExpansionBudget.
+    :param store_path: Optional. The directory of the content addressed store the binaries are added to instead of
+    the bins directory.
+    :return: Tuple of (number of binaries copied, number of binaries extracted, number of archives which failed).
+    """
+    print("[INFO]: STEP 1 - copying existing binaries")
+    if store_path is not None:
+        with BinaryStore(store_path) as store:
+            copied = copy_binaries(source_path, bins_path, store)
+    else:
+        os.makedirs(bins_path, exist_ok=True)
+        copied = copy_binaries(source_path, bins_path)
+
+    print("[INFO]: STEP 2 - extracting binaries")
+    archives = find_archives(source_path)
+    extracted = 0
+    failed = 0
+    copies = []
+    # The nested archives expanded by all the workers
+    with Manager() as manager, Pool(processes) as pool:
+        seen = manager.dict()
+        for archive_path, binary_paths, skipped, archive_copies, error in pool.imap_unordered(
+                extract_archive, [(archive_path, bins_path, passwords, archiver, limits, seen, store_path)
+                                  for archive_path in archives]):
+            extracted += len(binary_paths)
+            copies.extend(archive_copies)
+            for message in skipped:
+                print("[INFO]: Skipped %s" % message)
+            if error is None:
+                print("[INFO]: Extracted %d binaries from %s" % (len(binary_paths), archive_path))
+            else:
+                failed += 1
+                print("[ERROR]: An error occurred for %s - %s" % (archive_path, error))
+
+    if store_path is not None and copies:
+        # The members of a copy are named after the members of the first one, once all of them are stored. A copy may
+        # hold copies in turn, so the names are added until none is missing
+        with BinaryStore(store_path) as store:
+            while sum(store.add_aliases(first_name, name) for name, first_name in copies):
+                pass
+    return copied, extracted, failed
+
+
+if __name__ == "__main__":
+
+    # Extract the binaries of the archives under the source path, with optional passwords and archiver
+    arguments = sys.argv[1:]
+    extraction_passwords = []
+    extraction_archiver = DEFAULT_ARCHIVER
+    process_count = None
+    expansion_limits = [DEFAULT_MAX_DEPTH, DEFAULT_MAX_SIZE, DEFAULT_MAX_MEMBERS]
+    binary_store_path = None
+    while len(arguments) > 1 and arguments[0] in ("-p", "-a", "-j", "-d", "-s", "-n", "-c"):
+        if arguments[0] == "-p":
+            extraction_passwords.append(arguments[1])
+        elif arguments[0] == "-a":
+            extraction_archiver = arguments[1]
+        elif arguments[0] == "-j":
+            process_count = int(arguments[1])
+        elif arguments[0] == "-d":
+            expansion_limits[0] = int(arguments[1])
+        elif arguments[0] == "-s":
+            expansion_limits[1] = int(arguments[1]) * 1024 * 1024
+        elif arguments[0] == "-c":
+            binary_store_path = arguments[1]
+        else:
+            expansion_limits[2] = int(arguments[1])
+        arguments = arguments[2:]
+
+    if len(arguments) not in (1, 2) or extraction_archiver not in ARCHIVER_COMMANDS:
+        print("Usage: %s [-p PASSWORD] ... [-a %s] [-j PROCESSES] [-d DEPTH] [-s SIZE IN MB] [-n MEMBERS] "
+              "[-c STORE PATH] [SOURCE PATH] [BINS PATH]" % (sys.argv[0], "|".join(sorted(ARCHIVER_COMMANDS))))
+        exit(1)
+
+    if not os.path.isdir(arguments[0]):
+        print("[ERROR]: %s path does not exist" % arguments[0])
+        exit(1)
+
+    try:
+        binaries_copied, binaries_extracted, archives_failed = extract_archives(
+            arguments[0], *arguments[1:], passwords=extraction_passwords or DEFAULT_PASSWORDS,
+            archiver=extraction_archiver, processes=process_count, limits=tuple(expansion_limits),
+            store_path=binary_store_path)
+        print("Copied %d binaries, extracted %d binaries, %d archives failed" %
+              (binaries_copied, binaries_extracted, archives_failed))
+    except sqlite3.Error as e:
+        print("A store error occurred - %s" % e)
+        exit(1)
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
+        exit(1)
@@ -0,0 +1,85 @@
+"""
+Module responsible with benchmarking the signature scanner on the largest binaries of the corpus.
+For every binary the full scan time is printed, together with the time and the element hits of the AND matcher.
+"""
+import mmap
+import os
+import sys
+import time
+
+from signature_database import load_database, SignatureFileError
+from signature_scanner import SignatureScanner
+
+
+DEFAULT_BINARY_COUNT = 5
+
+
+def find_largest_binaries(path, count):
+    """
+    Function that finds the largest .bin files under a directory.
+    :param path: The directory to be walked.
+    :param count: The number of binaries to be returned.
+    :return: List of (size, path) tuples, largest first.
+    """
+    binaries = []
+    for root, _, files in os.walk(path):
+        for file in files:
+            if file.endswith(".bin"):
+                binary_path = os.path.join(root, file)
+                binaries.append((os.path.getsize(binary_path), binary_path))
+    binaries.sort(reverse=True)
+    return binaries[:count]
+
+
+def benchmark_binary(scanner, binary_path):
+    """
+    Function that scans a binary and times the scan and the AND matcher.
+    :param scanner: The SignatureScanner.
+    :param binary_path: Path to the binary.
+    :return: Tuple of (scan seconds, AND matcher seconds, AND element hits, hits).
+    """
+    with open(binary_path, "rb") as binary:
+        if os.fstat(binary.fileno()).st_size == 0:
+            return 0.0, 0.0, 0, []
+        with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+            start = time.perf_counter()
+            hits, element_hits = scanner.search(mapped_binary)
+            search_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            hits.extend(scanner.and_matcher.match(element_hits))
+            and_time = time.perf_counter() - start
+
+    return search_time + and_time, and_time, sum(len(element_hit) for element_hit in element_hits.values()), hits
+
+
+if __name__ == "__main__":
+
+    # Benchmark the scanner on the largest binaries of the given directory
+    if len(sys.argv) < 2:
+        print("Usage: %s [PATH] [COUNT]" % sys.argv[0])
+        exit(1)
+    binary_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BINARY_COUNT
+
+    try:
+        start_time = time.perf_counter()
+        signature_database = load_database()
+        print("Database loaded in %.3f s" % (time.perf_counter() - start_time))
+        start_time = time.perf_counter()
+        signature_scanner = SignatureScanner(signature_database)
+        print("Scanner built in %.3f s" % (time.perf_counter() - start_time))
+    except SignatureFileError as e:
+        print("A signature file error occurred - %s" % e)
+        exit(1)
+
+    try:
+        for binary_size, binary_file in find_largest_binaries(sys.argv[1], binary_count):
+            scan_seconds, and_seconds, element_count, found_hits = benchmark_binary(signature_scanner, binary_file)
+            megabytes = binary_size / float(1 << 20)
+            print("%s" % binary_file)
+            print("  size %.2f MB, scan %.3f s (%.2f MB/s), %d hits" %
+                  (megabytes, scan_seconds, megabytes / scan_seconds if scan_seconds else 0.0, len(found_hits)))
+            print("  AND matcher %.3f s over %d element hits" % (and_seconds, element_count))
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
+        exit(1)
@@ -0,0 +1,271 @@
+"""
+Module responsible with the content addressed store of the binaries.
+Copy-Binaries copies every binary flat into the bins directory, so the binaries named alike in different topics
+overwrite each other and the same dump is copied once for every place it was downloaded to. The store keeps every
+distinct content once, under its SHA-256 digest, in directories sharded by the first bytes of the digest, and an
+index of the names and of the places, the provenance, every content was found under. The scanners walk the objects
+directory and see every content once, and trees of hard links named after the provenance are made on demand.
+"""
+import datetime
+import fnmatch
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+
+from result_cache import file_digests
+
+
+DEFAULT_STORE_PATH = "store"
+OBJECTS_DIRECTORY = "objects"
+# The objects keep the extension the scanners look for
+OBJECT_EXTENSION = ".bin"
+_INDEX_FILE = "index.sqlite"
+# The workers of a pool share the index, a writer waits this many seconds for the others
+_LOCK_TIMEOUT = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    sha256 TEXT PRIMARY KEY,
+    md5 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    added_time TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS names (
+    source TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    sha256 TEXT NOT NULL REFERENCES objects (sha256),
+    added_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS names_sha256 ON names (sha256);
+CREATE INDEX IF NOT EXISTS names_name ON names (name);
+"""
+
+
+def _source_parts(source):
+    """
+    Split a provenance into the parts of a relative path, without the empty, the current and the parent parts.
+    :param source: The provenance, like downloads/topic/archive.zip/firmware.bin.
+    :return: List of the parts.
+    """
+    return [part.replace(":", "") for part in source.replace("\\", "/").split("/")
+            if part not in ("", ".", "..") and part.replace(":", "")]
+
+
+class BinaryStore:
+    """
+    Class that adds the binaries to the store, finds them by name and makes the alias trees.
+    """
+
+    def __init__(self, store_path=DEFAULT_STORE_PATH):
+        """
+        Open the store, creating it when missing.
+        :param store_path: Optional. The directory of the store.
+        """
+        self.store_path = store_path
+        os.makedirs(os.path.join(store_path, OBJECTS_DIRECTORY), exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(store_path, _INDEX_FILE), timeout=_LOCK_TIMEOUT)
+        # The readers do not wait for the writers
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def object_path(self, sha256):
+        """
+        Method that returns the path of a content in the store.
+        :param sha256: The SHA-256 digest of the content.
+        :return: The path, like store/objects/ab/cd/abcd...bin.
+        """
+        return os.path.join(self.store_path, OBJECTS_DIRECTORY, sha256[:2], sha256[2:4], sha256 + OBJECT_EXTENSION)
+
+    def _add(self, sha256, md5, size, source, write):
+        """
+        Add a content to the store when it is missing and record its provenance.
+        :param sha256: The SHA-256 digest of the content.
+        :param md5: The MD5 digest of the content.
+        :param size: The size of the content.
+        :param source: The provenance of the content.
+        :param write: Function writing the content to the path it is given.
+        :return: True when the content was new.
+        """
+        object_path = self.object_path(sha256)
+        added = not os.path.exists(object_path)
+        if added:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            # The workers may add the same content, every one writes its own file and they are all alike
+            part_path = "%s.%d.part" % (object_path, os.getpid())
+            write(part_path)
+            os.replace(part_path, object_path)
+        added_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._connection:
+            self._connection.execute("INSERT OR IGNORE INTO objects VALUES (?, ?, ?, ?)",
+                                     (sha256, md5, size, added_time))
+            # A provenance holds the content it was last added with
+            self._connection.execute("INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?)",
+                                     (source, _source_parts(source)[-1], sha256, added_time))
+        return added
+
+    def add_file(self, binary_path, source=None):
+        """
+        Method that adds a binary to the store.
+        :param binary_path: Path to the binary.
+        :param source: Optional. The provenance of the binary, its path by default.
+        :return: Tuple of (SHA-256 digest, True when the content was new).
+        """
+        sha256, md5 = file_digests(binary_path)
+        added = self._add(sha256, md5, os.path.getsize(binary_path), source or binary_path,
+                          lambda part_path: shutil.copyfile(binary_path, part_path))
+        return sha256, added
+
+    def add_data(self, data, source):
+        """
+        Method that adds a content read from an archive to the store.
+        :param data: The buffer of the content, bytes or a mmap.
+        :param source: The provenance of the content, like downloads/archive.zip/firmware.bin.
+        :return: Tuple of (SHA-256 digest, True when the content was new).
+        """
+        def write(part_path):
+            with open(part_path, "wb") as binary:
+                binary.write(data)
+
+        sha256 = hashlib.sha256(data).hexdigest()
+        added = self._add(sha256, hashlib.md5(data).hexdigest(), len(data), source, write)
+        return sha256, added
+
+    def add_aliases(self, source, alias):
+        """
+        Method that records the contents found under a provenance under another one too, like the members of a copy
+        of a nested archive, which is not expanded again.
+        :param source: The provenance, like downloads/archive.zip/inner.zip.
+        :param alias: The other provenance, like downloads/archive.zip/copy/inner.zip.
+        :return: The number of provenances added or changed.
+        """
+        prefix = source + "/"
+        added_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._connection:
+            return self._connection.execute(
+                "INSERT OR REPLACE INTO names SELECT ? || substr(source, ?), name, sha256, ? FROM names AS member "
+                "WHERE substr(source, 1, ?) = ? AND NOT EXISTS (SELECT 1 FROM names WHERE source = "
+                "? || substr(member.source, ?) AND sha256 = member.sha256)",
+                (alias, len(source) + 1, added_time, len(prefix), prefix, alias, len(source) + 1)).rowcount
+
+    def sources(self, sha256):
+        """
+        Method that returns the provenances of a content.
+        :param sha256: The SHA-256 digest of the content.
+        :return: Sorted list of the provenances.
+        """
+        return [row[0] for row in self._connection.execute("SELECT source FROM names WHERE sha256 = ? ORDER BY source",
+                                                           (sha256,))]
+
+    def find(self, pattern="*"):
+        """
+        Method that finds the binaries by name.
+        :param pattern: Optional. Pattern of the names, like *ecu*.bin, ignoring the case.
+        :return: List of (SHA-256 digest, provenance) tuples sorted by provenance.
+        """
+        return [(sha256, source) for sha256, source, name in self._connection.execute(
+            "SELECT sha256, source, name FROM names ORDER BY source") if fnmatch.fnmatch(name.lower(), pattern.lower())]
+
+    def statistics(self):
+        """
+        Method that counts the contents and the provenances of the store.
+        :return: Tuple of (number of contents, size of the contents, number of provenances, size of the provenances).
+        """
+        contents, content_size = self._connection.execute("SELECT count(*), total(size) FROM objects").fetchone()
+        names, name_size = self._connection.execute("SELECT count(*), total(size) FROM names "
+                                                    "JOIN objects USING (sha256)").fetchone()
+        return contents, int(content_size), names, int(name_size)
+
+    def link_tree(self, alias_path, pattern="*"):
+        """
+        Method that makes a tree of hard links to the contents, named after their provenance. The contents are copied
+        when the tree is on another file system.
+        :param alias_path: The directory of the tree.
+        :param pattern: Optional. Pattern of the names of the binaries linked, like *ecu*.bin, ignoring the case.
+        :return: The number of links made.
+        """
+        linked = 0
+        for sha256, source in self.find(pattern):
+            link_path = os.path.join(alias_path, *_source_parts(source))
+            object_path = self.object_path(sha256)
+            if os.path.exists(link_path):
+                if os.path.samefile(link_path, object_path):
+                    continue
+                os.remove(link_path)
+            os.makedirs(os.path.dirname(link_path), exist_ok=True)
+            try:
+                os.link(object_path, link_path)
+            except OSError:
+                shutil.copy2(object_path, link_path)
+            linked += 1
+        return linked
+
+    def close(self):
+        """
+        Method that closes the store.
+        """
+        self._connection.close()
+
+
+def add_binaries(source_path, store_path=DEFAULT_STORE_PATH):
+    """
+    Function that adds the binaries found under a directory to the store.
+    :param source_path: The directory to be walked.
+    :param store_path: Optional. The directory of the store.
+    :return: Tuple of (number of binaries found, number of contents added).
+    """
+    found = 0
+    added = 0
+    with BinaryStore(store_path) as store:
+        for root, _, files in os.walk(source_path):
+            for file in sorted(files):
+                if file.lower().endswith(OBJECT_EXTENSION):
+                    found += 1
+                    added += store.add_file(os.path.join(root, file))[1]
+    return found, added
+
+
+if __name__ == "__main__":
+
+    # Add the binaries of a directory, make an alias tree, find the binaries by name or print the statistics
+    arguments = sys.argv[1:]
+    binary_store_path = DEFAULT_STORE_PATH
+    if len(arguments) > 1 and arguments[0] == "-s":
+        binary_store_path = arguments[1]
+        arguments = arguments[2:]
+
+    if not arguments or (arguments[0], len(arguments)) not in (("add", 2), ("link", 2), ("link", 3), ("find", 1),
+                                                                ("find", 2), ("stats", 1)):
+        print("Usage: %s [-s STORE PATH] add [SOURCE PATH]" % sys.argv[0])
+        print("       %s [-s STORE PATH] link [ALIAS PATH] [PATTERN]" % sys.argv[0])
+        print("       %s [-s STORE PATH] find [PATTERN]" % sys.argv[0])
+        print("       %s [-s STORE PATH] stats" % sys.argv[0])
+        exit(1)
+
+    try:
+        if arguments[0] == "add":
+            print("Found %d binaries, added %d contents" % add_binaries(arguments[1], binary_store_path))
+            exit(0)
+
+        with BinaryStore(binary_store_path) as binary_store:
+            if arguments[0] == "link":
+                print("Linked %d binaries" % binary_store.link_tree(*arguments[1:]))
+            elif arguments[0] == "find":
+                for found_sha256, found_source in binary_store.find(*arguments[1:]):
+                    print("%s %s" % (found_sha256, found_source))
+            else:
+                print("Number of contents: %d (%d bytes)\nNumber of binaries: %d (%d bytes)" %
+                      binary_store.statistics())
+    except sqlite3.Error as e:
+        print("A store error occurred - %s" % e)
+        exit(1)
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
+        exit(1)
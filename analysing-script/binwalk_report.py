@@ -0,0 +1,146 @@
+"""
+Module responsible with merging the .walkdat reports into results/binwalk_results.dat.
+It replaces binwalk_create_report.ps1, which reads every report twice, once to count the binaries with signatures and
+once to append them. Here every report is read once, the directories are read in parallel and the merged reports are
+streamed to a temporary file, which follows the header once all the reports were counted. The output holds the same
+bytes the PowerShell script writes.
+"""
+from multiprocessing import Pool
+
+import os
+import shutil
+import sys
+
+
+REPORT_EXTENSION = ".walkdat"
+DEFAULT_RESULTS_FILE = os.path.join("results", "binwalk_results.dat")
+# A report without signatures has 8 lines, the header, the column titles and the empty lines around them
+MIN_REPORT_LINES = 8
+# The directories are handed to the workers in groups of this size
+_CHUNK_SIZE = 16
+# The merged reports are written in blocks of this size
+_WRITE_BUFFER = 1 << 20
+
+
+def _name_key(name):
+    """
+    Sort key of the names, Windows lists the entries of a directory ordered by their upper case names.
+    :param name: The name of the entry.
+    :return: The key.
+    """
+    return name.upper()
+
+
+def find_report_directories(path, extension=REPORT_EXTENSION):
+    """
+    Function that walks a directory tree in the order of Get-ChildItem -Include -Recurse and finds the reports.
+    The subdirectories of a directory are walked first, in name order, and its own reports come after them.
+    :param path: The directory to be walked.
+    :param extension: Optional. The extension of the reports.
+    :return: List of lists of report paths, one list for every directory holding reports.
+    """
+    directories = []
+    # Every directory is pushed a second time, below its subdirectories, to collect its reports after them
+    pending = [(path, False)]
+    while pending:
+        directory, walked = pending.pop()
+        if walked:
+            directories.append(directory)
+            continue
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: _name_key(entry.name))
+        except OSError as e:
+            print("Error for %s - %s" % (directory, e))
+            continue
+        reports = [entry.path for entry in entries if entry.name.lower().endswith(extension) and entry.is_file()]
+        pending.append((reports, True))
+        pending.extend(reversed([(entry.path, False) for entry in entries if entry.is_dir(follow_symlinks=False)]))
+    return [reports for reports in directories if reports]
+
+
+def merge_reports(report_paths):
+    """
+    Function run by the workers, it reads the reports of a directory once.
+    :param report_paths: List of report paths.
+    :return: Tuple of (number of reports, number of reports with signatures, bytes of the reports with signatures,
+    list of the reports which could not be read).
+    """
+    with_signatures = 0
+    merged = []
+    errors = []
+    for report_path in report_paths:
+        try:
+            # Like Get-Content, a last line break does not start a line
+            with open(report_path, "rb") as report:
+                lines = report.read().splitlines()
+        except OSError:
+            errors.append(report_path)
+            continue
+        if len(lines) > MIN_REPORT_LINES:
+            with_signatures += 1
+            merged.append(b"\n".join(lines) + b"\n")
+    return len(report_paths), with_signatures, b"".join(merged), errors
+
+
+def create_report(source_path, results_path=DEFAULT_RESULTS_FILE, processes=None):
+    """
+    Function that merges all the reports under a directory into the results file.
+    :param source_path: The directory holding the reports.
+    :param results_path: Optional. The results file, it is replaced.
+    :param processes: Optional. The number of processes, defaults to the number of cores.
+    :return: Tuple of (number of binaries, number of binaries with signatures).
+    """
+    results_directory = os.path.dirname(results_path)
+    if results_directory:
+        os.makedirs(results_directory, exist_ok=True)
+
+    binaries = 0
+    with_signatures = 0
+    body_path = "%s.tmp" % results_path
+    try:
+        with open(body_path, "wb", buffering=_WRITE_BUFFER) as body:
+            with Pool(processes) as pool:
+                # The directories are merged in parallel and written back in the walking order
+                for reports, reports_with_signatures, merged, errors in pool.imap(
+                        merge_reports, find_report_directories(source_path), _CHUNK_SIZE):
+                    binaries += reports
+                    with_signatures += reports_with_signatures
+                    body.write(merged)
+                    for error_path in errors:
+                        print("Error for %s" % error_path)
+
+        with open(results_path, "wb") as results:
+            results.write(b"Number of binaries: %d\n" % binaries)
+            results.write(b"Number of binaries with signatures: %d\n" % with_signatures)
+            with open(body_path, "rb") as body:
+                shutil.copyfileobj(body, results, _WRITE_BUFFER)
+    finally:
+        if os.path.exists(body_path):
+            os.remove(body_path)
+    return binaries, with_signatures
+
+
+if __name__ == "__main__":
+
+    # Merge the reports found under the source path
+    arguments = sys.argv[1:]
+    process_count = None
+    if len(arguments) > 1 and arguments[0] == "-j":
+        process_count = int(arguments[1])
+        arguments = arguments[2:]
+
+    if len(arguments) not in (1, 2):
+        print("Usage: %s [-j PROCESSES] [SOURCE PATH] [RESULTS FILE]" % sys.argv[0])
+        exit(1)
+
+    if not os.path.isdir(arguments[0]):
+        print("Base path does not exist!")
+        exit(1)
+
+    try:
+        binaries_count, binaries_with_signatures = create_report(*arguments, processes=process_count)
+        print("Number of binaries: %d" % binaries_count)
+        print("Number of binaries with signatures: %d" % binaries_with_signatures)
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
+        exit(1)
@@ -0,0 +1,340 @@
+"""
+Module responsible with running the binwalk signature scan over buffers.
+The binwalk magic files are loaded once and the buffers are scanned directly with the binwalk magic engine, so the
+data does not have to come from a file binwalk opens itself. The results go through the checks of the binwalk
+Signature module: the invalid results and the ones whose size or jump goes past the end of the file are dropped, the
+results inside the data a signature jumps over are skipped, and a signature repeated many times is shown once.
+The files themselves can also be scanned by the binwalk Signature module, a batch of files at a time.
+"""
+from collections import namedtuple
+
+import datetime
+import hashlib
+import mmap
+import os
+import sys
+
+import binwalk
+import binwalk.core.compat
+import binwalk.core.magic
+import binwalk.core.settings
+
+from region_map import load_region_map
+
+
+# Bump it when the results change, the cached results of older versions are then not used
+BINWALK_SCANNER_VERSION = 2
+# Bump it when the results of the binwalk Signature module are read differently
+BINWALK_MODULE_VERSION = 1
+# Binwalk scans its files in blocks and peeks this many bytes past every block
+BINWALK_OVERLAP = 8 * 1024
+
+# A signature found by binwalk
+BinwalkResult = namedtuple("BinwalkResult", ["offset", "description"])
+
+
+def format_result(result):
+    """
+    Function that formats a result the way binwalk prints it in the .walkdat reports.
+    :param result: The BinwalkResult.
+    :return: String holding the decimal offset, the hexadecimal offset and the description.
+    """
+    return "%-14d%-16s%s" % (result.offset, "0x%X" % result.offset, result.description)
+
+
+def signature_name(description):
+    """
+    Function that returns the name of the binwalk signature which produced a description.
+    :param description: The description of a result, like "CRC32 polynomial table, little endian".
+    :return: The part of the description before the first comma.
+    """
+    return description.split(",", 1)[0].strip()
+
+
+def default_magic_files():
+    """
+    Function that returns the magic files binwalk loads.
+    :return: List of paths to the user and the system magic files.
+    """
+    settings = binwalk.core.settings.Settings()
+    return settings.user.magic + settings.system.magic
+
+
+def binwalk_version(magic_files=None):
+    """
+    Function that returns the version of the results, which depend on the scanner and on the magic files.
+    :param magic_files: Optional. List of magic files, defaults to the ones binwalk loads.
+    :return: String holding the scanner version and the digest of the magic files.
+    """
+    return "%d.%s" % (BINWALK_SCANNER_VERSION, _magic_digest(magic_files))
+
+
+def binwalk_module_version(magic_files=None):
+    """
+    Function that returns the version of the results of the binwalk Signature module, which are kept apart from the
+    results of the scanner.
+    :param magic_files: Optional. List of magic files, defaults to the ones binwalk loads.
+    :return: String holding the module version and the digest of the magic files.
+    """
+    return "module.%d.%s" % (BINWALK_MODULE_VERSION, _magic_digest(magic_files))
+
+
+def _magic_digest(magic_files=None):
+    """
+    Function that digests the magic files.
+    :param magic_files: Optional. List of magic files, defaults to the ones binwalk loads.
+    :return: The SHA-1 digest of the magic files, in hexadecimal.
+    """
+    magic_digest = hashlib.sha1()
+    for magic_file in magic_files if magic_files is not None else default_magic_files():
+        with open(magic_file, "rb") as magic:
+            magic_digest.update(magic.read())
+    return magic_digest.hexdigest()
+
+
+def module_scan(binary_paths):
+    """
+    Function that scans binaries with the Signature module of binwalk itself, which loads the magic files once for
+    all of them and checks, skips and shows the results the way the binwalk command does.
+    :param binary_paths: List of paths to the binaries.
+    :return: Tuple of the number of signatures loaded, None if no binary was scanned, and of the dictionary of the
+    absolute paths of the binaries to their lists of BinwalkResult sorted by offset.
+    """
+    signature_count = None
+    results = {os.path.abspath(binary_path): [] for binary_path in binary_paths}
+    if not binary_paths:
+        return signature_count, results
+    for module in binwalk.scan(*binary_paths, signature=True, quiet=True):
+        if module.name != "Signature":
+            continue
+        magic = getattr(module, "magic", None)
+        if magic is not None:
+            signature_count = len(magic.signatures)
+        for result in module.results:
+            # The results binwalk does not print, like the repeats of a signature shown once, are not logged either
+            if result.valid and getattr(result, "display", True):
+                results[os.path.abspath(result.file.path)].append(BinwalkResult(result.offset, result.description))
+    for binary_results in results.values():
+        binary_results.sort(key=lambda result: result.offset)
+    return signature_count, results
+
+
+def write_walkdat(binary_path, md5, signature_count, results, log_path=None):
+    """
+    Function that writes the .walkdat log of a binary.
+    :param binary_path: Path to the binary.
+    :param md5: The MD5 digest of the binary, in hexadecimal.
+    :param signature_count: The number of binwalk signatures loaded.
+    :param results: List of BinwalkResult found in the binary.
+    :param log_path: Optional. Path to the log, the binary path followed by .walkdat by default.
+    """
+    lines = walkdat_report(binary_path, md5, signature_count, results)
+    with open(log_path or binary_path + ".walkdat", "w", encoding="latin-1", errors="replace") as log:
+        log.write("\n".join(lines) + "\n")
+
+
+def walkdat_report(binary_path, md5, signature_count, results, scan_time=None):
+    """
+    Function that builds the log binwalk writes with --log and --verbose, which the .walkdat files hold.
+    The log starts and ends with an empty line, so a log without results has 8 lines and the report script only keeps
+    the longer ones.
+    :param binary_path: Path to the binary.
+    :param md5: The MD5 digest of the binary, in hexadecimal.
+    :param signature_count: The number of binwalk signatures loaded.
+    :param results: List of BinwalkResult found in the binary.
+    :param scan_time: Optional. The datetime of the scan, now by default.
+    :return: List of report lines.
+    """
+    if scan_time is None:
+        scan_time = datetime.datetime.now()
+    lines = ["",
+             "Scan Time:     %s" % scan_time.strftime("%Y-%m-%d %H:%M:%S"),
+             "Target File:   %s" % binary_path,
+             "MD5 Checksum:  %s" % md5,
+             "Signatures:    %d" % signature_count,
+             "DECIMAL       HEXADECIMAL     DESCRIPTION",
+             "-" * 80]
+    lines.extend(format_result(result) for result in results)
+    lines.append("")
+    return lines
+
+
+class BinwalkScanner:
+    """
+    Class that scans buffers and files with the binwalk signatures.
+    """
+
+    def __init__(self, magic_files=None):
+        """
+        Load the binwalk magic files.
+        :param magic_files: Optional. List of magic files, defaults to the ones binwalk loads.
+        """
+        if magic_files is None:
+            magic_files = default_magic_files()
+        self.magic_files = magic_files
+        self.version = binwalk_version(magic_files)
+        self._magic = binwalk.core.magic.Magic()
+        for magic_file in magic_files:
+            self._magic.load(magic_file)
+        # The offset the scan resumes at after a jump, and the id of the signature shown once while it repeats
+        self._resume_offset = 0
+        self._one_of_many = None
+
+    @property
+    def signature_count(self):
+        """
+        The number of binwalk signatures loaded, printed in the .walkdat logs.
+        """
+        return len(self._magic.signatures)
+
+    def reset(self):
+        """
+        Method that forgets the signatures binwalk shows only once per file and the jumps, it is called before every
+        new file.
+        """
+        self._magic.reset()
+        self._resume_offset = 0
+        self._one_of_many = None
+
+    def _is_shown(self, result, offset, size):
+        """
+        Check a result the way the binwalk Signature module does and follow its jump.
+        :param result: The result of the binwalk magic engine.
+        :param offset: The offset of the result in the file.
+        :param size: The size of the file.
+        :return: True when binwalk shows the result.
+        """
+        if offset < self._resume_offset:
+            return False
+        jump = getattr(result, "jump", 0)
+        if not result.valid or not result.description or offset + getattr(result, "size", 0) > size or \
+                offset + jump > size:
+            return False
+        if jump > 0:
+            self._resume_offset = offset + jump
+        # The signatures repeating a bunch of times, like the JFFS2 nodes, are shown once until another one is found
+        signature_id = getattr(result, "id", None)
+        if self._one_of_many is not None and signature_id == self._one_of_many:
+            return False
+        self._one_of_many = signature_id if getattr(result, "many", False) else None
+        return True
+
+    def scan(self, buffer, length=None, base=0, size=None):
+        """
+        Method that scans a buffer with the binwalk signatures.
+        :param buffer: A bytes like object, a memoryview or a mmap.
+        :param length: Optional. Only the signatures starting before this offset are reported, the rest of the
+        buffer is only read by the signatures which need it.
+        :param base: Optional. The offset of the buffer in the file, added to the reported offsets.
+        :param size: Optional. The size of the file, the results whose size or jump goes past it are dropped. The
+        buffer ends the file by default.
+        :return: List of BinwalkResult sorted by offset.
+        """
+        if length is None:
+            length = len(buffer)
+        if size is None:
+            size = base + len(buffer)
+        data = binwalk.core.compat.bytes2str(bytes(buffer))
+        results = []
+        for result in sorted(self._magic.scan(data, length), key=lambda result: result.offset):
+            offset = base + result.offset + getattr(result, "adjust", 0)
+            if result.offset < length and self._is_shown(result, offset, size):
+                results.append(BinwalkResult(offset, result.description))
+        return results
+
+    def scan_regions(self, buffer, regions):
+        """
+        Method that scans the regions of a buffer with the binwalk signatures.
+        Only the signatures starting in the regions are searched, but they may read past them.
+        :param buffer: A bytes like object or a mmap.
+        :param regions: List of (start, end) regions, sorted and not overlapping, like the data regions of a RegionMap.
+        :return: List of BinwalkResult sorted by offset.
+        """
+        results = []
+        with memoryview(buffer) as view:
+            for start, end in regions:
+                with view[start:min(end + BINWALK_OVERLAP, len(view))] as window:
+                    results.extend(self.scan(window, end - start, start, len(view)))
+        return results
+
+    def scan_file(self, binary_path, skip_padding=True):
+        """
+        Method that memory maps a binary and scans it with the binwalk signatures.
+        :param binary_path: Path to the binary.
+        :param skip_padding: Optional. False to scan the padding runs of the binary too.
+        :return: List of BinwalkResult sorted by offset.
+        """
+        self.reset()
+        with open(binary_path, "rb") as binary:
+            if os.fstat(binary.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+                if not skip_padding:
+                    return self.scan(mapped_binary)
+                return self.scan_regions(mapped_binary, load_region_map(binary_path, mapped_binary).data_regions())
+
+    def log_file(self, binary_path, log_path=None, cache=None):
+        """
+        Method that scans a binary and writes its .walkdat log, the binary is read once for both the scan and the
+        digests of the log and of the cache.
+        :param binary_path: Path to the binary.
+        :param log_path: Optional. Path to the log, the binary path followed by .walkdat by default.
+        :param cache: Optional. The ResultCache, a content already scanned by this version is not scanned again.
+        :return: List of BinwalkResult sorted by offset.
+        """
+        with open(binary_path, "rb") as binary:
+            if os.fstat(binary.fileno()).st_size == 0:
+                return self.log_mapped(binary_path, b"", hashlib.sha256().hexdigest(), hashlib.md5().hexdigest(),
+                                       log_path, cache)
+            with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+                return self.log_mapped(binary_path, mapped_binary, hashlib.sha256(mapped_binary).hexdigest(),
+                                       hashlib.md5(mapped_binary).hexdigest(), log_path, cache)
+
+    def log_mapped(self, binary_path, buffer, sha256, md5, log_path=None, cache=None):
+        """
+        Method that scans a binary already mapped and writes its .walkdat log.
+        :param binary_path: Path to the binary, its padding map is cached for it.
+        :param buffer: The mmap of the binary.
+        :param sha256: The SHA-256 digest of the binary, in hexadecimal.
+        :param md5: The MD5 digest of the binary, in hexadecimal.
+        :param log_path: Optional. Path to the log, the binary path followed by .walkdat by default.
+        :param cache: Optional. The ResultCache, a content already scanned by this version is not scanned again.
+        :return: List of BinwalkResult sorted by offset.
+        """
+        self.reset()
+        results = None
+        if cache is not None:
+            cached = cache.get(sha256, "binwalk", self.version)
+            if cached is not None:
+                results = [BinwalkResult(*result) for result in cached]
+        if results is None:
+            results = []
+            if len(buffer):
+                results = self.scan_regions(buffer, load_region_map(binary_path, buffer).data_regions())
+            if cache is not None:
+                cache.put(sha256, "binwalk", self.version, results)
+        if cache is not None:
+            cache.add_alias(sha256, binary_path)
+
+        write_walkdat(binary_path, md5, self.signature_count, results, log_path)
+        return results
+
+
+if __name__ == "__main__":
+
+    # Scan the given binaries and print the results like binwalk does
+    if len(sys.argv) < 2:
+        print("Usage: %s [BINARY] ... [BINARY]" % sys.argv[0])
+        exit(1)
+
+    scanner = BinwalkScanner()
+    for binary_file in sys.argv[1:]:
+        try:
+            print("Target File:   %s" % binary_file)
+            print("DECIMAL       HEXADECIMAL     DESCRIPTION")
+            print("-" * 80)
+            for found_result in scanner.scan_file(binary_file):
+                print("%s" % format_result(found_result))
+            print("")
+        except OSError as e:
+            print("An OS error occurred - %s" % e)
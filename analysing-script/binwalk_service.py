@@ -0,0 +1,213 @@
+"""
+Module responsible with a long lived binwalk scanning service.
+binwalk.scan builds its modules and loads and compiles the magic files again for every call, which takes longer
+than the scan of a small ECU dump. The service streams the binary paths through a pool of worker processes, and every
+worker hands a batch of binaries to one binwalk.scan call, so the binwalk Signature module itself checks and shows the
+results and its magic files are loaded once per batch. The content already scanned under another name is not scanned
+again, its results come from the result cache.
+"""
+from collections import namedtuple
+from itertools import islice
+from multiprocessing import Pool
+
+import hashlib
+import mmap
+import os
+import sys
+import time
+
+from binwalk_scanner import BinwalkResult, BinwalkScanner, binwalk_module_version, module_scan, signature_name, \
+    write_walkdat
+from manifest import Manifest
+from result_cache import ResultCache
+from result_store import ResultStore
+
+
+# The binaries scanned by one binwalk.scan call, the magic files are loaded once for all of them
+BINWALK_BATCH = 16
+
+# The outcome of a binary, the seconds only cover the digests, the scan and the log of the binary
+BinwalkJob = namedtuple("BinwalkJob", ["path", "results", "seconds", "error"])
+
+# State of a worker process, created once by the pool initializer
+_worker = {}
+
+
+def _initialise_worker():
+    """
+    Prepare a worker process, the version of the results is computed once per process.
+    """
+    _worker["cache"] = ResultCache()
+    _worker["manifest"] = Manifest()
+    _worker["store"] = ResultStore()
+    _worker["version"] = binwalk_module_version()
+    # Known after the first binwalk.scan call of the worker
+    _worker["signature_count"] = None
+
+
+def _digest_binary(binary_path):
+    """
+    Function that maps a binary once and takes its digests.
+    :param binary_path: Path to the binary.
+    :return: Tuple of the os.stat_result, the SHA-256 and the MD5 digests of the binary, in hexadecimal.
+    """
+    binary_stat = os.stat(binary_path)
+    with open(binary_path, "rb") as binary_file:
+        if not os.fstat(binary_file.fileno()).st_size:
+            return binary_stat, hashlib.sha256().hexdigest(), hashlib.md5().hexdigest()
+        with mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+            return binary_stat, hashlib.sha256(mapped_binary).hexdigest(), hashlib.md5(mapped_binary).hexdigest()
+
+
+def _signature_count():
+    """
+    Function that returns the number of binwalk signatures printed in the .walkdat logs. A worker whose binaries all
+    came from the cache has not run binwalk yet, it then loads the magic files once to count them.
+    :return: The number of binwalk signatures loaded.
+    """
+    if _worker["signature_count"] is None:
+        _worker["signature_count"] = BinwalkScanner().signature_count
+    return _worker["signature_count"]
+
+
+def _scan_batch(binary_paths):
+    """
+    Function run by the workers, it scans a batch of binaries with one binwalk.scan call, writes their .walkdat logs
+    and records them in the result store and in the manifest.
+    :param binary_paths: List of paths to the binaries.
+    :return: List of BinwalkJob, in the order of the paths.
+    """
+    version = _worker["version"]
+    cache = _worker["cache"]
+    jobs = {}
+    digests = {}
+    results = {}
+    seconds = {}
+    for binary_path in binary_paths:
+        start = time.perf_counter()
+        try:
+            digests[binary_path] = _digest_binary(binary_path)
+            cached = cache.get(digests[binary_path][1], "binwalk", version)
+            if cached is not None:
+                results[binary_path] = [BinwalkResult(*result) for result in cached]
+            elif not digests[binary_path][0].st_size:
+                results[binary_path] = []
+        except Exception as e:
+            jobs[binary_path] = BinwalkJob(binary_path, 0, time.perf_counter() - start, "%s" % e)
+        seconds[binary_path] = time.perf_counter() - start
+
+    # A content found more than once in the batch is scanned once
+    scanned = {}
+    for binary_path in digests:
+        if binary_path not in results:
+            scanned.setdefault(digests[binary_path][1], []).append(binary_path)
+    start = time.perf_counter()
+    try:
+        signature_count, found = module_scan([copies[0] for copies in scanned.values()])
+        if signature_count is not None:
+            _worker["signature_count"] = signature_count
+        # The scan time of the batch is shared by the binaries in proportion to their sizes
+        scan_seconds = time.perf_counter() - start
+        scanned_size = sum(digests[copies[0]][0].st_size for copies in scanned.values()) or 1
+        for sha256, copies in scanned.items():
+            cache.put(sha256, "binwalk", version, found[os.path.abspath(copies[0])])
+            seconds[copies[0]] += scan_seconds * digests[copies[0]][0].st_size / scanned_size
+            for binary_path in copies:
+                results[binary_path] = found[os.path.abspath(copies[0])]
+    except Exception as e:
+        for copies in scanned.values():
+            for binary_path in copies:
+                jobs[binary_path] = BinwalkJob(binary_path, 0, seconds[binary_path], "%s" % e)
+
+    for binary_path in results:
+        start = time.perf_counter()
+        binary_stat, sha256, md5 = digests[binary_path]
+        try:
+            cache.add_alias(sha256, binary_path)
+            write_walkdat(binary_path, md5, _signature_count(), results[binary_path])
+            _worker["store"].add_scan("binwalk", version, binary_path, sha256, md5, binary_stat.st_size,
+                                      [(result.offset, signature_name(result.description), result.description)
+                                       for result in results[binary_path]])
+            _worker["manifest"].update(binary_path, "binwalk", version, sha256, binary_stat)
+            jobs[binary_path] = BinwalkJob(binary_path, len(results[binary_path]),
+                                           seconds[binary_path] + time.perf_counter() - start, None)
+        except Exception as e:
+            jobs[binary_path] = BinwalkJob(binary_path, 0, seconds[binary_path] + time.perf_counter() - start,
+                                           "%s" % e)
+    return [jobs[binary_path] for binary_path in binary_paths]
+
+
+def _batches(binary_paths, size):
+    """
+    Function that groups the binary paths in batches, the paths are consumed as the batches are needed.
+    :param binary_paths: Iterable of paths to the binaries.
+    :param size: The number of binaries in a batch.
+    :return: Generator of lists of paths.
+    """
+    binary_paths = iter(binary_paths)
+    batch = list(islice(binary_paths, size))
+    while batch:
+        yield batch
+        batch = list(islice(binary_paths, size))
+
+
+class BinwalkService:
+    """
+    Class that keeps a pool of binwalk workers alive and scans the binaries handed to it.
+    """
+
+    def __init__(self, processes=None, batch=BINWALK_BATCH):
+        """
+        Start the workers.
+        :param processes: Optional. The number of processes, defaults to the number of cores.
+        :param batch: Optional. The number of binaries scanned by one binwalk.scan call.
+        """
+        self._batch = batch
+        self._pool = Pool(processes, _initialise_worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def scan(self, binary_paths):
+        """
+        Method that scans binaries and writes their .walkdat logs.
+        :param binary_paths: Iterable of paths to the binaries, it is consumed as the workers need more batches.
+        :return: Generator of BinwalkJob, in the order of the paths.
+        """
+        for jobs in self._pool.imap(_scan_batch, _batches(binary_paths, self._batch)):
+            yield from jobs
+
+    def close(self):
+        """
+        Method that waits for the workers to finish and stops them.
+        """
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        """
+        Method that stops the workers at once.
+        """
+        self._pool.terminate()
+        self._pool.join()
+
+
+if __name__ == "__main__":
+
+    # Scan the given binaries and print the time taken by each of them
+    if len(sys.argv) < 2:
+        print("Usage: %s [BINARY] ... [BINARY]" % sys.argv[0])
+        exit(1)
+
+    with BinwalkService() as service:
+        for job in service.scan(sys.argv[1:]):
+            if job.error:
+                print("[ERROR]: %s - %s" % (job.path, job.error))
+            else:
+                print("[INFO]: %s - %d signatures in %.3f s" % (job.path, job.results, job.seconds))
@@ -0,0 +1,310 @@
+"""
+Module responsible with the co-occurrence of the signatures over the corpus.
+A crypto implementation leaves several tables in a binary, the S-box and the round constants of AES, the tables of a
+CRC and its polynomial, while a table found by coincidence stands alone. The binaries and their signatures form a
+sparse binary by signature matrix, its product with itself counts how many binaries hold every pair of signatures,
+and the pointwise mutual information of the pairs tells the signatures found together more often than by chance.
+The matrix and the counts are kept on disk and only the binaries added, changed or removed since the last run update
+them.
+"""
+import json
+import os
+import sqlite3
+import sys
+
+import numpy
+import scipy.sparse
+
+from result_store import ResultStore
+from results_history import StringPool, binary_signatures, load_results
+from signature_database import DEFAULT_CACHE_PATH
+
+
+# Bump it when the layout of the matrix changes, the matrices of older versions have to be built again
+COOCCURRENCE_VERSION = 1
+DEFAULT_COOCCURRENCE_PATH = os.path.join(DEFAULT_CACHE_PATH, "cooccurrence")
+# A pair found in fewer binaries tells nothing
+DEFAULT_MIN_COUNT = 5
+# The signatures of a group are linked by pairs with at least this normalised PMI, which is 1 for signatures always
+# found together and 0 for independent ones
+DEFAULT_NPMI_THRESHOLD = 0.5
+DEFAULT_TOP_PAIRS = 50
+
+_NAMES_FILE = "names.json"
+_BINARIES_FILE = "binaries.npz"
+_COUNTS_FILE = "counts.npz"
+
+
+def _signature_rows(records, signatures):
+    """
+    Group the records by binary.
+    :param records: List of (path, signature, description) tuples, a None signature marks a binary without signatures.
+    :param signatures: StringPool of the signatures, the new ones are added to it.
+    :return: Tuple of (dictionary of path to the sorted list of its signature ids, list of the descriptions of the new
+    signatures).
+    """
+    rows = {}
+    descriptions = []
+    first_new = len(signatures)
+    for path, signature, description in records:
+        row = rows.setdefault(path, set())
+        if signature is None:
+            continue
+        signature_id = signatures.intern(signature)
+        if signature_id == first_new + len(descriptions):
+            descriptions.append(description)
+        row.add(signature_id)
+    return {path: sorted(row) for path, row in rows.items()}, descriptions
+
+
+def _binary_matrix(rows, signature_count):
+    """
+    Build the binary by signature matrix of a list of rows.
+    :param rows: List of lists of signature ids.
+    :param signature_count: The number of columns.
+    :return: scipy.sparse.csr_matrix of 0 and 1.
+    """
+    indptr = numpy.zeros(len(rows) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = numpy.fromiter((signature_id for row in rows for signature_id in row), dtype=numpy.int32,
+                             count=int(indptr[-1]))
+    return scipy.sparse.csr_matrix((numpy.ones(len(indices), dtype=numpy.int32), indices, indptr),
+                                   shape=(len(rows), signature_count))
+
+
+def _resize(matrix, shape):
+    """
+    Grow a sparse matrix, the new rows and columns are zero.
+    :param matrix: scipy.sparse matrix.
+    :param shape: The new shape.
+    :return: scipy.sparse.csr_matrix.
+    """
+    matrix = matrix.tocoo()
+    return scipy.sparse.csr_matrix((matrix.data, (matrix.row, matrix.col)), shape=shape)
+
+
+class CooccurrenceMatrix:
+    """
+    Class that keeps the binary by signature matrix of an analyser and the co-occurrence counts of its signatures.
+    """
+
+    def __init__(self, directory):
+        """
+        Open the matrix, it is empty when missing.
+        :param directory: The directory of the matrix.
+        """
+        self.directory = directory
+        self.binaries = []
+        self.signatures = StringPool()
+        self.descriptions = []
+        self.matrix = scipy.sparse.csr_matrix((0, 0), dtype=numpy.int32)
+        self.counts = scipy.sparse.csr_matrix((0, 0), dtype=numpy.int64)
+        try:
+            with open(os.path.join(directory, _NAMES_FILE), encoding="utf-8") as names_file:
+                names = json.load(names_file)
+        except FileNotFoundError:
+            return
+        if names["version"] != COOCCURRENCE_VERSION:
+            return
+        self.binaries = names["binaries"]
+        for signature, description in names["signatures"]:
+            self.signatures.intern(signature)
+            self.descriptions.append(description)
+        self.matrix = scipy.sparse.load_npz(os.path.join(directory, _BINARIES_FILE)).tocsr()
+        self.counts = scipy.sparse.load_npz(os.path.join(directory, _COUNTS_FILE)).tocsr()
+
+    def update(self, records):
+        """
+        Method that brings the matrix up to date with the signatures found in the binaries.
+        Only the rows of the binaries added, changed or removed are multiplied, their products are added to or taken
+        from the co-occurrence counts.
+        :param records: List of (path, signature, description) tuples of the whole corpus, like the ones
+        ResultStore.binary_signatures returns.
+        :return: Tuple of (number of binaries added or changed, number of binaries removed).
+        """
+        rows, descriptions = _signature_rows(records, self.signatures)
+        self.descriptions.extend(descriptions)
+        signature_count = len(self.signatures)
+
+        old_rows = {path: self.matrix.indices[self.matrix.indptr[row]:self.matrix.indptr[row + 1]].tolist()
+                    for row, path in enumerate(self.binaries)}
+        changed = [path for path, row in rows.items() if old_rows.get(path) != row]
+        gone = [path for path, row in old_rows.items() if rows.get(path) != row]
+        removed = sum(1 for path in old_rows if path not in rows)
+
+        # counts = X.T X, the old rows of the changed binaries are taken out and their new rows are added
+        removed_rows = _binary_matrix([old_rows[path] for path in gone], signature_count)
+        added_rows = _binary_matrix([rows[path] for path in changed], signature_count)
+        counts = _resize(self.counts, (signature_count, signature_count))
+        counts = counts + added_rows.T.dot(added_rows) - removed_rows.T.dot(removed_rows)
+        counts.eliminate_zeros()
+        self.counts = counts.tocsr().astype(numpy.int64)
+
+        self.binaries = sorted(rows)
+        self.matrix = _binary_matrix([rows[path] for path in self.binaries], signature_count)
+        return len(changed), removed
+
+    def save(self):
+        """
+        Method that writes the matrix to its directory.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        for name, matrix in ((_BINARIES_FILE, self.matrix), (_COUNTS_FILE, self.counts)):
+            scipy.sparse.save_npz(os.path.join(self.directory, name + ".tmp.npz"), matrix)
+            os.replace(os.path.join(self.directory, name + ".tmp.npz"), os.path.join(self.directory, name))
+        names_path = os.path.join(self.directory, _NAMES_FILE)
+        with open(names_path + ".tmp", "w", encoding="utf-8") as names:
+            json.dump({"version": COOCCURRENCE_VERSION, "binaries": self.binaries,
+                       "signatures": list(zip(self.signatures.strings, self.descriptions))}, names)
+        os.replace(names_path + ".tmp", names_path)
+
+    def label(self, signature_id):
+        """
+        Method that returns the name of a signature as it is printed.
+        :param signature_id: The id of the signature in the matrix.
+        :return: The name, followed by the description when it is not part of it.
+        """
+        signature, description = self.signatures[signature_id], self.descriptions[signature_id]
+        return signature if not description or description.startswith(signature) else "%s %s" % (signature,
+                                                                                                   description)
+
+    def pairs(self, min_count=DEFAULT_MIN_COUNT, binary_count=None):
+        """
+        Method that computes the pointwise mutual information of the pairs of signatures.
+        PMI = log2(count(a, b) * N / (count(a) * count(b))), the counts of the single signatures are the diagonal of the
+        co-occurrence counts and the normalisation is a product with diagonal matrices.
+        :param min_count: Optional. The pairs found in fewer binaries are left out.
+        :param binary_count: Optional. The number of binaries N, the number of rows of the matrix by default. A results
+        file only lists the binaries with signatures, the number of binaries of its header is then given.
+        :return: Tuple of numpy arrays of (first signatures, second signatures, counts, PMI, normalised PMI), the pairs
+        sorted by decreasing PMI.
+        """
+        if binary_count is None:
+            binary_count = len(self.binaries)
+        frequencies = self.counts.diagonal().astype(numpy.float64)
+        inverse = scipy.sparse.diags(numpy.divide(1.0, frequencies, out=numpy.zeros_like(frequencies),
+                                                  where=frequencies > 0))
+        ratios = scipy.sparse.triu(inverse.dot(self.counts).dot(inverse), k=1).tocoo()
+        counts = numpy.asarray(self.counts[ratios.row, ratios.col]).ravel()
+        kept = counts >= min_count
+        first, second, counts, ratios = ratios.row[kept], ratios.col[kept], counts[kept], ratios.data[kept]
+        pmi = numpy.log2(ratios * binary_count)
+        # -log2(p(a, b)) is the highest PMI of a pair found in this many binaries
+        npmi = pmi / numpy.maximum(-numpy.log2(counts / float(binary_count)), 1e-12)
+        order = numpy.argsort(-pmi, kind="mergesort")
+        return first[order], second[order], counts[order], pmi[order], npmi[order]
+
+    def groups(self, min_count=DEFAULT_MIN_COUNT, threshold=DEFAULT_NPMI_THRESHOLD, binary_count=None):
+        """
+        Method that finds the groups of signatures found together. The pairs are taken by decreasing normalised PMI, a
+        pair starts a group and a signature joins a group only when it is linked to every signature of the group, so
+        a few shared tables do not chain unrelated groups together.
+        :param min_count: Optional. The pairs found in fewer binaries are left out.
+        :param threshold: Optional. The lowest normalised PMI of a pair linking two signatures.
+        :param binary_count: Optional. The number of binaries, see pairs.
+        :return: List of (list of signature ids, mean PMI of the pairs of the group, number of binaries holding all the
+        signatures) tuples, the largest groups first.
+        """
+        first, second, _, pmi, npmi = self.pairs(min_count, binary_count)
+        linked = npmi >= threshold
+        first, second, pmi, npmi = first[linked].tolist(), second[linked].tolist(), pmi[linked], npmi[linked]
+        pair_pmi = {(a, b): value for a, b, value in zip(first, second, pmi.tolist())}
+        group_of = {}
+        members = []
+        for pair in numpy.argsort(-npmi, kind="mergesort").tolist():
+            a, b = first[pair], second[pair]
+            if a in group_of and b in group_of:
+                continue
+            if a not in group_of and b not in group_of:
+                group_of[a] = group_of[b] = len(members)
+                members.append([a, b])
+                continue
+            group, signature = (group_of[a], b) if a in group_of else (group_of[b], a)
+            if all((min(member, signature), max(member, signature)) in pair_pmi for member in members[group]):
+                group_of[signature] = group
+                members[group].append(signature)
+
+        groups = []
+        for group in members:
+            group.sort()
+            values = [pair_pmi[(a, b)] for position, a in enumerate(group) for b in group[position + 1:]]
+            together = int((self.matrix[:, group].sum(axis=1) == len(group)).sum())
+            groups.append((group, sum(values) / len(values), together))
+        groups.sort(key=lambda group: (-len(group[0]), -group[1]))
+        return groups
+
+
+def write_report(cooccurrence, report_path, min_count=DEFAULT_MIN_COUNT, threshold=DEFAULT_NPMI_THRESHOLD,
+                 top_pairs=DEFAULT_TOP_PAIRS, binary_count=None):
+    """
+    Function that writes the groups of signatures found together and the most correlated pairs.
+    :param cooccurrence: CooccurrenceMatrix.
+    :param report_path: Path to the report.
+    :param min_count: Optional. The pairs found in fewer binaries are left out.
+    :param threshold: Optional. The lowest normalised PMI of a pair linking two signatures of a group.
+    :param top_pairs: Optional. The number of pairs written.
+    :param binary_count: Optional. The number of binaries, see CooccurrenceMatrix.pairs.
+    :return: The number of groups.
+    """
+    groups = cooccurrence.groups(min_count, threshold, binary_count)
+    first, second, counts, pmi, npmi = cooccurrence.pairs(min_count, binary_count)
+    report_directory = os.path.dirname(report_path)
+    if report_directory:
+        os.makedirs(report_directory, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as report:
+        report.write("Number of binaries: %d\n" % (binary_count or len(cooccurrence.binaries)))
+        report.write("Number of signatures: %d\n" % len(cooccurrence.signatures))
+        report.write("Number of pairs found in at least %d binaries: %d\n\n" % (min_count, len(pmi)))
+        for number, (members, mean_pmi, together) in enumerate(groups, 1):
+            report.write("Group %d: %d signatures, mean PMI %.2f, all found in %d binaries\n" %
+                         (number, len(members), mean_pmi, together))
+            for member in members:
+                report.write("  %s\n" % cooccurrence.label(member))
+            report.write("\n")
+        report.write("PMI     NPMI   BINARIES  SIGNATURES\n")
+        report.write("%s\n" % ("-" * 80))
+        for pair in range(min(top_pairs, len(pmi))):
+            report.write("%-8.2f%-7.2f%-10d%s | %s\n" % (pmi[pair], npmi[pair], counts[pair],
+                                                         cooccurrence.label(first[pair]),
+                                                         cooccurrence.label(second[pair])))
+    return len(groups)
+
+
+if __name__ == "__main__":
+
+    # Update the co-occurrence matrix of an analyser from the result store or from a results file, then report it
+    arguments = sys.argv[1:]
+    report_file = None
+    if len(arguments) > 1 and arguments[0] == "-o":
+        report_file = arguments[1]
+        arguments = arguments[2:]
+
+    if len(arguments) not in (1, 2):
+        print("Usage: %s [-o REPORT FILE] [ANALYSER] [RESULTS FILE]" % sys.argv[0])
+        exit(1)
+
+    analyser = arguments[0]
+    if report_file is None:
+        report_file = os.path.join("results", "%s_cooccurrence.dat" % analyser)
+    try:
+        history_binaries = None
+        if len(arguments) == 2:
+            history = load_results(arguments[1])
+            history_binaries = history.binaries
+            cooccurrence_records = binary_signatures(history)
+        else:
+            with ResultStore() as store:
+                cooccurrence_records = store.binary_signatures(analyser)
+
+        signature_cooccurrence = CooccurrenceMatrix(os.path.join(DEFAULT_COOCCURRENCE_PATH, analyser))
+        updated, deleted = signature_cooccurrence.update(cooccurrence_records)
+        signature_cooccurrence.save()
+        print("%d binaries added or changed, %d removed" % (updated, deleted))
+        group_count = write_report(signature_cooccurrence, report_file, binary_count=history_binaries)
+        print("Found %d groups of signatures, the report is in %s" % (group_count, report_file))
+    except sqlite3.Error as e:
+        print("A store error occurred - %s" % e)
+        exit(1)
+    except (OSError, ValueError) as e:
+        print("An error occurred - %s" % e)
+        exit(1)
@@ -0,0 +1,308 @@
+"""
+Module responsible with scanning a whole corpus of binaries in parallel.
+The binaries are spread across a pool of processes, the largest first, and the report of every binary is written
+as soon as it is scanned, next to the binary, like the signsrch and binwalk scripts do. Every binary is mapped once,
+its digests and the analysers share the buffer, and the signsrch scan profiles the entropy of the binary too.
+"""
+from multiprocessing import Pool
+
+import hashlib
+import mmap
+import os
+import sys
+import time
+
+from entropy import entropy_version, profile_report, region_records
+from manifest import Manifest
+from prefilter import PrefilterScanner
+from result_cache import ResultCache
+from result_store import ResultStore
+from signature_database import load_database, DEFAULT_SIGNATURE_FILE, describe, report_line, SignatureFileError
+from signature_scanner import scanner_version
+
+
+# The analysers which can be run over the corpus and the extension of the reports they write
+ANALYSERS = {"signsrch": ".signdat", "binwalk": ".walkdat", "entropy": ".entdat"}
+DEFAULT_ANALYSER = "signsrch"
+# The analysers run from the same mapping as another one, their results are stored next to its results
+ALONGSIDE = {"signsrch": ("entropy",)}
+
+# State of a worker process, created once by the pool initializer
+_worker = {}
+
+
+def find_binaries(path):
+    """
+    Function that finds the .bin files under a directory, the largest first.
+    :param path: The directory to be walked.
+    :return: List of (size, path) tuples.
+    """
+    binaries = []
+    for root, _, files in os.walk(path):
+        for file in files:
+            if file.endswith(".bin"):
+                binary_path = os.path.join(root, file)
+                binaries.append((os.path.getsize(binary_path), binary_path))
+    binaries.sort(key=lambda binary: (-binary[0], binary[1]))
+    return binaries
+
+
+def format_duration(seconds):
+    """
+    Function that formats a duration as hours, minutes and seconds.
+    :param seconds: The duration in seconds.
+    :return: String like 1:02:03.
+    """
+    seconds = int(seconds + 0.5)
+    return "%d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def signsrch_report(database, binary_path, hits, seconds):
+    """
+    Function that builds the report signsrch writes to the standard output, which the .signdat files hold.
+    The reports are read back skipping the first 10 lines and the last 2, so the layout is kept.
+    :param database: The SignatureDatabase.
+    :param binary_path: Path to the binary.
+    :param hits: List of Hit found in the binary.
+    :param seconds: The scan time.
+    :return: List of report lines.
+    """
+    lines = ["- open file \"%s\"" % binary_path,
+             "- %u bytes allocated" % os.path.getsize(binary_path),
+             "- load signatures",
+             "- open file %s" % DEFAULT_SIGNATURE_FILE,
+             "- %u signatures in the database" % len(database),
+             "- start 1 threads",
+             "- start signatures scanning:",
+             "",
+             "  offset   num  description [bits.endian.size]",
+             "  --------------------------------------------"]
+    for hit in hits:
+        lines.append("  %08x %s" % (hit.offset, report_line(database[hit.signature_id])))
+    lines.append("")
+    lines.append("- %u signatures found in the file in %u seconds" % (len(hits), int(seconds)))
+    return lines
+
+
+def _initialise_worker(analyser):
+    """
+    Prepare a worker process, the signature database and the scanner are built once per process.
+    :param analyser: The analyser run by the worker.
+    """
+    _worker["analysers"] = (analyser,) + ALONGSIDE.get(analyser, ())
+    # Every worker has its own connection to the shared result cache, manifest and result store
+    _worker["cache"] = ResultCache()
+    _worker["manifest"] = Manifest()
+    _worker["store"] = ResultStore()
+    if analyser == "signsrch":
+        _worker["database"] = load_database()
+        _worker["scanner"] = PrefilterScanner(_worker["database"])
+        _worker["versions"] = {"signsrch": _worker["scanner"].version, "entropy": entropy_version()}
+    elif analyser == "binwalk":
+        # The binwalk magic files are loaded once per process and not for every binary
+        from binwalk_scanner import BinwalkScanner
+        _worker["scanner"] = BinwalkScanner()
+        _worker["versions"] = {"binwalk": _worker["scanner"].version}
+    else:
+        _worker["versions"] = {"entropy": entropy_version()}
+
+
+def _scan_signsrch(binary_path, buffer, sha256, md5):
+    """
+    Scan a binary for the signsrch signatures and write its .signdat report.
+    :param binary_path: Path to the binary.
+    :param buffer: The mmap of the binary.
+    :param sha256: The SHA-256 digest of the binary.
+    :param md5: The MD5 digest of the binary.
+    :return: List of (offset, signature id, description) tuples, the records of the result store.
+    """
+    start = time.perf_counter()
+    database = _worker["database"]
+    hits = _worker["scanner"].scan_mapped(binary_path, buffer, cache=_worker["cache"], sha256=sha256)
+    lines = signsrch_report(database, binary_path, hits, time.perf_counter() - start)
+    with open(binary_path + ANALYSERS["signsrch"], "w", encoding="latin-1") as report:
+        report.write("\n".join(lines) + "\n")
+    return [(hit.offset, "%d" % hit.signature_id, describe(database[hit.signature_id])) for hit in hits]
+
+
+def _scan_binwalk(binary_path, buffer, sha256, md5):
+    """
+    Scan a binary with the binwalk signatures and log it to its .walkdat report.
+    :param binary_path: Path to the binary.
+    :param buffer: The mmap of the binary.
+    :param sha256: The SHA-256 digest of the binary.
+    :param md5: The MD5 digest of the binary.
+    :return: List of (offset, signature name, description) tuples, the records of the result store.
+    """
+    from binwalk_scanner import signature_name
+
+    results = _worker["scanner"].log_mapped(binary_path, buffer, sha256, md5, binary_path + ANALYSERS["binwalk"],
+                                            _worker["cache"])
+    return [(result.offset, signature_name(result.description), result.description) for result in results]
+
+
+def _scan_entropy(binary_path, buffer, sha256, md5):
+    """
+    Find the encrypted and compressed regions of a binary and write its .entdat report.
+    :param binary_path: Path to the binary.
+    :param buffer: The mmap of the binary.
+    :param sha256: The SHA-256 digest of the binary.
+    :param md5: The MD5 digest of the binary.
+    :return: List of (offset, kind, description) tuples, the records of the result store.
+    """
+    regions, lines = profile_report(binary_path, buffer)
+    with open(binary_path + ANALYSERS["entropy"], "w", encoding="latin-1", errors="replace") as report:
+        report.write("\n".join(lines) + "\n")
+    return region_records(regions)
+
+
+# The function scanning a mapped binary for every analyser
+_SCANS = {"signsrch": _scan_signsrch, "binwalk": _scan_binwalk, "entropy": _scan_entropy}
+
+
+def scan_binary(binary):
+    """
+    Function run by the workers, it scans one binary with the analysers of the worker and writes their reports.
+    :param binary: Tuple of (size, path) of the binary.
+    :return: Tuple of (size, path, signatures found by the selected analyser, seconds, error message or None).
+    """
+    size, binary_path = binary
+    start = time.perf_counter()
+    try:
+        # The state is taken before the binary is read, a binary changed during the scan is scanned again next time
+        binary_stat = os.stat(binary_path)
+        with open(binary_path, "rb") as binary_file:
+            mapped_binary = None
+            if os.fstat(binary_file.fileno()).st_size:
+                mapped_binary = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                buffer = mapped_binary if mapped_binary is not None else b""
+                # The digests are taken once, from the buffer the analysers scan
+                sha256 = hashlib.sha256(buffer).hexdigest()
+                md5 = hashlib.md5(buffer).hexdigest()
+                records = [_SCANS[analyser](binary_path, buffer, sha256, md5) for analyser in _worker["analysers"]]
+            finally:
+                if mapped_binary is not None:
+                    mapped_binary.close()
+        for analyser, analyser_records in zip(_worker["analysers"], records):
+            version = _worker["versions"][analyser]
+            _worker["store"].add_scan(analyser, version, binary_path, sha256, md5, binary_stat.st_size,
+                                      analyser_records)
+            _worker["manifest"].update(binary_path, analyser, version, sha256, binary_stat)
+        return size, binary_path, len(records[0]), time.perf_counter() - start, None
+    except Exception as e:
+        return size, binary_path, 0, time.perf_counter() - start, "%s" % e
+
+
+def analyser_version(analyser):
+    """
+    Function that returns the version of an analyser, without building its scanner.
+    :param analyser: One of the ANALYSERS.
+    :return: The version recorded in the manifest.
+    """
+    if analyser == "signsrch":
+        with load_database() as database:
+            return scanner_version(database)
+    if analyser == "entropy":
+        return entropy_version()
+    from binwalk_scanner import binwalk_version
+    return binwalk_version()
+
+
+def scan_corpus(path, analyser=DEFAULT_ANALYSER, processes=None, incremental=True):
+    """
+    Function that scans the binaries under a directory with a pool of processes and prints the progress.
+    :param path: The directory holding the binaries.
+    :param analyser: Optional. One of the ANALYSERS.
+    :param processes: Optional. The number of processes, defaults to the number of cores.
+    :param incremental: Optional. False to scan all the binaries and not only the ones changed since the last scan.
+    :return: Tuple of (number of binaries scanned, number of binaries scanned with signatures).
+    """
+    binaries = find_binaries(path)
+    if incremental:
+        # A binary is scanned when any of the analysers run over it has to see it again
+        changed = set()
+        removed = {}
+        with Manifest() as manifest:
+            for name in (analyser,) + ALONGSIDE.get(analyser, ()):
+                name_changed, removed[name] = manifest.plan(path, binaries, name, analyser_version(name),
+                                                            ANALYSERS[name])
+                changed.update(name_changed)
+        with ResultStore() as store:
+            for name, removed_paths in removed.items():
+                store.remove_binaries(name, removed_paths)
+        print("[INFO]: %d of %d binaries changed since the last scan, %d removed" %
+              (len(changed), len(binaries), len(removed[analyser])))
+        binaries = [binary for binary in binaries if binary in changed]
+    total_size = sum(size for size, _ in binaries) or 1
+    scanned_size = 0
+    with_signatures = 0
+    start = time.perf_counter()
+
+    print("[INFO]: Scanning %d binaries with %s ..." % (len(binaries), analyser))
+    pool = Pool(processes, _initialise_worker, (analyser,))
+    try:
+        # The binaries are handed out one at a time in the largest first order
+        for done, (size, binary_path, found, seconds, error) in enumerate(
+                pool.imap_unordered(scan_binary, binaries, chunksize=1), 1):
+            scanned_size += size
+            elapsed = time.perf_counter() - start
+            eta = elapsed * (total_size - scanned_size) / scanned_size if scanned_size else 0
+            if error:
+                print("[ERROR]: [%d/%d] %s - %s" % (done, len(binaries), binary_path, error))
+                continue
+            if found:
+                with_signatures += 1
+            print("[INFO]: [%d/%d] %s - %d signatures in %.2f s, ETA %s" %
+                  (done, len(binaries), binary_path, found, seconds, format_duration(eta)))
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    print("[INFO]: Done in %s" % format_duration(time.perf_counter() - start))
+    return len(binaries), with_signatures
+
+
+if __name__ == "__main__":
+
+    # Parse the options and scan the corpus
+    arguments = sys.argv[1:]
+    process_count = None
+    selected_analyser = DEFAULT_ANALYSER
+    full_scan = False
+    while len(arguments) > 1 and arguments[0] in ("-j", "-a", "-f"):
+        if arguments[0] == "-f":
+            full_scan = True
+            arguments = arguments[1:]
+            continue
+        if arguments[0] == "-j":
+            process_count = int(arguments[1])
+        else:
+            selected_analyser = arguments[1]
+        arguments = arguments[2:]
+
+    if len(arguments) != 1 or selected_analyser not in ANALYSERS:
+        print("Usage: %s [-f] [-j PROCESSES] [-a %s] [PATH]" % (sys.argv[0], "|".join(sorted(ANALYSERS))))
+        exit(1)
+
+    if not os.path.isdir(arguments[0]):
+        print("Base path does not exist!")
+        exit(1)
+
+    try:
+        if selected_analyser == "signsrch":
+            # Compile the database once before the workers load it
+            load_database().close()
+        binaries_count, binaries_with_signatures = scan_corpus(arguments[0], selected_analyser, process_count,
+                                                               not full_scan)
+        print("Number of binaries scanned: %d" % binaries_count)
+        print("Number of binaries scanned with signatures: %d" % binaries_with_signatures)
+    except SignatureFileError as e:
+        print("A signature file error occurred - %s" % e)
+        exit(1)
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
+        exit(1)
@@ -0,0 +1,172 @@
+"""
+Module responsible with generating the CRC tables of the signsrch CRC signatures.
+The tables of every polynomial of the same width are generated together with NumPy and kept in a versioned cache,
+so they are computed once for every version of the signature file.
+"""
+import io
+import os
+import sys
+
+import numpy
+
+
+# Bump it when the generated tables change, the cached tables are then generated again
+CRC_TABLES_VERSION = 1
+
+# The (reverse, msb first) variants generated for every polynomial, in signsrch order
+CRC_VARIANTS = ((False, True), (False, False), (True, True), (True, False))
+
+_TABLE_INDEXES = numpy.arange(256, dtype=numpy.uint64)
+
+
+def _mask(bits):
+    """
+    Build the mask of a CRC width.
+    :param bits: The CRC width in bits.
+    :return: numpy.uint64 with the low bits set.
+    """
+    return numpy.uint64((1 << bits) - 1)
+
+
+def reflect(values, bits):
+    """
+    Function that reflects the low bits of every value of an array.
+    :param values: numpy.uint64 array.
+    :param bits: The number of bits to be reflected.
+    :return: numpy.uint64 array with the reflected values.
+    """
+    reflected = numpy.zeros_like(values)
+    one = numpy.uint64(1)
+    for bit in range(bits):
+        reflected |= ((values >> numpy.uint64(bit)) & one) << numpy.uint64(bits - 1 - bit)
+    return reflected
+
+
+def crc_tables(polys, bits, reverse, msb_first):
+    """
+    Function that generates the 256 entries CRC tables of several polynomials at once, the way the signsrch
+    CRC type does.
+    :param polys: List of polynomials of the same width.
+    :param bits: The CRC width in bits.
+    :param reverse: True for the "rev" variant, where entries and indexes are bit reflected.
+    :param msb_first: True for the "int_min" variant which tests the top bit, False for the "1" variant.
+    :return: numpy.uint64 array of shape (polynomials, 256).
+    """
+    mask = _mask(bits)
+    one = numpy.uint64(1)
+    zero = numpy.uint64(0)
+    poly_column = numpy.array([int(poly) & int(mask) for poly in polys], dtype=numpy.uint64)[:, None]
+    tables = numpy.repeat(_TABLE_INDEXES[None, :], len(polys), axis=0)
+
+    if msb_first:
+        top = numpy.uint64(1 << (bits - 1))
+        if bits >= 8:
+            tables = (tables << numpy.uint64(bits - 8)) & mask
+        for _ in range(8):
+            tables = ((tables << one) & mask) ^ numpy.where(tables & top, poly_column, zero)
+    else:
+        for _ in range(8):
+            tables = (tables >> one) ^ numpy.where(tables & one, poly_column, zero)
+    tables &= mask
+
+    if reverse:
+        tables = reflect(tables[:, reflect(_TABLE_INDEXES, 8).astype(numpy.intp)], bits)
+    return tables
+
+
+def generate_crc_tables(crc_polys):
+    """
+    Function that generates every variant of the tables of the given polynomials.
+    :param crc_polys: Iterable of (polynomial, bits) tuples.
+    :return: Dictionary of (polynomial, bits, reverse, msb first) to the numpy.uint64 table.
+    """
+    polys_by_bits = {}
+    for poly, bits in crc_polys:
+        polys = polys_by_bits.setdefault(bits, [])
+        poly = int(poly) & int(_mask(bits))
+        if poly not in polys:
+            polys.append(poly)
+
+    tables = {}
+    for bits, polys in polys_by_bits.items():
+        for reverse, msb_first in CRC_VARIANTS:
+            for poly, table in zip(polys, crc_tables(polys, bits, reverse, msb_first)):
+                tables[(poly, bits, reverse, msb_first)] = table
+    return tables
+
+
+def _read_cache(cache_path, source_digest):
+    """
+    Read the cached tables, if they were generated by this version for the same signature file.
+    :param cache_path: Path to the cache file.
+    :param source_digest: The digest of the signature file.
+    :return: Dictionary like generate_crc_tables, or None when the cache is missing or stale.
+    """
+    try:
+        with numpy.load(cache_path) as cache:
+            if int(cache["version"]) != CRC_TABLES_VERSION or cache["digest"].tobytes() != source_digest:
+                return None
+            return dict(((int(poly), int(bits), bool(reverse), bool(msb_first)), table)
+                        for (poly, bits, reverse, msb_first), table in zip(cache["keys"], cache["tables"]))
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _write_cache(tables, cache_path, source_digest):
+    """
+    Write the tables to the cache file, replacing it atomically.
+    :param tables: Dictionary like generate_crc_tables.
+    :param cache_path: Path to the cache file.
+    :param source_digest: The digest of the signature file.
+    """
+    keys = sorted(tables)
+    buffer = io.BytesIO()
+    numpy.savez(buffer,
+                version=numpy.array(CRC_TABLES_VERSION),
+                digest=numpy.frombuffer(source_digest, dtype=numpy.uint8),
+                keys=numpy.array(keys, dtype=numpy.uint64).reshape(len(keys), 4),
+                tables=numpy.array([tables[key] for key in keys], dtype=numpy.uint64).reshape(len(keys), 256))
+
+    directory = os.path.dirname(cache_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # The workers may write the cache together, every one writes its own file and they are all alike
+    temporary_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    with open(temporary_path, "wb") as cache:
+        cache.write(buffer.getvalue())
+    os.replace(temporary_path, cache_path)
+
+
+def load_crc_tables(crc_polys, cache_path, source_digest):
+    """
+    Function that loads the CRC tables from the cache, generating them again when the cache is stale.
+    :param crc_polys: List of (polynomial, bits) tuples.
+    :param cache_path: Path to the cache file.
+    :param source_digest: The digest of the signature file the polynomials come from.
+    :return: Dictionary of (polynomial, bits, reverse, msb first) to the numpy.uint64 table.
+    """
+    tables = _read_cache(cache_path, source_digest)
+    if tables is not None and all((int(poly) & int(_mask(bits)), bits, reverse, msb_first) in tables
+                                  for poly, bits in crc_polys for reverse, msb_first in CRC_VARIANTS):
+        return tables
+
+    tables = generate_crc_tables(crc_polys)
+    _write_cache(tables, cache_path, source_digest)
+    return tables
+
+
+if __name__ == "__main__":
+
+    # Print the table variants of a polynomial
+    if len(sys.argv) != 3:
+        print("Usage: %s [POLYNOMIAL] [BITS]" % sys.argv[0])
+        exit(1)
+
+    polynomial = int(sys.argv[1], 0)
+    width = int(sys.argv[2])
+    for reverse_variant, msb_first_variant in CRC_VARIANTS:
+        print("crc%d.0x%0*x %s %s" % (width, max(width // 4, 2), polynomial, "rev" if reverse_variant else "norev",
+                                      "int_min" if msb_first_variant else "1"))
+        table_entries = crc_tables([polynomial], width, reverse_variant, msb_first_variant)[0]
+        for row in range(0, 256, 8):
+            print("  %s" % " ".join("%0*x" % (max(width // 4, 2), entry) for entry in table_entries[row:row + 8]))
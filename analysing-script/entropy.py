@@ -0,0 +1,275 @@
+"""
+Module responsible with measuring the entropy of the binaries.
+Encrypted and compressed data is close to 8 bits of entropy per byte, code and tables are well below it. The binaries
+are profiled in blocks, the byte counts of all the blocks are taken at once with strided views and bincount, and the
+runs of high entropy blocks are reported as encrypted or compressed regions.
+"""
+from collections import namedtuple
+from numpy.lib.stride_tricks import as_strided
+
+import mmap
+import os
+import sys
+
+import numpy
+
+
+# Bump it when the regions change, the stored regions of older versions are then computed again
+ENTROPY_VERSION = 1
+DEFAULT_BLOCK_SIZE = 1024
+# A block of random bytes of the default size has about 7.8 bits of entropy per byte
+DEFAULT_THRESHOLD = 7.5
+# Encrypted data is as uniform as random data, the chi-square statistic of its byte counts stays close to 255,
+# while compressed data keeps some structure. The limit is 4 standard deviations above the mean of random data
+CHI_SQUARE_LIMIT = 255 + 4 * (2 * 255) ** 0.5
+# The blocks are counted in chunks of this many bytes to bound the memory used
+_CHUNK_BYTES = 1 << 20
+
+# A run of high entropy blocks
+EntropyRegion = namedtuple("EntropyRegion", ["start", "end", "entropy", "kind"])
+
+
+def shannon_entropy(buffer):
+    """
+    Function that computes the Shannon entropy of a buffer.
+    :param buffer: A bytes like object or a mmap.
+    :return: The entropy in bits per byte, between 0 and 8.
+    """
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    if not len(data):
+        return 0.0
+    return _counts_entropy(_byte_counts(data))
+
+
+def _byte_counts(data):
+    """
+    Count the byte values of an array, in chunks so the whole array is never widened to integers at once.
+    :param data: numpy array of bytes.
+    :return: numpy array of the 256 byte counts.
+    """
+    counts = numpy.zeros(256, dtype=numpy.int64)
+    for start in range(0, len(data), _CHUNK_BYTES):
+        counts += numpy.bincount(data[start:start + _CHUNK_BYTES], minlength=256)
+    return counts
+
+
+def _counts_entropy(counts):
+    """
+    Compute the Shannon entropy of byte counts.
+    :param counts: numpy array of the 256 byte counts.
+    :return: The entropy in bits per byte.
+    """
+    probabilities = counts[counts > 0] / float(counts.sum())
+    return float(-(probabilities * numpy.log2(probabilities)).sum())
+
+
+def block_counts(buffer, block_size=DEFAULT_BLOCK_SIZE, step=None):
+    """
+    Function that counts the byte values of every block of a buffer.
+    The bytes after the last whole block are not counted.
+    :param buffer: A bytes like object or a mmap.
+    :param block_size: Optional. The size of the blocks.
+    :param step: Optional. The distance between the starts of two blocks, the block size by default. A smaller step
+    gives overlapping blocks.
+    :return: Tuple of (numpy array of the block offsets, numpy array of shape (blocks, 256) of the byte counts).
+    """
+    if step is None:
+        step = block_size
+    if block_size <= 0 or step <= 0:
+        raise ValueError("The block size and the step must be positive")
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    block_count = (len(data) - block_size) // step + 1 if len(data) >= block_size else 0
+    # A block holds at most block_size of a byte value, 32 bits halve the memory of the counts
+    counts = numpy.zeros((block_count, 256), dtype=numpy.int32)
+
+    # Every block gets its own range of 256 bins, so a single bincount counts all the blocks of a chunk. The bins
+    # are built with a single addition, which widens the bytes while adding the range of their block
+    chunk_blocks = max(1, _CHUNK_BYTES // block_size)
+    bases = (numpy.arange(chunk_blocks, dtype=numpy.intp) * 256)[:, None]
+    for first in range(0, block_count, chunk_blocks):
+        blocks = min(chunk_blocks, block_count - first)
+        bins = bases[:blocks] + as_strided(data[first * step:], shape=(blocks, block_size), strides=(step, 1))
+        counts[first:first + blocks] = numpy.bincount(bins.ravel(), minlength=blocks * 256).reshape(blocks, 256)
+    return numpy.arange(block_count, dtype=numpy.int64) * step, counts
+
+
+def _entropies(counts, block_size):
+    """
+    Compute the Shannon entropy of blocks from their byte counts.
+    :param counts: numpy array of shape (blocks, 256) of the byte counts.
+    :param block_size: The size of the blocks.
+    :return: numpy array of the entropies in bits per byte.
+    """
+    # The entropy is log2(size) - sum(c * log2(c)) / size, the c * log2(c) terms come from a table
+    terms = numpy.zeros(block_size + 1)
+    terms[1:] = numpy.arange(1, block_size + 1) * numpy.log2(numpy.arange(1, block_size + 1))
+    # The terms are looked up a chunk of blocks at a time, so their table of floats stays small
+    sums = numpy.zeros(len(counts))
+    chunk_blocks = max(1, _CHUNK_BYTES // 256)
+    for first in range(0, len(counts), chunk_blocks):
+        sums[first:first + chunk_blocks] = terms[counts[first:first + chunk_blocks]].sum(axis=1)
+    return numpy.log2(block_size) - sums / block_size
+
+
+def _chi_square(counts):
+    """
+    Compute the chi-square statistic of byte counts against uniform bytes.
+    :param counts: numpy array of the 256 byte counts.
+    :return: The statistic, about 255 for random bytes.
+    """
+    expected = counts.sum() / 256.0
+    return float(((counts - expected) ** 2).sum() / expected) if expected else 0.0
+
+
+def block_entropy(buffer, block_size=DEFAULT_BLOCK_SIZE, step=None):
+    """
+    Function that computes the Shannon entropy of every block of a buffer.
+    :param buffer: A bytes like object or a mmap.
+    :param block_size: Optional. The size of the blocks.
+    :param step: Optional. The distance between the starts of two blocks, the block size by default.
+    :return: Tuple of numpy arrays of (block offsets, entropies in bits per byte).
+    """
+    offsets, counts = block_counts(buffer, block_size, step)
+    return offsets, _entropies(counts, block_size)
+
+
+def find_regions(buffer, block_size=DEFAULT_BLOCK_SIZE, step=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Function that finds the regions of a buffer which look encrypted or compressed.
+    The neighbouring blocks above the threshold are merged, a region is encrypted when its bytes are as uniform as
+    random data and compressed otherwise.
+    :param buffer: A bytes like object or a mmap.
+    :param block_size: Optional. The size of the blocks.
+    :param step: Optional. The distance between the starts of two blocks, the block size by default.
+    :param threshold: Optional. The lowest entropy of a block in a region, in bits per byte.
+    :return: List of EntropyRegion sorted by offset.
+    """
+    offsets, counts = block_counts(buffer, block_size, step)
+    return _regions(buffer, offsets, counts, block_size, step, threshold)
+
+
+def _regions(buffer, offsets, counts, block_size, step, threshold):
+    """
+    Merge the blocks above the threshold into regions.
+    :param buffer: A bytes like object or a mmap.
+    :param offsets: numpy array of the block offsets.
+    :param counts: numpy array of shape (blocks, 256) of the byte counts.
+    :param block_size: The size of the blocks.
+    :param step: The distance between the starts of two blocks, None when it is the block size.
+    :param threshold: The lowest entropy of a block in a region, in bits per byte.
+    :return: List of EntropyRegion sorted by offset.
+    """
+    entropies = _entropies(counts, block_size)
+    high = entropies >= threshold
+    if not high.any():
+        return []
+
+    # The runs of high blocks start where a block is high and the one before it is not
+    edges = numpy.diff(numpy.concatenate(([0], high.astype(numpy.int8), [0])))
+    runs = []
+    for first, last in zip(numpy.flatnonzero(edges == 1).tolist(), numpy.flatnonzero(edges == -1).tolist()):
+        start = int(offsets[first])
+        end = int(offsets[last - 1]) + block_size
+        # Overlapping blocks may touch the previous run
+        if runs and start <= runs[-1][1]:
+            start, _, first, _ = runs.pop()
+        runs.append((start, end, first, last))
+
+    # The uniformity of a whole region tells compressed data from encrypted data better than the one of a block.
+    # Blocks which do not overlap add up to the counts of the region, overlapping ones are counted again
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    regions = []
+    for start, end, first, last in runs:
+        if step is None or step == block_size:
+            region_counts = counts[first:last].sum(axis=0)
+        else:
+            region_counts = numpy.bincount(data[start:end], minlength=256)
+        kind = "encrypted" if _chi_square(region_counts) <= CHI_SQUARE_LIMIT else "compressed"
+        regions.append(EntropyRegion(start, end, round(float(entropies[first:last].mean()), 4), kind))
+    return regions
+
+
+def entropy_version(block_size=DEFAULT_BLOCK_SIZE, step=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Function that returns the version of the regions, which depend on the profiler and on its parameters.
+    :param block_size: Optional. The size of the blocks.
+    :param step: Optional. The distance between the starts of two blocks, the block size by default.
+    :param threshold: Optional. The lowest entropy of a block in a region.
+    :return: String holding the version and the parameters.
+    """
+    return "%d.%d.%d.%s" % (ENTROPY_VERSION, block_size, step or block_size, threshold)
+
+
+def region_records(regions):
+    """
+    Function that turns the regions into the records of the result store.
+    :param regions: List of EntropyRegion.
+    :return: List of (offset, kind, description) tuples.
+    """
+    return [(region.start, region.kind, "%s data, %d bytes, entropy %.4f" %
+             (region.kind.capitalize(), region.end - region.start, region.entropy)) for region in regions]
+
+
+def profile_report(binary_path, buffer, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Function that finds the encrypted and compressed regions of a binary and builds the report the profiler prints.
+    :param binary_path: Path to the binary.
+    :param buffer: A bytes like object or a mmap.
+    :param block_size: Optional. The size of the blocks.
+    :return: Tuple of (list of EntropyRegion sorted by offset, list of report lines).
+    """
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    offsets, counts = block_counts(data, block_size)
+    regions = _regions(data, offsets, counts, block_size, None, DEFAULT_THRESHOLD)
+    # The blocks do not overlap, so their counts and the ones of the bytes after the last block add up to the counts
+    # of the binary
+    binary_entropy = 0.0
+    if len(data):
+        binary_entropy = _counts_entropy(counts.sum(axis=0, dtype=numpy.int64) +
+                                         _byte_counts(data[len(offsets) * block_size:]))
+    lines = ["%.4f %s" % (binary_entropy, binary_path)]
+    lines.extend("  %08x - %08x  %.4f %s" % (region.start, region.end, region.entropy, region.kind)
+                 for region in regions)
+    return regions, lines
+
+
+def profile_file(binary_path, block_size=DEFAULT_BLOCK_SIZE, step=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Function that memory maps a binary and finds its encrypted and compressed regions.
+    :param binary_path: Path to the binary.
+    :param block_size: Optional. The size of the blocks.
+    :param step: Optional. The distance between the starts of two blocks, the block size by default.
+    :param threshold: Optional. The lowest entropy of a block in a region.
+    :return: List of EntropyRegion sorted by offset.
+    """
+    with open(binary_path, "rb") as binary:
+        if os.fstat(binary.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+            return find_regions(mapped_binary, block_size, step, threshold)
+
+
+if __name__ == "__main__":
+
+    # Print the entropy and the high entropy regions of the given binaries, with an optional block size
+    if len(sys.argv) < 2:
+        print("Usage: %s [-b BLOCK SIZE] [BINARY] ... [BINARY]" % sys.argv[0])
+        exit(1)
+
+    binary_files = sys.argv[1:]
+    profile_block_size = DEFAULT_BLOCK_SIZE
+    if binary_files[0] == "-b" and len(binary_files) > 2:
+        profile_block_size = int(binary_files[1])
+        binary_files = binary_files[2:]
+
+    for binary_file in binary_files:
+        try:
+            with open(binary_file, "rb") as binary:
+                report_lines = profile_report(binary_file, b"", profile_block_size)[1]
+                if os.fstat(binary.fileno()).st_size:
+                    with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+                        report_lines = profile_report(binary_file, mapped_binary, profile_block_size)[1]
+            print("\n".join(report_lines))
+            print("")
+        except (OSError, ValueError) as e:
+            print("An error occurred - %s" % e)
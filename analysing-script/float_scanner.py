@@ -0,0 +1,255 @@
+"""
+Module responsible with searching the signsrch FLOAT signatures with a tolerance.
+A table stored with a slightly different rounding is not found by the exact scanner, so the binary is viewed as
+float and double values at every offset, in both endianness, and compared with the signatures in ULPs.
+"""
+import mmap
+import os
+import sys
+
+import numpy
+
+from signature_database import EndianEnum, KindEnum, load_database, SignatureFileError
+from signature_scanner import format_hit, Hit
+
+
+# The default distance, in units in the last place, allowed between a value and the signature value
+DEFAULT_ULPS = 4
+# Candidates are verified in blocks to bound the memory used by the verification
+_VERIFY_BLOCK = 4096
+# The number of elements compared for every candidate before the whole table is
+_FIRST_ELEMENTS = 4
+# The candidates are found from the highest 16 bits of one element of every signature
+_KEY_BITS = 16
+
+
+def _raw_values(data, offsets, width, endian):
+    """
+    Read the raw integer values of the given width at arbitrary byte offsets.
+    :param data: numpy.uint8 array with the binary.
+    :param offsets: numpy array of byte offsets.
+    :param width: The value width in bytes.
+    :param endian: EndianEnum of the values.
+    :return: numpy.uint64 array of the values.
+    """
+    values = numpy.zeros(offsets.shape, dtype=numpy.uint64)
+    for byte in range(width):
+        shift = 8 * byte if endian == EndianEnum.LITTLE else 8 * (width - 1 - byte)
+        values |= data[offsets + byte].astype(numpy.uint64) << numpy.uint64(shift)
+    return values
+
+
+def _ulp_distance(values, expected, width):
+    """
+    Compute the distance in ULPs between raw float values, the values are sign and magnitude integers.
+    :param values: numpy.uint64 array of raw values.
+    :param expected: numpy.uint64 array of raw values broadcastable to values.
+    :param width: The value width in bytes.
+    :return: numpy.uint64 array of distances.
+    """
+    sign = numpy.uint64(1 << (8 * width - 1))
+    magnitude_mask = numpy.uint64((1 << (8 * width - 1)) - 1)
+    magnitude = values & magnitude_mask
+    expected_magnitude = expected & magnitude_mask
+    same_sign = (values & sign) == (expected & sign)
+    difference = numpy.where(magnitude >= expected_magnitude, magnitude - expected_magnitude,
+                             expected_magnitude - magnitude)
+    # Both magnitudes are below the sign bit, so their sum can not overflow
+    return numpy.where(same_sign, difference, magnitude + expected_magnitude)
+
+
+def _select_anchor(values, width):
+    """
+    Select the element used to find the candidates, the one least likely to show up in unrelated data.
+    Round values like 0.0, 0.5 or 1.0 have many trailing zero bits and are common in code, so they are avoided.
+    :param values: numpy.uint64 array with the raw signature values.
+    :param width: The value width in bytes.
+    :return: Index of the anchor element.
+    """
+    def _trailing_zeros(value):
+        value = int(value) & ((1 << (8 * width - 1)) - 1)
+        return 8 * width if value == 0 else (value & -value).bit_length() - 1
+    return min(range(len(values)), key=lambda index: (_trailing_zeros(values[index]), index))
+
+
+def _key_range(value, width, ulps):
+    """
+    Compute the range of the highest 16 bits of the raw values within the tolerance of a value.
+    :param value: The raw value.
+    :param width: The value width in bytes.
+    :param ulps: The tolerance in ULPs.
+    :return: List of (first key, last key) tuples.
+    """
+    bits = 8 * width
+    sign = 1 << (bits - 1)
+    magnitude = int(value) & (sign - 1)
+    value_sign = int(value) & sign
+    shift = bits - _KEY_BITS
+    ranges = [((value_sign | max(magnitude - ulps, 0)) >> shift,
+               (value_sign | min(magnitude + ulps, sign - 1)) >> shift)]
+    if magnitude <= ulps:
+        other_sign = value_sign ^ sign
+        ranges.append((other_sign >> shift, (other_sign | (ulps - magnitude)) >> shift))
+    return ranges
+
+
+class FloatSignature:
+    """
+    Class that holds the raw values of a FLOAT signature and the anchor used to find its candidates.
+    """
+
+    def __init__(self, signature, ulps):
+        self.signature_id = signature.signature_id
+        self.endian = signature.endian
+        self.width = signature.width
+        dtype = "%su%d" % (">" if signature.endian == EndianEnum.BIG else "<", signature.width)
+        self.values = numpy.frombuffer(signature.data, dtype=dtype).astype(numpy.uint64)
+        self.anchor = _select_anchor(self.values, self.width)
+        self.key_ranges = _key_range(self.values[self.anchor], self.width, ulps)
+        self.length = len(signature.data)
+
+
+class FloatScanner:
+    """
+    Class that searches the FLOAT signatures of a database with a tolerance in ULPs.
+    """
+
+    def __init__(self, database, ulps=DEFAULT_ULPS):
+        """
+        Prepare every FLOAT signature of the database. The AND signatures are left to the and_matcher module.
+        :param database: The SignatureDatabase.
+        :param ulps: Optional. The distance allowed between a value and the signature value.
+        """
+        self.database = database
+        self.ulps = ulps
+        self.signatures = [FloatSignature(signature, ulps) for signature in database
+                           if signature.kind == KindEnum.FLOAT and not signature.is_and and len(signature.data)]
+        self._anchor_keys = {}
+        for endian in (EndianEnum.LITTLE, EndianEnum.BIG):
+            self._anchor_keys[endian] = numpy.zeros(1 << _KEY_BITS, dtype=bool)
+        for signature in self.signatures:
+            for first_key, last_key in signature.key_ranges:
+                self._anchor_keys[signature.endian][first_key:last_key + 1] = True
+
+    def _candidates(self, keys, signature):
+        """
+        Find the offsets where a signature may start, from the key of its anchor element.
+        :param keys: Tuple of (sorted keys, their offsets) for the endianness of the signature.
+        :param signature: The FloatSignature.
+        :return: numpy array of candidate start offsets.
+        """
+        sorted_keys, key_offsets = keys
+        # The highest 16 bits are the last two bytes of a little endian value and the first two of a big endian one
+        key_position = signature.width - 2 if signature.endian == EndianEnum.LITTLE else 0
+        found = []
+        for first_key, last_key in signature.key_ranges:
+            start = numpy.searchsorted(sorted_keys, first_key, side="left")
+            end = numpy.searchsorted(sorted_keys, last_key, side="right")
+            found.append(key_offsets[start:end])
+        offsets = numpy.concatenate(found) - key_position - signature.anchor * signature.width
+        return offsets[offsets >= 0]
+
+    def _verify(self, data, signature, offsets):
+        """
+        Keep the candidate offsets where every value is within the tolerance of the signature.
+        :param data: numpy.uint8 array with the binary.
+        :param signature: The FloatSignature.
+        :param offsets: numpy array of candidate start offsets.
+        :return: Sorted numpy array of the matching offsets.
+        """
+        offsets = numpy.unique(offsets[offsets + signature.length <= len(data)])
+        ulps = numpy.uint64(self.ulps)
+
+        # Most candidates are rejected by the elements around the anchor, the whole table is compared only
+        # for the ones left
+        first = max(signature.anchor - _FIRST_ELEMENTS // 2, 0)
+        for elements in (slice(first, first + _FIRST_ELEMENTS), slice(0, len(signature.values))):
+            element_offsets = numpy.arange(len(signature.values))[elements] * signature.width
+            expected = signature.values[elements][None, :]
+            matches = []
+            for block in range(0, len(offsets), _VERIFY_BLOCK):
+                block_offsets = offsets[block:block + _VERIFY_BLOCK]
+                values = _raw_values(data, block_offsets[:, None] + element_offsets[None, :], signature.width,
+                                     signature.endian)
+                distances = _ulp_distance(values, expected, signature.width)
+                matches.append(block_offsets[numpy.all(distances <= ulps, axis=1)])
+            if not matches:
+                break
+            offsets = numpy.concatenate(matches)
+        return offsets
+
+    def scan(self, buffer):
+        """
+        Method that searches all the FLOAT signatures in a buffer.
+        :param buffer: A bytes like object or a mmap.
+        :return: List of Hit sorted by offset and signature id.
+        """
+        data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+        if len(data) < 2:
+            return []
+
+        # The 16 bit keys at every offset are looked up in a table of the anchor keys and only the offsets
+        # holding one of them are sorted, so every signature only needs a binary search
+        keys = {}
+        low = data[:-1].astype(numpy.uint16)
+        high = data[1:].astype(numpy.uint16)
+        for endian in (EndianEnum.LITTLE, EndianEnum.BIG):
+            if endian == EndianEnum.LITTLE:
+                key_values = low | (high << numpy.uint16(8))
+            else:
+                key_values = (low << numpy.uint16(8)) | high
+            key_offsets = numpy.flatnonzero(self._anchor_keys[endian][key_values])
+            key_values = key_values[key_offsets]
+            order = numpy.argsort(key_values, kind="mergesort")
+            keys[endian] = (key_values[order], key_offsets[order])
+
+        hits = []
+        for signature in self.signatures:
+            offsets = self._candidates(keys[signature.endian], signature)
+            if len(offsets):
+                for offset in self._verify(data, signature, offsets):
+                    hits.append(Hit(signature.signature_id, int(offset), signature.endian))
+        hits.sort(key=lambda hit: (hit.offset, hit.signature_id))
+        return hits
+
+    def scan_file(self, binary_path):
+        """
+        Method that memory maps a binary and searches all the FLOAT signatures in it.
+        :param binary_path: Path to the binary.
+        :return: List of Hit sorted by offset and signature id.
+        """
+        with open(binary_path, "rb") as binary:
+            if os.fstat(binary.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+                return self.scan(mapped_binary)
+
+
+if __name__ == "__main__":
+
+    # Search the FLOAT signatures in the given binaries, with an optional tolerance
+    if len(sys.argv) < 2:
+        print("Usage: %s [-u ULPS] [BINARY] ... [BINARY]" % sys.argv[0])
+        exit(1)
+
+    binary_files = sys.argv[1:]
+    tolerance = DEFAULT_ULPS
+    if binary_files[0] == "-u" and len(binary_files) > 2:
+        tolerance = int(binary_files[1])
+        binary_files = binary_files[2:]
+
+    try:
+        signature_database = load_database()
+    except SignatureFileError as e:
+        print("A signature file error occurred - %s" % e)
+        exit(1)
+
+    scanner = FloatScanner(signature_database, tolerance)
+    for binary_file in binary_files:
+        try:
+            print("%s" % binary_file)
+            for found_hit in scanner.scan_file(binary_file):
+                print("%s" % format_hit(signature_database, found_hit))
+            print("")
+        except OSError as e:
+            print("An OS error occurred - %s" % e)
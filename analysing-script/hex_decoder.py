@@ -0,0 +1,230 @@
+"""
+Module responsible with decoding the Intel HEX and the Motorola S-record binaries into their memory image.
+Many binaries of the corpus are HEX files renamed to .bin. Their bytes are written as hexadecimal text, split in
+records, so the signatures and the entropy of their ASCII form mean nothing and every table is missed. The format is
+sniffed from the first records, not from the extension, and the records are decoded one line after the other into the
+sparse memory image they load, with the load address of every segment and the file offset of every record, so a hit
+in the image is reported at its load address and at the offset of its text in the file.
+"""
+from collections import namedtuple
+
+import binascii
+import re
+import sys
+
+import numpy
+
+
+# The formats of the decoded binaries
+INTEL_HEX = "ihex"
+SREC = "srec"
+# The gaps between the records up to this length are filled with erased flash, the longer ones start a new segment
+MAX_GAP = 64 * 1024
+GAP_FILL = 0xff
+# The records looked at to sniff the format
+_SNIFF_LENGTH = 4096
+_LINES = re.compile(rb"[^\r\n]+")
+# The number of address bytes of every S-record type
+_SREC_ADDRESS_LENGTHS = {ord("0"): 2, ord("1"): 2, ord("2"): 3, ord("3"): 4, ord("5"): 2, ord("6"): 3,
+                         ord("7"): 4, ord("8"): 3, ord("9"): 2}
+_SREC_DATA_TYPES = b"123"
+_SREC_END_TYPES = b"789"
+
+ImageSegment = namedtuple("ImageSegment", ["offset", "address", "length"])
+
+
+class HexRecordError(Exception):
+    """
+    Exception raised when a record cannot be decoded.
+    """
+    pass
+
+
+def _parse_record(line):
+    """
+    Decode a record of either format.
+    :param line: The record, without the line end and the blanks around it.
+    :return: Tuple of (format, record type, address, data, offset of the data in the record), the record type is an
+    Intel HEX type, or the S-record digit as a byte value.
+    """
+    try:
+        if line[:1] == b":":
+            fields = binascii.unhexlify(line[1:])
+            if len(fields) < 5 or fields[0] != len(fields) - 5 or sum(fields) & 0xff:
+                raise HexRecordError("Invalid Intel HEX record")
+            return INTEL_HEX, fields[3], int.from_bytes(fields[1:3], "big"), fields[4:-1], 9
+        if line[:1] == b"S" and line[1] in _SREC_ADDRESS_LENGTHS:
+            fields = binascii.unhexlify(line[2:])
+            address_length = _SREC_ADDRESS_LENGTHS[line[1]]
+            if len(fields) < address_length + 2 or fields[0] != len(fields) - 1 or sum(fields) & 0xff != 0xff:
+                raise HexRecordError("Invalid S-record")
+            return (SREC, line[1], int.from_bytes(fields[1:address_length + 1], "big"), fields[address_length + 1:-1],
+                    4 + 2 * address_length)
+    except (binascii.Error, ValueError, IndexError):
+        pass
+    raise HexRecordError("Invalid record %r" % bytes(line[:16]))
+
+
+def sniff_format(buffer):
+    """
+    Function that tells whether a binary is an Intel HEX or an S-record file, from the records of its first bytes.
+    :param buffer: A bytes like object or a mmap.
+    :return: INTEL_HEX, SREC or None.
+    """
+    head = bytes(buffer[:_SNIFF_LENGTH])
+    lines = head.split(b"\n")
+    if len(buffer) > _SNIFF_LENGTH:
+        # The last line may go on past the sniffed bytes
+        lines = lines[:-1]
+    formats = set()
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            formats.add(_parse_record(line)[0])
+        except HexRecordError:
+            return None
+    return formats.pop() if len(formats) == 1 else None
+
+
+class MemoryImage:
+    """
+    Class that holds the memory image of a decoded binary and translates its offsets to load addresses and to file
+    offsets.
+    """
+
+    def __init__(self, image_format, buffer, segments, record_offsets, record_file_offsets, record_lengths):
+        """
+        :param image_format: INTEL_HEX or SREC.
+        :param buffer: bytes holding the segments one after the other, their gaps filled.
+        :param segments: List of ImageSegment, sorted by offset.
+        :param record_offsets: numpy array of the offsets of the records in the image, sorted.
+        :param record_file_offsets: numpy array of the offsets of the data of the records in the file.
+        :param record_lengths: numpy array of the numbers of data bytes of the records.
+        """
+        self.format = image_format
+        self.buffer = buffer
+        self.segments = segments
+        self._segment_offsets = numpy.array([segment.offset for segment in segments], dtype=numpy.int64)
+        self._record_offsets = record_offsets
+        self._record_file_offsets = record_file_offsets
+        self._record_lengths = record_lengths
+
+    def address(self, offset):
+        """
+        Method that returns the load address of a byte of the image.
+        :param offset: The offset in the image.
+        :return: The load address.
+        """
+        segment = self.segments[max(int(numpy.searchsorted(self._segment_offsets, offset, "right")) - 1, 0)]
+        return segment.address + offset - segment.offset
+
+    def file_offset(self, offset):
+        """
+        Method that returns the offset in the file of the hexadecimal digits of a byte of the image.
+        :param offset: The offset in the image.
+        :return: The offset in the file, or None when the byte fills a gap between the records.
+        """
+        record = int(numpy.searchsorted(self._record_offsets, offset, "right")) - 1
+        if record < 0 or offset >= self._record_offsets[record] + self._record_lengths[record]:
+            return None
+        return int(self._record_file_offsets[record] + 2 * (offset - self._record_offsets[record]))
+
+
+def decode_image(buffer, max_gap=MAX_GAP):
+    """
+    Function that decodes an Intel HEX or an S-record binary into its memory image, reading its records one line
+    after the other. The records written to the same address more than once keep the last data.
+    :param buffer: A bytes like object or a mmap.
+    :param max_gap: Optional. The longest gap between the records filled with erased flash.
+    :return: MemoryImage.
+    """
+    image_format = None
+    addresses = []
+    file_offsets = []
+    chunks = []
+    # The Intel HEX extended segment and linear address records move the base of the next records
+    base = 0
+    for match in _LINES.finditer(buffer):
+        line = match.group().strip()
+        if not line:
+            continue
+        record_format, record_type, address, data, data_offset = _parse_record(line)
+        if image_format is None:
+            image_format = record_format
+        elif record_format != image_format:
+            raise HexRecordError("Intel HEX and S-records are mixed")
+        file_offset = match.start() + len(match.group()) - len(match.group().lstrip()) + data_offset
+        if record_format == INTEL_HEX:
+            if record_type == 0x00 and data:
+                addresses.append(base + address)
+                file_offsets.append(file_offset)
+                chunks.append(data)
+            elif record_type == 0x01:
+                break
+            elif record_type in (0x02, 0x04) and len(data) == 2:
+                base = int.from_bytes(data, "big") << (4 if record_type == 0x02 else 16)
+        elif record_type in _SREC_DATA_TYPES and data:
+            addresses.append(address)
+            file_offsets.append(file_offset)
+            chunks.append(data)
+        elif record_type in _SREC_END_TYPES:
+            break
+    if image_format is None:
+        raise HexRecordError("No records")
+
+    # The records are laid out by address, the segments are the runs of records with short gaps between them
+    order = sorted(range(len(chunks)), key=addresses.__getitem__)
+    segments = []
+    record_offsets = [0] * len(chunks)
+    segment_end = None
+    length = 0
+    for record in order:
+        address = addresses[record]
+        if segment_end is None or address > segment_end + max_gap:
+            segments.append(ImageSegment(length, address, 0))
+            segment_end = address
+        segment = segments[-1]
+        record_offsets[record] = segment.offset + address - segment.address
+        segment_end = max(segment_end, address + len(chunks[record]))
+        length = segment.offset + segment_end - segment.address
+        segments[-1] = segment._replace(length=segment_end - segment.address)
+
+    image = bytearray([GAP_FILL]) * length
+    for record_offset, chunk in zip(record_offsets, chunks):
+        image[record_offset:record_offset + len(chunk)] = chunk
+    by_offset = numpy.argsort(numpy.array(record_offsets, dtype=numpy.int64), kind="mergesort")
+    return MemoryImage(image_format, bytes(image), segments,
+                       numpy.array(record_offsets, dtype=numpy.int64)[by_offset],
+                       numpy.array(file_offsets, dtype=numpy.int64)[by_offset],
+                       numpy.array([len(chunk) for chunk in chunks], dtype=numpy.int64)[by_offset])
+
+
+if __name__ == "__main__":
+
+    # Decode a binary and print its segments, or write its memory image
+    if len(sys.argv) not in (2, 3):
+        print("Usage: %s [BINARY] [IMAGE FILE]" % sys.argv[0])
+        exit(1)
+
+    try:
+        with open(sys.argv[1], "rb") as binary_file:
+            binary_content = binary_file.read()
+        if sniff_format(binary_content) is None:
+            print("%s is neither an Intel HEX nor an S-record file" % sys.argv[1])
+            exit(1)
+        memory_image = decode_image(binary_content)
+        print("Format: %s" % memory_image.format)
+        for image_segment in memory_image.segments:
+            print("  %08x %08x-%08x %d bytes" % (image_segment.offset, image_segment.address,
+                                                 image_segment.address + image_segment.length, image_segment.length))
+        if len(sys.argv) == 3:
+            with open(sys.argv[2], "wb") as image_file:
+                image_file.write(memory_image.buffer)
+    except HexRecordError as e:
+        print("A record error occurred - %s" % e)
+        exit(1)
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
+        exit(1)
@@ -0,0 +1,294 @@
+"""
+Module responsible with the inverted index of the signatures found in the corpus.
+Analyse-Reports builds its signature to binaries table in memory and throws it away once the report is written. The
+index is kept on disk in both directions, the binaries of every signature and the signatures of every binary, as
+sorted arrays of integer ids which are memory mapped when the index is opened. A query like
+"AES and not CRC32" is answered with merges of the sorted arrays, without reading any report or scanning any binary.
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+
+import numpy
+
+from result_store import ResultStore
+from results_history import StringPool, binary_signatures, load_results
+from signature_database import DEFAULT_CACHE_PATH
+
+
+# Bump it when the layout of the index changes, the indexes of older versions have to be built again
+INDEX_VERSION = 2
+DEFAULT_INDEX_PATH = os.path.join(DEFAULT_CACHE_PATH, "index")
+
+_NAMES_FILE = "names.json"
+# The posting lists of all the signatures are concatenated, the offsets array holds where every one of them starts
+_ARRAY_FILES = ("signature_offsets", "signature_postings", "binary_offsets", "binary_postings")
+# Quoted texts, parentheses or words
+_TOKENS = re.compile(r'"([^"]*)"|([()])|([^\s()"]+)')
+_OPERATORS = ("and", "or", "not")
+
+
+def index_directory(analyser, index_path=DEFAULT_INDEX_PATH):
+    """
+    Function that returns the directory of the index of an analyser.
+    :param analyser: The name of the analyser.
+    :param index_path: Optional. The directory holding the indexes.
+    :return: The directory of the index.
+    """
+    return os.path.join(index_path, analyser)
+
+
+def _posting_lists(keys, values, key_count):
+    """
+    Build the posting lists of a relation, the values of every key in increasing order.
+    :param keys: numpy array of the keys.
+    :param values: numpy array of the values, sorted for every key.
+    :param key_count: The number of keys.
+    :return: Tuple of numpy arrays of (offsets of the lists, concatenated lists).
+    """
+    offsets = numpy.zeros(key_count + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(keys, minlength=key_count), out=offsets[1:])
+    return offsets, values.astype(numpy.int32)
+
+
+def build_index(records, directory):
+    """
+    Function that builds the index of a list of records and writes it to a directory.
+    :param records: List of (path, signature, description) tuples, a None signature marks a binary without signatures.
+    :param directory: The directory of the index, it is replaced.
+    :return: Tuple of (number of binaries, number of signatures).
+    """
+    binaries = StringPool()
+    signatures = StringPool()
+    descriptions = []
+    pairs = []
+    for path, signature, description in records:
+        binary = binaries.intern(path)
+        if signature is None:
+            continue
+        signature_id = signatures.intern(signature)
+        if signature_id == len(descriptions):
+            descriptions.append(description)
+        pairs.append((binary, signature_id))
+
+    # Every pair is coded in a single integer, unique then sorts them by binary and by signature
+    codes = numpy.unique(numpy.array(pairs, dtype=numpy.int64).reshape(-1, 2).dot([len(signatures), 1]))
+    binary_ids = codes // max(len(signatures), 1)
+    signature_ids = codes % max(len(signatures), 1)
+    by_signature = numpy.lexsort((binary_ids, signature_ids))
+    arrays = _posting_lists(signature_ids[by_signature], binary_ids[by_signature], len(signatures)) + \
+        _posting_lists(binary_ids, signature_ids, len(binaries))
+
+    os.makedirs(directory, exist_ok=True)
+    for name, array in zip(_ARRAY_FILES, arrays):
+        numpy.save(os.path.join(directory, name + ".tmp.npy"), array)
+        os.replace(os.path.join(directory, name + ".tmp.npy"), os.path.join(directory, name + ".npy"))
+    # The names are written last with the lengths of the arrays, an index whose arrays were replaced without its
+    # names does not have these lengths and is not opened
+    names_path = os.path.join(directory, _NAMES_FILE)
+    with open(names_path + ".tmp", "w", encoding="utf-8") as names:
+        json.dump({"version": INDEX_VERSION, "binaries": binaries.strings,
+                   "signatures": list(zip(signatures.strings, descriptions)),
+                   "lengths": [len(array) for array in arrays]}, names)
+    os.replace(names_path + ".tmp", names_path)
+    return len(binaries), len(signatures)
+
+
+def _tokenize(text):
+    """
+    Split a query into its tokens.
+    :param text: The query.
+    :return: List of tokens, the operators in lower case, the terms as ("term", text) tuples.
+    """
+    tokens = []
+    # Only a term of unquoted words goes on with the next unquoted word
+    joinable = False
+    for quoted, parenthesis, word in _TOKENS.findall(text):
+        if parenthesis:
+            tokens.append(parenthesis)
+            joinable = False
+        elif word and word.lower() in _OPERATORS:
+            tokens.append(word.lower())
+            joinable = False
+        elif joinable and not quoted:
+            # The words of a term follow each other, like "AES S-box"
+            tokens[-1] = ("term", tokens[-1][1] + " " + word)
+        else:
+            tokens.append(("term", quoted or word))
+            joinable = not quoted
+    return tokens
+
+
+def parse_query(text):
+    """
+    Function that parses a query into a tree, NOT binds tighter than AND, which binds tighter than OR.
+    :param text: The query, like "AES S-box and not (CRC32 or CRC16)".
+    :return: Tree of ("or", left, right), ("and", left, right), ("not", operand) and ("term", text) tuples.
+    """
+    tokens = _tokenize(text)
+    position = [0]
+
+    def peek():
+        return tokens[position[0]] if position[0] < len(tokens) else None
+
+    def take(expected=None):
+        token = peek()
+        if token is None or (expected is not None and token != expected):
+            raise ValueError("Unexpected %s in the query" % ("end" if token is None else repr(token)))
+        position[0] += 1
+        return token
+
+    def operand():
+        if peek() == "not":
+            take()
+            return "not", operand()
+        if peek() == "(":
+            take()
+            tree = disjunction()
+            take(")")
+            return tree
+        token = take()
+        if not isinstance(token, tuple):
+            raise ValueError("Unexpected %r in the query" % token)
+        return token
+
+    def conjunction():
+        tree = operand()
+        while peek() == "and":
+            take()
+            tree = "and", tree, operand()
+        return tree
+
+    def disjunction():
+        tree = conjunction()
+        while peek() == "or":
+            take()
+            tree = "or", tree, conjunction()
+        return tree
+
+    tree = disjunction()
+    if peek() is not None:
+        raise ValueError("Unexpected %r in the query" % (peek(),))
+    return tree
+
+
+class InvertedIndex:
+    """
+    Class that opens an index and answers the queries over it.
+    """
+
+    def __init__(self, directory):
+        """
+        Open an index, its arrays are memory mapped.
+        :param directory: The directory of the index.
+        """
+        with open(os.path.join(directory, _NAMES_FILE), encoding="utf-8") as names_file:
+            names = json.load(names_file)
+        if names["version"] != INDEX_VERSION:
+            raise ValueError("The index was built by another version, build it again")
+        self.binaries = names["binaries"]
+        self.signatures = [tuple(signature) for signature in names["signatures"]]
+        arrays = []
+        for name in _ARRAY_FILES:
+            array_path = os.path.join(directory, name + ".npy")
+            try:
+                arrays.append(numpy.load(array_path, mmap_mode="r"))
+            except ValueError:
+                # Empty arrays cannot be mapped
+                arrays.append(numpy.load(array_path))
+        if [len(array) for array in arrays] != names["lengths"]:
+            raise ValueError("The index was not fully written, build it again")
+        self._binary_ids = {binary_path: binary_id for binary_id, binary_path in enumerate(self.binaries)}
+        self._signature_offsets, self._signature_postings, self._binary_offsets, self._binary_postings = arrays
+
+    def binaries_of(self, signature_id):
+        """
+        Method that returns the posting list of a signature.
+        :param signature_id: The id of the signature in the index.
+        :return: Sorted numpy array of the ids of the binaries holding the signature.
+        """
+        return self._signature_postings[self._signature_offsets[signature_id]:self._signature_offsets[signature_id + 1]]
+
+    def signatures_of(self, binary_path):
+        """
+        Method that returns the signatures found in a binary.
+        :param binary_path: The path of the binary, as it was indexed.
+        :return: List of (signature, description) tuples, empty when the binary is not indexed.
+        """
+        binary_id = self._binary_ids.get(binary_path)
+        if binary_id is None:
+            return []
+        signature_ids = self._binary_postings[self._binary_offsets[binary_id]:self._binary_offsets[binary_id + 1]]
+        return [self.signatures[signature_id] for signature_id in signature_ids]
+
+    def match(self, text):
+        """
+        Method that finds the signatures named by a text, the signature whose name is the text, or else the ones whose
+        description holds it, ignoring the case.
+        :param text: The text, like "1016" or "AES S-box".
+        :return: List of signature ids.
+        """
+        text = text.lower()
+        exact = [signature_id for signature_id, (signature, _) in enumerate(self.signatures)
+                 if signature.lower() == text]
+        return exact or [signature_id for signature_id, (signature, description) in enumerate(self.signatures)
+                         if text in (description or signature).lower()]
+
+    def evaluate(self, tree):
+        """
+        Method that evaluates a parsed query.
+        :param tree: The tree parse_query returns.
+        :return: Sorted numpy array of the ids of the matching binaries.
+        """
+        if tree[0] == "term":
+            lists = [self.binaries_of(signature_id) for signature_id in self.match(tree[1])]
+            return numpy.unique(numpy.concatenate(lists)) if lists else numpy.zeros(0, dtype=numpy.int32)
+        if tree[0] == "not":
+            return numpy.setdiff1d(numpy.arange(len(self.binaries), dtype=numpy.int32), self.evaluate(tree[1]),
+                                   assume_unique=True)
+        left, right = self.evaluate(tree[1]), self.evaluate(tree[2])
+        if tree[0] == "and":
+            return numpy.intersect1d(left, right, assume_unique=True)
+        return numpy.union1d(left, right)
+
+    def query(self, text):
+        """
+        Method that returns the binaries matching a query.
+        :param text: The query, like "AES S-box and not CRC32".
+        :return: List of the paths of the binaries.
+        """
+        return [self.binaries[binary_id] for binary_id in self.evaluate(parse_query(text))]
+
+
+if __name__ == "__main__":
+
+    # Build the index of an analyser from the result store or from a results file, or query it
+    if len(sys.argv) not in (3, 4) or (len(sys.argv) == 4 and sys.argv[2] != "-b"):
+        print("Usage: %s [ANALYSER] -b [RESULTS FILE]" % sys.argv[0])
+        print("       %s [ANALYSER] [QUERY]" % sys.argv[0])
+        exit(1)
+
+    analyser_directory = index_directory(sys.argv[1])
+    try:
+        if sys.argv[2] == "-b":
+            if len(sys.argv) == 4:
+                index_records = binary_signatures(load_results(sys.argv[3]))
+            else:
+                with ResultStore() as store:
+                    index_records = store.binary_signatures(sys.argv[1])
+            print("Indexed %d binaries and %d signatures" % build_index(index_records, analyser_directory))
+            exit(0)
+
+        index = InvertedIndex(analyser_directory)
+        found_paths = index.query(sys.argv[2])
+        for found_path in found_paths:
+            print(found_path)
+        print("Number of binaries: %d" % len(found_paths))
+    except sqlite3.Error as e:
+        print("A store error occurred - %s" % e)
+        exit(1)
+    except (OSError, ValueError) as e:
+        print("An index error occurred - %s" % e)
+        exit(1)
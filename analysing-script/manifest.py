@@ -0,0 +1,135 @@
+"""
+Module responsible with the manifest of the scanned binaries, which makes the corpus scans incremental.
+For every binary and analyser the manifest records the size, the modification time and the content digest of the
+binary and the version of the analyser which wrote its report. A run only scans the binaries added or changed since
+the last one and forgets the binaries which were deleted, so a run after a small crawl takes seconds.
+"""
+import os
+import sqlite3
+import sys
+
+from result_cache import file_digests
+from signature_database import DEFAULT_CACHE_PATH
+
+
+DEFAULT_MANIFEST = os.path.join(DEFAULT_CACHE_PATH, "manifest.sqlite")
+# The workers of a pool share the database, a writer waits this many seconds for the others
+_LOCK_TIMEOUT = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifest (
+    path TEXT NOT NULL,
+    analyser TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    version TEXT NOT NULL,
+    PRIMARY KEY (path, analyser)
+);
+"""
+
+
+class Manifest:
+    """
+    Class that records the state of every binary when its report was written.
+    """
+
+    def __init__(self, manifest_path=DEFAULT_MANIFEST):
+        """
+        Open the manifest, creating it when missing.
+        :param manifest_path: Optional. Path to the SQLite database.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        self._connection = sqlite3.connect(manifest_path, timeout=_LOCK_TIMEOUT)
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def entries(self, base_path, analyser):
+        """
+        Method that returns the entries of the binaries under a directory.
+        :param base_path: The directory.
+        :param analyser: The name of the analyser.
+        :return: Dictionary of absolute path to (size, mtime_ns, sha256, version) tuples.
+        """
+        prefix = os.path.join(os.path.abspath(base_path), "")
+        rows = self._connection.execute("SELECT path, size, mtime_ns, sha256, version FROM manifest "
+                                        "WHERE analyser = ? AND substr(path, 1, ?) = ?",
+                                        (analyser, len(prefix), prefix))
+        return {row[0]: row[1:] for row in rows}
+
+    def plan(self, base_path, binaries, analyser, version, report_extension):
+        """
+        Method that compares the binaries found under a directory with the manifest.
+        A binary is scanned when it is new, when its report is missing, when it was scanned by another version of the
+        analyser or when its content changed. A binary only touched keeps its report and gets its new time recorded.
+        The binaries of the manifest which are not found anymore are removed from it.
+        :param base_path: The directory which was walked.
+        :param binaries: List of (size, path) tuples, like the ones find_binaries returns.
+        :param analyser: The name of the analyser.
+        :param version: The version of the analyser.
+        :param report_extension: The extension of the reports written next to the binaries.
+        :return: Tuple of (list of (size, path) tuples to be scanned, list of the paths removed).
+        """
+        entries = self.entries(base_path, analyser)
+        to_scan = []
+        for size, binary_path in binaries:
+            absolute_path = os.path.abspath(binary_path)
+            entry = entries.pop(absolute_path, None)
+            if entry is None or entry[3] != version or not os.path.exists(binary_path + report_extension):
+                to_scan.append((size, binary_path))
+                continue
+            binary_stat = os.stat(binary_path)
+            if (binary_stat.st_size, binary_stat.st_mtime_ns) == tuple(entry[:2]):
+                continue
+            sha256, _ = file_digests(binary_path)
+            if sha256 == entry[2]:
+                self.update(binary_path, analyser, version, sha256, binary_stat)
+            else:
+                to_scan.append((size, binary_path))
+
+        with self._connection:
+            self._connection.executemany("DELETE FROM manifest WHERE path = ? AND analyser = ?",
+                                         ((deleted_path, analyser) for deleted_path in entries))
+        return to_scan, sorted(entries)
+
+    def update(self, binary_path, analyser, version, sha256, binary_stat):
+        """
+        Method that records the state of a binary whose report was written.
+        :param binary_path: Path to the binary.
+        :param analyser: The name of the analyser.
+        :param version: The version of the analyser.
+        :param sha256: The SHA-256 digest of the binary.
+        :param binary_stat: os.stat_result of the binary, taken before it was read.
+        """
+        with self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?, ?)",
+                                     (os.path.abspath(binary_path), analyser, binary_stat.st_size,
+                                      binary_stat.st_mtime_ns, sha256, version))
+
+    def close(self):
+        """
+        Method that closes the manifest.
+        """
+        self._connection.close()
+
+
+if __name__ == "__main__":
+
+    # Print the entries of the binaries under a directory
+    if len(sys.argv) != 3:
+        print("Usage: %s [ANALYSER] [PATH]" % sys.argv[0])
+        exit(1)
+
+    try:
+        with Manifest() as manifest:
+            for entry_path, (entry_size, _, entry_sha256, entry_version) in sorted(
+                    manifest.entries(sys.argv[2], sys.argv[1]).items()):
+                print("%s %10d %s %s" % (entry_sha256, entry_size, entry_version, entry_path))
+    except sqlite3.Error as e:
+        print("A manifest error occurred - %s" % e)
+        exit(1)
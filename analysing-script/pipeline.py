@@ -0,0 +1,396 @@
+"""
+Module responsible with running all the analysers over every binary with a single read.
+Every binary is memory mapped once and the same buffer, with its padding map, is handed to the signature scan, the
+binwalk scan, the date extraction and the entropy analysers in turn. The results of a binary are gathered in one
+record, written as a line of JSON. The binaries inside archives can be analysed straight from the archive members,
+without being extracted, their records hold the path of the archive and the name of the member. The Intel HEX and
+the S-record binaries are decoded first and the analysers are run over their memory image, the offsets of the image
+are then also reported as load addresses and as offsets in the file.
+"""
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import sys
+import time
+
+from archive_extractor import ArchiveError, DEFAULT_ARCHIVER, DEFAULT_BINS_PATH, DEFAULT_PASSWORDS, ExpansionBudget
+from archive_extractor import archive_members, find_archives, write_member
+from corpus_scanner import find_binaries
+from entropy import shannon_entropy, find_regions
+from hex_decoder import HexRecordError, decode_image, sniff_format
+from prefilter import PrefilterScanner
+from region_map import RegionMap, find_padding, load_region_map
+from signature_database import endian_name, load_database, SignatureFileError
+from strings_extractor import find_dates
+
+
+# The analysers in the order they are run and the default results file
+ANALYSERS = ("signsrch", "binwalk", "strings", "entropy")
+DEFAULT_RESULTS_FILE = "pipeline_results.jsonl"
+
+
+class MappedBinary:
+    """
+    Class that memory maps a binary once, the buffer and the padding map are shared by all the analysers.
+    """
+
+    def __init__(self, binary_path):
+        """
+        :param binary_path: Path to the binary.
+        """
+        self.path = binary_path
+        self.buffer = b""
+        self._file = open(binary_path, "rb")
+        try:
+            if os.fstat(self._file.fileno()).st_size:
+                self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.region_map = load_region_map(binary_path, self.buffer)
+        except BaseException:
+            self.close()
+            raise
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Method that unmaps and closes the binary.
+        """
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self._file.close()
+
+
+class MemoryBinary:
+    """
+    Class that holds a binary read into memory, like an archive member, with the same interface as MappedBinary.
+    The padding map is built from the buffer, it is not cached since the binary has no file.
+    """
+
+    def __init__(self, binary_path, buffer):
+        """
+        :param binary_path: The name the binary is recorded with.
+        :param buffer: bytes or a mmap holding the binary.
+        """
+        self.path = binary_path
+        self.buffer = buffer
+        self.region_map = RegionMap(find_padding(buffer), len(buffer))
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Method that does nothing, the owner of the buffer releases it.
+        """
+        pass
+
+
+class SignatureAnalyser:
+    """
+    Class that searches the signsrch signatures in the data regions of a binary.
+    """
+    name = "signsrch"
+
+    def __init__(self, database=None):
+        """
+        :param database: Optional. The SignatureDatabase, loaded from the cache by default.
+        """
+        self.database = database if database is not None else load_database()
+        self.scanner = PrefilterScanner(self.database)
+
+    def analyse(self, binary):
+        """
+        Method that searches the signatures of a binary.
+        :param binary: The MappedBinary.
+        :return: List of the hits, as dictionaries.
+        """
+        hits = self.scanner.scan(binary.buffer, binary.region_map.data_regions(self.scanner.padding_margin))
+        return [{"offset": hit.offset, "signature": hit.signature_id,
+                 "title": self.database[hit.signature_id].title, "endian": endian_name(hit.endian)}
+                for hit in hits]
+
+
+class BinwalkAnalyser:
+    """
+    Class that scans the data regions of a binary with the binwalk signatures.
+    """
+    name = "binwalk"
+
+    def __init__(self):
+        # binwalk is only needed when this analyser is run
+        from binwalk_scanner import BinwalkScanner
+        self.scanner = BinwalkScanner()
+
+    def analyse(self, binary):
+        """
+        Method that scans a binary with the binwalk signatures.
+        :param binary: The MappedBinary.
+        :return: List of the results, as dictionaries.
+        """
+        self.scanner.reset()
+        return [{"offset": result.offset, "description": result.description}
+                for result in self.scanner.scan_regions(binary.buffer, binary.region_map.data_regions())]
+
+
+class StringsAnalyser:
+    """
+    Class that finds the dates and times among the strings of a binary.
+    """
+    name = "strings"
+
+    def analyse(self, binary):
+        """
+        Method that finds the dates and times of a binary.
+        :param binary: The MappedBinary.
+        :return: List of the dates, as dictionaries with the string, its type and its value in ISO 8601.
+        """
+        # A UTF-16 string may end with the first 0x00 of a padding run
+        regions = binary.region_map.data_regions(1)
+        return [{"offset": date.offset, "string": date.text, "type": type(date.value).__name__,
+                 "value": date.value.isoformat()} for date in find_dates(binary.buffer, regions)]
+
+
+class EntropyAnalyser:
+    """
+    Class that measures the entropy of a binary and finds its encrypted and compressed regions.
+    """
+    name = "entropy"
+
+    def analyse(self, binary):
+        """
+        Method that measures the entropy of a binary and profiles it in blocks.
+        :param binary: The MappedBinary.
+        :return: Dictionary with the entropy in bits per byte, the number of padding bytes and the high entropy
+        regions.
+        """
+        return {"entropy": round(shannon_entropy(binary.buffer), 4),
+                "padding": binary.region_map.padding_length(),
+                "regions": [region._asdict() for region in find_regions(binary.buffer)]}
+
+
+def create_analysers(names=ANALYSERS):
+    """
+    Function that creates the analysers, the expensive state like the signature database is loaded once here.
+    :param names: Optional. The names of the analysers, from ANALYSERS.
+    :return: List of analysers in the ANALYSERS order.
+    """
+    classes = {analyser.name: analyser for analyser in
+               (SignatureAnalyser, BinwalkAnalyser, StringsAnalyser, EntropyAnalyser)}
+    return [classes[name]() for name in ANALYSERS if name in names]
+
+
+def _locate(record, image):
+    """
+    Add the load address and the file offset to the offsets the analysers found in a memory image.
+    :param record: The record of the binary, its results are updated.
+    :param image: The MemoryImage the analysers were run over.
+    """
+    locations = [hit for name in ("signsrch", "binwalk", "strings") for hit in record.get(name, [])]
+    locations.extend(region for region in record.get("entropy", {}).get("regions", []))
+    for location in locations:
+        offset = location["offset"] if "offset" in location else location["start"]
+        location["address"] = image.address(offset)
+        location["file_offset"] = image.file_offset(offset)
+
+
+def _analyse(binary, analysers):
+    """
+    Run all the analysers over a binary, or over its memory image when it is an Intel HEX or an S-record file.
+    An analyser which fails leaves its error in the record and the next analysers still run.
+    :param binary: MappedBinary or MemoryBinary.
+    :param analysers: List of analysers from create_analysers.
+    :return: Dictionary holding the record of the binary.
+    """
+    with memoryview(binary.buffer) as view:
+        record = {"path": binary.path,
+                  "size": len(binary),
+                  "md5": hashlib.md5(view).hexdigest(),
+                  "sha256": hashlib.sha256(view).hexdigest(),
+                  "seconds": {},
+                  "errors": {}}
+    image = None
+    if sniff_format(binary.buffer) is not None:
+        start = time.perf_counter()
+        try:
+            image = decode_image(binary.buffer)
+            record["image"] = {"format": image.format, "size": len(image.buffer),
+                               "segments": [segment._asdict() for segment in image.segments]}
+        except HexRecordError as e:
+            # The binary only looks like a HEX file, it is analysed as it is
+            record["errors"]["image"] = "%s" % e
+        record["seconds"]["image"] = round(time.perf_counter() - start, 3)
+
+    scanned = MemoryBinary(binary.path, image.buffer) if image is not None else binary
+    for analyser in analysers:
+        start = time.perf_counter()
+        try:
+            record[analyser.name] = analyser.analyse(scanned)
+        except Exception as e:
+            record["errors"][analyser.name] = "%s" % e
+        record["seconds"][analyser.name] = round(time.perf_counter() - start, 3)
+    if image is not None:
+        _locate(record, image)
+    return record
+
+
+def analyse_binary(binary_path, analysers):
+    """
+    Function that maps a binary once and runs all the analysers over it.
+    :param binary_path: Path to the binary.
+    :param analysers: List of analysers from create_analysers.
+    :return: Dictionary holding the record of the binary.
+    """
+    with MappedBinary(binary_path) as binary:
+        return _analyse(binary, analysers)
+
+
+def analyse_member(archive_path, member_name, buffer, analysers):
+    """
+    Function that runs all the analysers over a binary read from an archive.
+    :param archive_path: Path to the archive.
+    :param member_name: The name of the binary in the archive.
+    :param buffer: bytes or a mmap holding the binary.
+    :param analysers: List of analysers from create_analysers.
+    :return: Dictionary holding the record of the binary, its path is the archive path and its member the name.
+    """
+    with MemoryBinary(archive_path, buffer) as binary:
+        record = _analyse(binary, analysers)
+    record["member"] = member_name
+    return record
+
+
+def analyse_binaries(paths, analysers, results_path=DEFAULT_RESULTS_FILE):
+    """
+    Function that runs the analysers over the given binaries and directories and writes a record per binary.
+    :param paths: List of binaries and directories holding .bin files.
+    :param analysers: List of analysers from create_analysers.
+    :param results_path: Optional. The JSON lines file the records are written to.
+    :return: The number of binaries analysed.
+    """
+    binary_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            binary_paths.extend(binary_path for _, binary_path in find_binaries(path))
+        else:
+            binary_paths.append(path)
+
+    with open(results_path, "w", encoding="utf-8") as results:
+        for done, binary_path in enumerate(binary_paths, 1):
+            print("[INFO]: [%d/%d] Analysing binary %s..." % (done, len(binary_paths), binary_path))
+            try:
+                record = analyse_binary(binary_path, analysers)
+            except OSError as e:
+                print("[ERROR]: %s - %s" % (binary_path, e))
+                continue
+            for name, error in sorted(record["errors"].items()):
+                print("[ERROR]: %s - %s failed - %s" % (binary_path, name, error))
+            results.write(json.dumps(record, sort_keys=True) + "\n")
+    return len(binary_paths)
+
+
+def analyse_archives(paths, analysers, results_path=DEFAULT_RESULTS_FILE, passwords=DEFAULT_PASSWORDS,
+                     archiver=DEFAULT_ARCHIVER, keep_patterns=(), bins_path=DEFAULT_BINS_PATH):
+    """
+    Function that runs the analysers over the binaries of the given archives and directories of archives, without
+    extracting them. The members are read into memory, or into a temporary file when they are large, and only the
+    members matching one of the patterns to keep are written to the bins directory.
+    :param paths: List of archives and directories holding archives.
+    :param analysers: List of analysers from create_analysers.
+    :param results_path: Optional. The JSON lines file the records are written to.
+    :param passwords: Optional. List of the passwords tried on the encrypted archives.
+    :param archiver: Optional. The archiver command used for the formats read by no module.
+    :param keep_patterns: Optional. List of patterns, like *ecu*.bin, of the member names to be extracted.
+    :param bins_path: Optional. The directory where the kept members are extracted.
+    :return: The number of binaries analysed.
+    """
+    archive_paths = []
+    for path in paths:
+        archive_paths.extend(find_archives(path) if os.path.isdir(path) else [path])
+
+    analysed = 0
+    # The nested archives are analysed once, wherever they are found
+    seen = {}
+    with open(results_path, "w", encoding="utf-8") as results:
+        for done, archive_path in enumerate(archive_paths, 1):
+            print("[INFO]: [%d/%d] Analysing archive %s..." % (done, len(archive_paths), archive_path))
+            budget = ExpansionBudget()
+            try:
+                for member_name, buffer in archive_members(archive_path, passwords, archiver, budget, seen):
+                    record = analyse_member(archive_path, member_name, buffer, analysers)
+                    for name, error in sorted(record["errors"].items()):
+                        print("[ERROR]: %s %s - %s failed - %s" % (archive_path, member_name, name, error))
+                    if any(fnmatch.fnmatch(member_name.lower(), pattern.lower()) for pattern in keep_patterns):
+                        record["extracted"] = write_member(bins_path, archive_path, member_name, buffer)
+                    results.write(json.dumps(record, sort_keys=True) + "\n")
+                    analysed += 1
+            except (ArchiveError, OSError) as e:
+                print("[ERROR]: %s - %s" % (archive_path, e))
+            for message in budget.skipped:
+                print("[INFO]: Skipped %s" % message)
+    return analysed
+
+
+if __name__ == "__main__":
+
+    # Parse the options and analyse the binaries, or the binaries inside the archives with -x
+    arguments = sys.argv[1:]
+    results_file = DEFAULT_RESULTS_FILE
+    selected_analysers = ANALYSERS
+    from_archives = False
+    archive_passwords = []
+    kept_members = []
+    while arguments and arguments[0] in ("-o", "-a", "-x", "-p", "-k"):
+        if arguments[0] == "-x":
+            from_archives = True
+            arguments = arguments[1:]
+            continue
+        if len(arguments) < 2:
+            break
+        if arguments[0] == "-o":
+            results_file = arguments[1]
+        elif arguments[0] == "-a":
+            selected_analysers = arguments[1].split(",")
+        elif arguments[0] == "-p":
+            archive_passwords.append(arguments[1])
+        else:
+            kept_members.append(arguments[1])
+        arguments = arguments[2:]
+
+    if not arguments or any(name not in ANALYSERS for name in selected_analysers):
+        print("Usage: %s [-o RESULTS FILE] [-a %s] [BINARY|PATH] ... [BINARY|PATH]" %
+              (sys.argv[0], ",".join(ANALYSERS)))
+        print("       %s [-o RESULTS FILE] [-a %s] -x [-p PASSWORD] ... [-k PATTERN] ... [ARCHIVE|PATH] ... "
+              "[ARCHIVE|PATH]" % (sys.argv[0], ",".join(ANALYSERS)))
+        exit(1)
+
+    try:
+        if from_archives:
+            binaries_count = analyse_archives(arguments, create_analysers(selected_analysers), results_file,
+                                              archive_passwords or DEFAULT_PASSWORDS, keep_patterns=kept_members)
+        else:
+            binaries_count = analyse_binaries(arguments, create_analysers(selected_analysers), results_file)
+        print("[INFO]: %d binaries analysed, the records are in %s" % (binaries_count, results_file))
+    except ImportError as e:
+        print("An import error occurred, run it from the binwalk environment or leave out binwalk - %s" % e)
+        exit(1)
+    except SignatureFileError as e:
+        print("A signature file error occurred - %s" % e)
+        exit(1)
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
+        exit(1)
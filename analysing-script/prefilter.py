@@ -0,0 +1,332 @@
+"""
+Module responsible with scanning binaries through a rare byte prefilter.
+Every signature is reduced to the 4 bytes of it least likely to show up in the binary, the anchors are searched
+over the whole binary at once with NumPy and the signatures are compared only around the anchors found. When the
+anchors are found too often, like in text or in tables of small numbers, comparing them one by one costs more than
+walking every byte, and the buffer is searched by the automaton of the signature scanner instead.
+"""
+import os
+import sys
+
+import numpy
+
+from signature_database import load_database, SignatureFileError
+from signature_scanner import format_hit, Hit, SignatureScanner
+
+
+# The anchors are 4 bytes long and chosen from the windows of a signature with the most distinct bytes
+ANCHOR_LENGTH = 4
+_ANCHOR_CHOICES = 32
+# The anchors are first looked up by their first 3 bytes in a table, then compared whole
+_TABLE_BITS = 24
+# The binary is searched in blocks to bound the memory used by the search
+_SEARCH_BLOCK = 1 << 20
+# Above this many candidates per byte in the first block the automaton is faster than the prefilter
+MAX_CANDIDATE_DENSITY = 0.25
+
+
+def _anchor_choices(data):
+    """
+    Find the anchor windows of a signature worth choosing from, the ones with the most distinct bytes.
+    :param data: The signature bytes.
+    :return: numpy array of the window offsets.
+    """
+    values = numpy.frombuffer(data, dtype=numpy.uint8)
+    windows = numpy.lib.stride_tricks.as_strided(values, (len(values) - ANCHOR_LENGTH + 1, ANCHOR_LENGTH),
+                                                 (values.strides[0], values.strides[0]))
+    ordered = numpy.sort(windows, axis=1)
+    distinct = 1 + numpy.count_nonzero(ordered[:, 1:] != ordered[:, :-1], axis=1)
+    offsets = numpy.argsort(-distinct, kind="mergesort")[:_ANCHOR_CHOICES]
+    # Every signature gets the same number of choices, the short ones repeat their last window
+    return numpy.resize(offsets, _ANCHOR_CHOICES)
+
+
+def covered_bytes(starts, ends):
+    """
+    Function that counts the bytes covered by a set of windows, the overlapping parts only once.
+    :param starts: numpy array of the window starts.
+    :param ends: numpy array of the window ends.
+    :return: The number of bytes covered.
+    """
+    if not len(starts):
+        return 0
+    order = numpy.argsort(starts, kind="mergesort")
+    starts = starts[order]
+    ends = ends[order]
+    previous_ends = numpy.concatenate(([starts[0]], numpy.maximum.accumulate(ends)[:-1]))
+    return int(numpy.maximum(ends - numpy.maximum(starts, previous_ends), 0).sum())
+
+
+def collapse_runs(signature_ids, starts, element_indexes, element_counts):
+    """
+    Function that groups the AND element hits by signature and drops the hits inside runs of the same element.
+    Only the first and the last hit of a run can bound the smallest window, so padding matching an element does
+    not grow the hit lists. The hits of a single element signature are all matches, their runs are kept whole.
+    :param signature_ids: numpy array of the signature ids of the hits.
+    :param starts: numpy array of the hit offsets.
+    :param element_indexes: numpy array of the element indexes of the hits.
+    :param element_counts: numpy array of the number of elements of the signatures of the hits.
+    :return: Dictionary of signature id to its list of (offset, element index) tuples sorted by offset.
+    """
+    order = numpy.lexsort((starts, signature_ids))
+    signature_ids = signature_ids[order]
+    starts = starts[order]
+    element_indexes = element_indexes[order]
+    same = (signature_ids[1:] == signature_ids[:-1]) & (element_indexes[1:] == element_indexes[:-1])
+    inside = numpy.zeros(len(starts), dtype=bool)
+    inside[1:-1] = same[:-1] & same[1:]
+    inside &= element_counts[order] > 1
+
+    element_hits = {}
+    for signature_id, start, element_index in zip(signature_ids[~inside].tolist(), starts[~inside].tolist(),
+                                                  element_indexes[~inside].tolist()):
+        element_hits.setdefault(signature_id, []).append((start, element_index))
+    return element_hits
+
+
+class PrefilterScanner(SignatureScanner):
+    """
+    Class that scans buffers and files for the signatures of a database, comparing them only around their anchors.
+    It returns the hits of the SignatureScanner, which searches the buffers where the anchors are too dense.
+    """
+
+    def __init__(self, database, max_density=MAX_CANDIDATE_DENSITY):
+        """
+        Build the automaton and prepare the anchor choices of every signature and of every element of the AND
+        signatures.
+        :param database: The SignatureDatabase.
+        :param max_density: Optional. The candidates per byte above which the automaton searches the buffer.
+        """
+        SignatureScanner.__init__(self, database)
+        self.max_density = max_density
+        # The patterns are the signatures and the AND elements, as (signature id, endian, data, element index)
+        self._patterns = []
+        for signature in database:
+            if not signature.is_and and len(signature.data) >= ANCHOR_LENGTH:
+                self._patterns.append((signature.signature_id, signature.endian, bytes(signature.data), None))
+        for and_signature in self.and_matcher.signatures.values():
+            for element_index, element in enumerate(and_signature.elements):
+                if len(element) >= ANCHOR_LENGTH:
+                    self._patterns.append((and_signature.signature_id, and_signature.endian, element, element_index))
+
+        self._choice_offsets = numpy.array([_anchor_choices(data) for _, _, data, _ in self._patterns],
+                                           dtype=numpy.intp)
+        self._choice_bytes = numpy.array([[numpy.frombuffer(data, dtype=numpy.uint8, count=ANCHOR_LENGTH,
+                                                            offset=offset) for offset in offsets]
+                                          for (_, _, data, _), offsets in zip(self._patterns, self._choice_offsets)])
+        self._lengths = numpy.array([len(data) for _, _, data, _ in self._patterns], dtype=numpy.int64)
+        self._signature_ids = numpy.array([pattern[0] for pattern in self._patterns], dtype=numpy.int64)
+        self._element_indexes = numpy.array([-1 if pattern[3] is None else pattern[3] for pattern in self._patterns],
+                                            dtype=numpy.int64)
+        self._element_counts = numpy.array([len(self.and_matcher.signatures[pattern[0]].elements)
+                                            if pattern[3] is not None else 0 for pattern in self._patterns],
+                                           dtype=numpy.int64)
+        # The AND elements are compared with NumPy, their bytes are kept in a table padded to the longest one
+        longest_element = max([len(data) for _, _, data, element_index in self._patterns
+                               if element_index is not None] or [0])
+        self._element_bytes = numpy.zeros((len(self._patterns), longest_element), dtype=numpy.uint8)
+        for index, (_, _, data, element_index) in enumerate(self._patterns):
+            if element_index is not None:
+                self._element_bytes[index, :len(data)] = numpy.frombuffer(data, dtype=numpy.uint8)
+
+        self._constant = numpy.array([element_index is not None and len(set(data)) == 1
+                                      for _, _, data, element_index in self._patterns], dtype=bool)
+        self._constant_bytes = numpy.unique(self._element_bytes[self._constant, 0])
+
+        # Statistics of the scans, to see how much of the binaries the prefilter skips
+        self.scanned_bytes = 0
+        self.skipped_bytes = 0
+        self.fallback_bytes = 0
+
+    def _choose_anchors(self, data):
+        """
+        Choose the anchor of every pattern, the window whose bytes are the least frequent in the binary.
+        :param data: numpy.uint8 array with the binary.
+        :return: Tuple of (anchor offsets, anchor values as little endian 32 bit integers).
+        """
+        frequencies = numpy.log(numpy.bincount(data, minlength=256) + 1.0)
+        scores = frequencies[self._choice_bytes].sum(axis=2)
+        chosen = numpy.argmin(scores, axis=1)
+        rows = numpy.arange(len(self._patterns))
+        anchor_bytes = self._choice_bytes[rows, chosen].astype(numpy.uint32)
+        values = numpy.zeros(len(self._patterns), dtype=numpy.uint32)
+        for byte in range(ANCHOR_LENGTH):
+            values |= anchor_bytes[:, byte] << numpy.uint32(8 * byte)
+        return self._choice_offsets[rows, chosen], values
+
+    def iter_candidates(self, data):
+        """
+        Method that searches the anchors of all the patterns over a binary, block by block.
+        :param data: numpy.uint8 array with the binary.
+        :return: Generator of (numpy array of pattern indexes, numpy array of the pattern start offsets) tuples,
+        one for every block of anchor offsets.
+        """
+        if len(data) < ANCHOR_LENGTH or not self._patterns:
+            return
+
+        # The elements made of a single repeated byte are found from the runs of the binary instead
+        anchor_offsets, anchor_values = self._choose_anchors(data)
+        searched = numpy.flatnonzero(~self._constant)
+        order = searched[numpy.argsort(anchor_values[searched], kind="mergesort")]
+        sorted_values = anchor_values[order]
+        table = numpy.zeros(1 << _TABLE_BITS, dtype=bool)
+        table[sorted_values & numpy.uint32((1 << _TABLE_BITS) - 1)] = True
+
+        positions = len(data) - ANCHOR_LENGTH + 1
+        for block in range(0, positions, _SEARCH_BLOCK):
+            block_end = min(block + _SEARCH_BLOCK, positions)
+            values = data[block:block_end].astype(numpy.uint32)
+            for byte in range(1, ANCHOR_LENGTH):
+                values |= data[block + byte:block_end + byte].astype(numpy.uint32) << numpy.uint32(8 * byte)
+            offsets = numpy.flatnonzero(table[values & numpy.uint32((1 << _TABLE_BITS) - 1)])
+            values = values[offsets]
+
+            # Every anchor value found is matched with all the patterns using it
+            first = numpy.searchsorted(sorted_values, values, side="left")
+            counts = numpy.searchsorted(sorted_values, values, side="right") - first
+            offsets = numpy.repeat(offsets + block, counts)
+            pattern_positions = numpy.repeat(first - numpy.cumsum(counts) + counts, counts) + numpy.arange(len(offsets))
+            patterns = order[pattern_positions]
+            starts = (offsets - anchor_offsets[patterns]).astype(numpy.int64)
+            inside = (starts >= 0) & (starts + self._lengths[patterns] <= len(data))
+            yield patterns[inside], starts[inside]
+
+    def _match_elements(self, data, patterns, starts):
+        """
+        Compare the AND elements found by the prefilter, the elements are short so they are compared with NumPy.
+        :param data: numpy.uint8 array with the binary.
+        :param patterns: numpy array of the element pattern indexes.
+        :param starts: numpy array of the element starts.
+        :return: Tuple of (pattern indexes, starts) of the elements matched.
+        """
+        matched = numpy.ones(len(patterns), dtype=bool)
+        lengths = self._lengths[patterns]
+        for byte in range(int(lengths.max()) if len(lengths) else 0):
+            inside = lengths > byte
+            matched[inside] &= data[starts[inside] + byte] == self._element_bytes[patterns[inside], byte]
+        return patterns[matched], starts[matched]
+
+    def _constant_runs(self, data):
+        """
+        Find the AND elements made of a single repeated byte, like 0xffffffff, from the runs of the binary.
+        Their anchors would match every offset of the padding, so only the first and the last offset of every run
+        long enough to hold them are returned.
+        :param data: numpy.uint8 array with the binary.
+        :return: Tuple of (pattern indexes, starts, run starts, run ends).
+        """
+        # Only the offsets starting ANCHOR_LENGTH bytes of a constant element byte are listed, text and code have
+        # millions of shorter runs
+        last = max(len(data) - ANCHOR_LENGTH + 1, 0)
+        in_run = numpy.isin(data[:last], self._constant_bytes)
+        for byte in range(1, ANCHOR_LENGTH):
+            in_run &= data[byte:last + byte] == data[:last]
+        positions = numpy.flatnonzero(in_run)
+        firsts = numpy.ones(len(positions), dtype=bool)
+        firsts[1:] = numpy.diff(positions) != 1
+        lasts = numpy.ones(len(positions), dtype=bool)
+        lasts[:-1] = firsts[1:]
+        run_starts = positions[firsts]
+        run_ends = positions[lasts] + ANCHOR_LENGTH
+        run_values = data[run_starts]
+
+        patterns = []
+        starts = []
+        windows = []
+        for pattern in numpy.flatnonzero(self._constant).tolist():
+            length = int(self._lengths[pattern])
+            runs = (run_values == self._element_bytes[pattern, 0]) & (run_ends - run_starts >= length)
+            for offsets in (run_starts[runs], run_ends[runs] - length):
+                patterns.append(numpy.full(len(offsets), pattern, dtype=numpy.intp))
+                starts.append(offsets.astype(numpy.int64))
+            windows.append((run_starts[runs], run_ends[runs]))
+        if not patterns:
+            return (numpy.zeros(0, dtype=numpy.intp), numpy.zeros(0, dtype=numpy.int64),
+                    numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64))
+        return (numpy.concatenate(patterns), numpy.concatenate(starts),
+                numpy.concatenate([window[0] for window in windows]).astype(numpy.int64),
+                numpy.concatenate([window[1] for window in windows]).astype(numpy.int64))
+
+    def search(self, buffer):
+        """
+        Method that searches the signatures around their anchors, without confirming the AND signatures. The buffer
+        is searched by the automaton when the first block holds too many candidates.
+        :param buffer: A bytes like object or a mmap.
+        :return: Tuple of (list of Hit, dictionary of AND signature id to its element hits).
+        """
+        data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+        hits = []
+        element_patterns, element_starts, window_starts, window_ends = self._constant_runs(data)
+        element_patterns = [element_patterns]
+        element_starts = [element_starts]
+        window_starts = [window_starts]
+        window_ends = [window_ends]
+        for block, (patterns, starts) in enumerate(self.iter_candidates(data)):
+            if not block and len(patterns) > self.max_density * min(len(data), _SEARCH_BLOCK):
+                self.scanned_bytes += len(data)
+                self.fallback_bytes += len(data)
+                return SignatureScanner.search(self, buffer)
+            window_starts.append(starts)
+            window_ends.append(starts + self._lengths[patterns])
+
+            elements = self._element_indexes[patterns] >= 0
+            patterns_matched, starts_matched = self._match_elements(data, patterns[elements], starts[elements])
+            element_patterns.append(patterns_matched)
+            element_starts.append(starts_matched)
+            for pattern, start in zip(patterns[~elements].tolist(), starts[~elements].tolist()):
+                signature_id, endian, pattern_data, _ = self._patterns[pattern]
+                if buffer[start:start + len(pattern_data)] == pattern_data:
+                    hits.append(Hit(signature_id, start, endian))
+
+        self.scanned_bytes += len(data)
+        self.skipped_bytes += len(data) - covered_bytes(numpy.concatenate(window_starts),
+                                                        numpy.concatenate(window_ends))
+
+        element_patterns = numpy.concatenate(element_patterns)
+        element_hits = collapse_runs(self._signature_ids[element_patterns], numpy.concatenate(element_starts),
+                                     self._element_indexes[element_patterns], self._element_counts[element_patterns])
+        return hits, element_hits
+
+    def skipped_fraction(self):
+        """
+        Method that returns the fraction of the scanned bytes the prefilter did not compare.
+        :return: Float between 0 and 1.
+        """
+        return float(self.skipped_bytes) / self.scanned_bytes if self.scanned_bytes else 0.0
+
+
+if __name__ == "__main__":
+
+    # Scan the given binaries, or the .bin files of the given directories, and print the bytes skipped
+    if len(sys.argv) < 2:
+        print("Usage: %s [BINARY|PATH] ... [BINARY|PATH]" % sys.argv[0])
+        exit(1)
+
+    try:
+        signature_database = load_database()
+    except SignatureFileError as e:
+        print("A signature file error occurred - %s" % e)
+        exit(1)
+
+    scanner = PrefilterScanner(signature_database)
+    for argument in sys.argv[1:]:
+        binary_files = [argument]
+        if os.path.isdir(argument):
+            binary_files = [os.path.join(root, file) for root, _, files in os.walk(argument)
+                            for file in files if file.endswith(".bin")]
+        for binary_file in binary_files:
+            try:
+                skipped = scanner.skipped_bytes
+                scanned = scanner.scanned_bytes
+                found_hits = scanner.scan_file(binary_file, skip_padding=False)
+                print("%s" % binary_file)
+                for found_hit in found_hits:
+                    print("%s" % format_hit(signature_database, found_hit))
+                if scanner.scanned_bytes > scanned:
+                    print("  %.2f%% of the bytes skipped" % (100.0 * (scanner.skipped_bytes - skipped) /
+                                                            (scanner.scanned_bytes - scanned)))
+                print("")
+            except OSError as e:
+                print("An OS error occurred - %s" % e)
+
+    print("%.2f%% of the %d bytes scanned were skipped, %d bytes were searched by the automaton" %
+          (100.0 * scanner.skipped_fraction(), scanner.scanned_bytes, scanner.fallback_bytes))
@@ -0,0 +1,196 @@
+"""
+Module responsible with mapping the padding of the binaries, the long runs of 0xff or 0x00 bytes.
+Erased flash and padding hold no signatures, so the scanners only walk the data between the runs. The map of every
+binary is cached, so it is built once and reused by every analysis of the binary.
+"""
+import hashlib
+import mmap
+import os
+import sys
+
+import numpy
+
+from signature_database import DEFAULT_CACHE_PATH
+
+
+# Bump it when the maps change, the cached maps are then built again
+REGION_MAP_VERSION = 1
+# The bytes of erased flash and padding, and the shortest run skipped by the scanners
+PADDING_BYTES = (0x00, 0xff)
+MIN_PADDING_LENGTH = 4096
+# The binaries are mapped in blocks to bound the memory used
+_MAP_BLOCK = 1 << 24
+
+
+def find_padding(buffer, min_length=MIN_PADDING_LENGTH, padding_bytes=PADDING_BYTES):
+    """
+    Function that finds the runs of a padding byte in a buffer.
+    :param buffer: A bytes like object or a mmap.
+    :param min_length: Optional. The shortest run reported.
+    :param padding_bytes: Optional. The byte values of the padding.
+    :return: numpy.int64 array of shape (runs, 2) with the start and the end of every run.
+    """
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    starts = []
+    ends = []
+    run_start = 0
+    for block in range(0, len(data), _MAP_BLOCK):
+        block_end = min(block + _MAP_BLOCK, len(data))
+        # The runs change where a byte differs from the one before it, including across the block boundary
+        changes = numpy.flatnonzero(data[max(block, 1) - 1:block_end - 1] != data[max(block, 1):block_end])
+        changes += max(block, 1)
+        run_starts = numpy.concatenate(([run_start], changes))
+        run_ends = numpy.concatenate((changes, [block_end]))
+        # The last run may go on in the next block
+        run_start = int(run_starts[-1])
+        if block_end < len(data):
+            run_starts = run_starts[:-1]
+            run_ends = run_ends[:-1]
+        long_runs = (run_ends - run_starts >= min_length) & numpy.isin(data[run_starts], padding_bytes)
+        starts.append(run_starts[long_runs])
+        ends.append(run_ends[long_runs])
+
+    if not starts:
+        return numpy.zeros((0, 2), dtype=numpy.int64)
+    return numpy.stack((numpy.concatenate(starts), numpy.concatenate(ends)), axis=1).astype(numpy.int64)
+
+
+class RegionMap:
+    """
+    Class that holds the padding runs of a binary and the data regions between them.
+    """
+
+    def __init__(self, padding, length):
+        """
+        :param padding: numpy array of shape (runs, 2) with the start and the end of every padding run.
+        :param length: The length of the binary.
+        """
+        self.padding = padding
+        self.length = length
+
+    def padding_length(self):
+        """
+        Method that returns the number of padding bytes.
+        :return: The number of bytes in the padding runs.
+        """
+        return int((self.padding[:, 1] - self.padding[:, 0]).sum())
+
+    def data_regions(self, margin=0):
+        """
+        Method that returns the regions to be scanned, the data between the padding runs.
+        A pattern holding at most margin bytes of a padding run is found whole in one of the regions.
+        :param margin: Optional. The number of padding bytes kept on both sides of every region.
+        :return: List of (start, end) tuples, sorted and not overlapping.
+        """
+        regions = []
+        start = 0
+        for padding_start, padding_end in self.padding.tolist() + [[self.length, self.length]]:
+            region_start = max(start - margin, 0)
+            region_end = min(padding_start + margin, self.length)
+            if padding_start > start:
+                if regions and region_start <= regions[-1][1]:
+                    regions[-1] = (regions[-1][0], region_end)
+                else:
+                    regions.append((region_start, region_end))
+            start = padding_end
+        return regions
+
+
+def _cache_path(binary_path):
+    """
+    Build the cache path of the map of a binary, named after the digest of its absolute path.
+    :param binary_path: Path to the binary.
+    :return: Path to the cached map.
+    """
+    name = hashlib.sha1(os.path.abspath(binary_path).encode("utf-8")).hexdigest()
+    return os.path.join(DEFAULT_CACHE_PATH, "regions", "%s.npz" % name)
+
+
+def _read_cache(cache_path, binary_stat, min_length):
+    """
+    Read a cached map, if it was built by this version for the same binary.
+    :param cache_path: Path to the cached map.
+    :param binary_stat: os.stat_result of the binary.
+    :param min_length: The shortest padding run.
+    :return: The RegionMap, or None when the cache is missing or stale.
+    """
+    try:
+        with numpy.load(cache_path) as cache:
+            header = cache["header"].tolist()
+            if header != [REGION_MAP_VERSION, binary_stat.st_size, binary_stat.st_mtime_ns, min_length] or \
+                    cache["padding_bytes"].tolist() != list(PADDING_BYTES):
+                return None
+            return RegionMap(cache["padding"], binary_stat.st_size)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _write_cache(cache_path, binary_stat, min_length, region_map):
+    """
+    Write a map to the cache, replacing the cached file atomically.
+    :param cache_path: Path to the cached map.
+    :param binary_stat: os.stat_result of the binary.
+    :param min_length: The shortest padding run.
+    :param region_map: The RegionMap.
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # The workers may write the map together, every one writes its own file and they are all alike
+    temporary_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    with open(temporary_path, "wb") as cache:
+        numpy.savez(cache,
+                    header=numpy.array([REGION_MAP_VERSION, binary_stat.st_size, binary_stat.st_mtime_ns, min_length],
+                                       dtype=numpy.int64),
+                    padding_bytes=numpy.array(PADDING_BYTES, dtype=numpy.uint8),
+                    padding=region_map.padding)
+    os.replace(temporary_path, cache_path)
+
+
+def load_region_map(binary_path, buffer=None, min_length=MIN_PADDING_LENGTH):
+    """
+    Function that loads the map of a binary from the cache, building it when the binary changed.
+    :param binary_path: Path to the binary.
+    :param buffer: Optional. The binary already mapped in memory, it is mapped here when missing.
+    :param min_length: Optional. The shortest padding run.
+    :return: The RegionMap.
+    """
+    binary_stat = os.stat(binary_path)
+    cache_path = _cache_path(binary_path)
+    region_map = _read_cache(cache_path, binary_stat, min_length)
+    if region_map is not None:
+        return region_map
+
+    if buffer is not None:
+        region_map = RegionMap(find_padding(buffer, min_length), len(buffer))
+    elif binary_stat.st_size == 0:
+        region_map = RegionMap(numpy.zeros((0, 2), dtype=numpy.int64), 0)
+    else:
+        with open(binary_path, "rb") as binary:
+            with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+                region_map = RegionMap(find_padding(mapped_binary, min_length), len(mapped_binary))
+
+    try:
+        _write_cache(cache_path, binary_stat, min_length, region_map)
+    except OSError:
+        # A read only cache only costs the time to build the map again
+        pass
+    return region_map
+
+
+if __name__ == "__main__":
+
+    # Print the padding runs of the given binaries
+    if len(sys.argv) < 2:
+        print("Usage: %s [BINARY] ... [BINARY]" % sys.argv[0])
+        exit(1)
+
+    for binary_file in sys.argv[1:]:
+        try:
+            binary_map = load_region_map(binary_file)
+            print("%s" % binary_file)
+            for run_start, run_end in binary_map.padding.tolist():
+                print("  %08x - %08x  %d bytes" % (run_start, run_end, run_end - run_start))
+            print("  %.2f%% padding" % (100.0 * binary_map.padding_length() / binary_map.length
+                                        if binary_map.length else 0.0))
+            print("")
+        except OSError as e:
+            print("An OS error occurred - %s" % e)
@@ -0,0 +1,157 @@
+"""
+Module responsible with caching the results of the analysers by the content of the binaries.
+The same dumps are posted again on many forums and inside many archives, so the results are stored in a SQLite
+database keyed on the SHA-256 digest of the binary and the version of the analyser. A binary already seen under
+another name gets its results straight from the cache and its path is recorded as one more alias of the content.
+"""
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import sys
+
+from signature_database import DEFAULT_CACHE_PATH
+
+
+DEFAULT_RESULT_CACHE = os.path.join(DEFAULT_CACHE_PATH, "results.sqlite")
+# The workers of a pool share the database, a writer waits this many seconds for the others
+_LOCK_TIMEOUT = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    sha256 TEXT NOT NULL,
+    analyser TEXT NOT NULL,
+    version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (sha256, analyser, version)
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    sha256 TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (sha256, path)
+);
+CREATE INDEX IF NOT EXISTS aliases_path ON aliases (path);
+"""
+
+
+def file_digests(binary_path):
+    """
+    Function that computes the SHA-256 and the MD5 digests of a binary, reading it once.
+    :param binary_path: Path to the binary.
+    :return: Tuple of (SHA-256, MD5) hexadecimal digests.
+    """
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    with open(binary_path, "rb") as binary:
+        if os.fstat(binary.fileno()).st_size:
+            with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+                sha256.update(mapped_binary)
+                md5.update(mapped_binary)
+    return sha256.hexdigest(), md5.hexdigest()
+
+
+class ResultCache:
+    """
+    Class that stores the results of the analysers by content digest and analyser version.
+    """
+
+    def __init__(self, cache_path=DEFAULT_RESULT_CACHE):
+        """
+        Open the cache, creating it when missing.
+        :param cache_path: Optional. Path to the SQLite database.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._connection = sqlite3.connect(cache_path, timeout=_LOCK_TIMEOUT)
+        # The readers do not wait for the writers
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, sha256, analyser, version):
+        """
+        Method that looks up the result of an analyser for a content.
+        :param sha256: The SHA-256 digest of the binary.
+        :param analyser: The name of the analyser.
+        :param version: The version of the analyser.
+        :return: The result, as it was stored, or None when the content was not analysed by this version.
+        """
+        row = self._connection.execute("SELECT result FROM results WHERE sha256 = ? AND analyser = ? AND version = ?",
+                                       (sha256, analyser, version)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, sha256, analyser, version, result):
+        """
+        Method that stores the result of an analyser for a content.
+        :param sha256: The SHA-256 digest of the binary.
+        :param analyser: The name of the analyser.
+        :param version: The version of the analyser.
+        :param result: The result, any value JSON can hold.
+        """
+        with self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                     (sha256, analyser, version, json.dumps(result)))
+
+    def analysers(self, sha256):
+        """
+        Method that returns the analysers which have a result for a content.
+        :param sha256: The SHA-256 digest of the binary.
+        :return: Sorted list of (analyser, version) tuples.
+        """
+        return self._connection.execute("SELECT analyser, version FROM results WHERE sha256 = ? "
+                                        "ORDER BY analyser, version", (sha256,)).fetchall()
+
+    def add_alias(self, sha256, binary_path):
+        """
+        Method that records a path under which a content was found.
+        :param sha256: The SHA-256 digest of the binary.
+        :param binary_path: Path to the binary.
+        """
+        with self._connection:
+            self._connection.execute("INSERT OR IGNORE INTO aliases VALUES (?, ?)",
+                                     (sha256, os.path.abspath(binary_path)))
+
+    def aliases(self, sha256):
+        """
+        Method that returns the paths under which a content was found.
+        :param sha256: The SHA-256 digest of the binary.
+        :return: Sorted list of paths.
+        """
+        return [row[0] for row in self._connection.execute("SELECT path FROM aliases WHERE sha256 = ? ORDER BY path",
+                                                           (sha256,))]
+
+    def close(self):
+        """
+        Method that closes the cache.
+        """
+        self._connection.close()
+
+
+if __name__ == "__main__":
+
+    # Print the cached analysers and the aliases of the given binaries
+    if len(sys.argv) < 2:
+        print("Usage: %s [BINARY] ... [BINARY]" % sys.argv[0])
+        exit(1)
+
+    try:
+        with ResultCache() as cache:
+            for binary_file in sys.argv[1:]:
+                binary_sha256, _ = file_digests(binary_file)
+                print("%s %s" % (binary_sha256, binary_file))
+                for cached_analyser, cached_version in cache.analysers(binary_sha256):
+                    print("  %s %s" % (cached_analyser, cached_version))
+                for alias in cache.aliases(binary_sha256):
+                    print("  alias %s" % alias)
+                print("")
+    except sqlite3.Error as e:
+        print("A cache error occurred - %s" % e)
+        exit(1)
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
+        exit(1)
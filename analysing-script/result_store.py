@@ -0,0 +1,186 @@
+"""
+Module responsible with storing the results of the scans as structured records.
+Every scan of a binary appends one row to a SQLite database, together with one row for each signature found, instead
+of only leaving a text report next to the binary. The rows are never updated, a binary scanned again gets a new scan,
+a deleted binary gets a scan marking it as deleted, and the reports are queries over the latest scan of every binary,
+not walks over the tree of text reports.
+"""
+import datetime
+import os
+import sqlite3
+import sys
+
+from signature_database import DEFAULT_CACHE_PATH
+
+
+DEFAULT_RESULT_STORE = os.path.join(DEFAULT_CACHE_PATH, "store.sqlite")
+# The workers of a pool share the database, a writer waits this many seconds for the others
+_LOCK_TIMEOUT = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id INTEGER PRIMARY KEY,
+    analyser TEXT NOT NULL,
+    version TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    md5 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    scan_time TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS hits (
+    scan_id INTEGER NOT NULL REFERENCES scans (scan_id),
+    offset INTEGER NOT NULL,
+    signature TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scans_path ON scans (analyser, path, scan_id);
+CREATE INDEX IF NOT EXISTS scans_sha256 ON scans (sha256);
+CREATE INDEX IF NOT EXISTS hits_scan ON hits (scan_id, offset);
+CREATE INDEX IF NOT EXISTS hits_signature ON hits (signature);
+CREATE VIEW IF NOT EXISTS latest_scans AS
+    SELECT * FROM scans WHERE scan_id IN (SELECT max(scan_id) FROM scans GROUP BY analyser, path) AND NOT deleted;
+"""
+
+
+class ResultStore:
+    """
+    Class that appends the scans and their hits to the store and queries them.
+    """
+
+    def __init__(self, store_path=DEFAULT_RESULT_STORE):
+        """
+        Open the store, creating it when missing.
+        :param store_path: Optional. Path to the SQLite database.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(store_path)), exist_ok=True)
+        self._connection = sqlite3.connect(store_path, timeout=_LOCK_TIMEOUT)
+        self._connection.row_factory = sqlite3.Row
+        # The readers do not wait for the writers
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add_scan(self, analyser, version, binary_path, sha256, md5, size, hits, scan_time=None):
+        """
+        Method that appends the scan of a binary and the signatures it found.
+        :param analyser: The name of the analyser.
+        :param version: The version of the analyser.
+        :param binary_path: Path to the binary.
+        :param sha256: The SHA-256 digest of the binary.
+        :param md5: The MD5 digest of the binary.
+        :param size: The size of the binary.
+        :param hits: List of (offset, signature, description) tuples.
+        :param scan_time: Optional. The datetime of the scan, now by default.
+        :return: The id of the scan.
+        """
+        if scan_time is None:
+            scan_time = datetime.datetime.now()
+        with self._connection:
+            scan_id = self._connection.execute(
+                "INSERT INTO scans (analyser, version, path, sha256, md5, size, scan_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (analyser, version, os.path.abspath(binary_path), sha256, md5, size,
+                 scan_time.strftime("%Y-%m-%d %H:%M:%S"))).lastrowid
+            self._connection.executemany("INSERT INTO hits VALUES (?, ?, ?, ?)",
+                                         ((scan_id, offset, signature, description)
+                                          for offset, signature, description in hits))
+        return scan_id
+
+    def remove_binaries(self, analyser, binary_paths):
+        """
+        Method that appends a scan marking every given binary as deleted, they are then left out of the latest scans.
+        :param analyser: The name of the analyser.
+        :param binary_paths: List of paths to the deleted binaries.
+        """
+        scan_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO scans (analyser, version, path, sha256, md5, size, scan_time, deleted) "
+                "VALUES (?, '', ?, '', '', 0, ?, 1)",
+                ((analyser, os.path.abspath(binary_path), scan_time) for binary_path in binary_paths))
+
+    def latest_scans(self, analyser, base_path=None):
+        """
+        Method that returns the latest scan of every binary.
+        :param analyser: The name of the analyser.
+        :param base_path: Optional. Only the binaries under this directory are returned.
+        :return: List of the scans, sqlite3.Row objects indexed by the column names, sorted by path.
+        """
+        prefix = os.path.join(os.path.abspath(base_path), "") if base_path is not None else ""
+        return self._connection.execute("SELECT * FROM latest_scans WHERE analyser = ? AND substr(path, 1, ?) = ? "
+                                        "ORDER BY path", (analyser, len(prefix), prefix)).fetchall()
+
+    def hits(self, scan_id):
+        """
+        Method that returns the signatures found by a scan.
+        :param scan_id: The id of the scan.
+        :return: List of (offset, signature, description) tuples sorted by offset.
+        """
+        return [tuple(row) for row in self._connection.execute(
+            "SELECT offset, signature, description FROM hits WHERE scan_id = ? ORDER BY offset, rowid", (scan_id,))]
+
+    def find_signature(self, analyser, signature):
+        """
+        Method that returns the binaries where the latest scan found a signature.
+        :param analyser: The name of the analyser.
+        :param signature: The signature, the signsrch id or the binwalk signature name.
+        :return: List of (path, offset) tuples.
+        """
+        return [tuple(row) for row in self._connection.execute(
+            "SELECT latest_scans.path, hits.offset FROM hits JOIN latest_scans USING (scan_id) "
+            "WHERE hits.signature = ? AND latest_scans.analyser = ? ORDER BY latest_scans.path, hits.offset",
+            (signature, analyser))]
+
+    def binary_signatures(self, analyser):
+        """
+        Method that returns the distinct signatures found by the latest scan of every binary.
+        :param analyser: The name of the analyser.
+        :return: List of (path, signature, description) tuples sorted by path, the binaries without signatures have a
+        single tuple with None as signature and description.
+        """
+        return [tuple(row) for row in self._connection.execute(
+            "SELECT latest_scans.path, hits.signature, min(hits.description) FROM latest_scans "
+            "LEFT JOIN hits USING (scan_id) WHERE latest_scans.analyser = ? "
+            "GROUP BY latest_scans.path, hits.signature ORDER BY latest_scans.path, hits.signature", (analyser,))]
+
+    def close(self):
+        """
+        Method that closes the store.
+        """
+        self._connection.close()
+
+
+if __name__ == "__main__":
+
+    # Print the latest scans of an analyser, or the binaries holding a signature
+    if len(sys.argv) not in (2, 3):
+        print("Usage: %s [ANALYSER] [SIGNATURE]" % sys.argv[0])
+        exit(1)
+
+    try:
+        with ResultStore() as store:
+            if len(sys.argv) == 3:
+                for found_path, found_offset in store.find_signature(sys.argv[1], sys.argv[2]):
+                    print("  %08x %s" % (found_offset, found_path))
+                exit(0)
+
+            scans = store.latest_scans(sys.argv[1])
+            scans_hits = [(scan, store.hits(scan["scan_id"])) for scan in scans]
+            print("Number of binaries: %d" % len(scans))
+            print("Number of binaries with signatures: %d" % sum(1 for _, scan_hits in scans_hits if scan_hits))
+            for scan, scan_hits in scans_hits:
+                if scan_hits:
+                    print("")
+                    print("%s %s %s" % (scan["scan_time"], scan["sha256"], scan["path"]))
+                    for hit_offset, _, hit_description in scan_hits:
+                        print("  %08x %s" % (hit_offset, hit_description))
+    except sqlite3.Error as e:
+        print("A store error occurred - %s" % e)
+        exit(1)
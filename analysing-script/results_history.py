@@ -0,0 +1,314 @@
+"""
+Module responsible with loading the results files of the past runs into columnar arrays.
+results/binwalk_results.dat and results/signsrch_results.dat are the only record of the runs before the result store.
+Both are parsed in one pass into NumPy structured arrays, one row per scan, hit, signature or file, and the paths,
+descriptions and titles are interned, every distinct string is stored once and the rows hold its index.
+"""
+from collections import namedtuple
+
+import re
+import sys
+import time
+
+import numpy
+
+
+# The results files were written with the ANSI code page of Windows, some paths hold bytes which are not UTF-8
+RESULTS_ENCODING = "latin-1"
+# Analyse-Reports appends the dates found in a binary to its path
+DATE_SEPARATOR = " ----------------->DATE="
+
+# The rows of the binwalk results, a scan points to its hits through first_hit and hit_count
+BINWALK_SCAN_DTYPE = numpy.dtype([("scan_time", "datetime64[s]"), ("path", numpy.int32), ("md5", "S32"),
+                                  ("signature_count", numpy.int32), ("first_hit", numpy.int64),
+                                  ("hit_count", numpy.int32)])
+BINWALK_HIT_DTYPE = numpy.dtype([("scan", numpy.int32), ("offset", numpy.int64), ("description", numpy.int32)])
+# The rows of the signsrch results, a signature points to its files through first_file and file_count
+SIGNSRCH_SIGNATURE_DTYPE = numpy.dtype([("id", numpy.int32), ("title", numpy.int32), ("count", numpy.int32),
+                                        ("first_file", numpy.int64), ("file_count", numpy.int32)])
+SIGNSRCH_FILE_DTYPE = numpy.dtype([("signature", numpy.int32), ("path", numpy.int32), ("dates", numpy.int32)])
+
+_NUMBER_OF_BINARIES = re.compile(rb"^Number of binaries: (\d+)$", re.MULTILINE)
+_NUMBER_WITH_SIGNATURES = re.compile(rb"^Number of binaries with signatures: (\d+)$", re.MULTILINE)
+_SIGNSRCH_COUNT = re.compile(rb"^(\d+) (.*\]): (\d+)$")
+_SIGNSRCH_TITLE = re.compile(rb"^(\d+) (.*\])$")
+
+BinwalkHistory = namedtuple("BinwalkHistory", ["binaries", "binaries_with_signatures", "scans", "hits", "paths",
+                                               "descriptions"])
+SignsrchHistory = namedtuple("SignsrchHistory", ["binaries", "binaries_with_signatures", "signatures", "files",
+                                                 "titles", "paths", "dates"])
+
+
+class StringPool:
+    """
+    Class that interns strings, every distinct string is stored once and referred to by its index.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, index):
+        return self.strings[index]
+
+    def intern(self, string):
+        """
+        Method that returns the index of a string, adding it to the pool when missing.
+        :param string: The string.
+        :return: The index of the string.
+        """
+        index = self._indexes.get(string)
+        if index is None:
+            index = self._indexes[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def find(self, text):
+        """
+        Method that finds the strings holding a text, ignoring the case.
+        :param text: The text.
+        :return: numpy array of the indexes of the strings.
+        """
+        text = text.lower()
+        return numpy.array([index for index, string in enumerate(self.strings) if text in string.lower()],
+                           dtype=numpy.int32)
+
+
+def _header_counts(content):
+    """
+    Read the number of binaries and the number of binaries with signatures of a results file.
+    :param content: The bytes of the results file.
+    :return: Tuple of (number of binaries, number of binaries with signatures), 0 for the missing ones.
+    """
+    binaries = _NUMBER_OF_BINARIES.search(content)
+    with_signatures = _NUMBER_WITH_SIGNATURES.search(content)
+    return int(binaries.group(1)) if binaries else 0, int(with_signatures.group(1)) if with_signatures else 0
+
+
+def _field(line):
+    """
+    Read the value of a "Name:   value" line of a binwalk report.
+    :param line: The bytes of the line.
+    :return: The value as a string.
+    """
+    return line.split(b":", 1)[1].strip().decode(RESULTS_ENCODING)
+
+
+def parse_binwalk_results(content):
+    """
+    Function that parses the reports merged into results/binwalk_results.dat.
+    :param content: The bytes of the results file.
+    :return: BinwalkHistory.
+    """
+    paths = StringPool()
+    descriptions = StringPool()
+    scans = []
+    hit_scans = []
+    hit_offsets = []
+    hit_descriptions = []
+    scan_time = path = md5 = signature_count = None
+    in_hits = False
+    for line in content.splitlines():
+        if in_hits:
+            if line:
+                # DECIMAL, HEXADECIMAL and DESCRIPTION columns
+                offset, _, description = line.split(None, 2)
+                hit_scans.append(len(scans) - 1)
+                hit_offsets.append(int(offset))
+                hit_descriptions.append(descriptions.intern(description.decode(RESULTS_ENCODING)))
+                continue
+            in_hits = False
+        if line.startswith(b"Scan Time:"):
+            scan_time = _field(line)
+        elif line.startswith(b"Target File:"):
+            path = paths.intern(_field(line))
+        elif line.startswith(b"MD5 Checksum:"):
+            md5 = _field(line).encode("ascii")
+        elif line.startswith(b"Signatures:"):
+            signature_count = int(_field(line))
+        elif line.startswith(b"-----"):
+            scans.append((scan_time, path, md5, signature_count, len(hit_offsets), 0))
+            in_hits = True
+
+    # The scan times are converted at once, "2018-03-27 19:51:36" is an ISO 8601 time with a space
+    scan_times = numpy.array([scan[0] for scan in scans], dtype="datetime64[s]")
+    scans = numpy.array([(None,) + scan[1:] for scan in scans], dtype=BINWALK_SCAN_DTYPE)
+    scans["scan_time"] = scan_times
+    hits = numpy.empty(len(hit_offsets), dtype=BINWALK_HIT_DTYPE)
+    hits["scan"] = hit_scans
+    hits["offset"] = hit_offsets
+    hits["description"] = hit_descriptions
+    scans["hit_count"] = numpy.bincount(hits["scan"], minlength=len(scans))
+    binaries, with_signatures = _header_counts(content)
+    return BinwalkHistory(binaries, with_signatures, scans, hits, paths, descriptions)
+
+
+def parse_signsrch_results(content):
+    """
+    Function that parses results/signsrch_results.dat, the counts of the signatures and the files holding them.
+    :param content: The bytes of the results file.
+    :return: SignsrchHistory.
+    """
+    titles = StringPool()
+    paths = StringPool()
+    dates = StringPool()
+    # The binaries without dates point to the empty string
+    dates.intern("")
+    signatures = {}
+    files = []
+    signature = None
+    for line in content.splitlines()[2:]:
+        if not line:
+            signature = None
+            continue
+        if signature is not None:
+            path, _, found_dates = line.decode(RESULTS_ENCODING).partition(DATE_SEPARATOR)
+            files.append((signature, paths.intern(path), dates.intern(found_dates.strip())))
+            continue
+        match = _SIGNSRCH_COUNT.match(line)
+        if match:
+            signature_id = int(match.group(1))
+            signatures[signature_id] = [signature_id, titles.intern(match.group(2).strip().decode(RESULTS_ENCODING)),
+                                        int(match.group(3)), 0, 0]
+            continue
+        match = _SIGNSRCH_TITLE.match(line)
+        if match:
+            # The list of files of a signature follows its title
+            signature_id = int(match.group(1))
+            if signature_id not in signatures:
+                signatures[signature_id] = [signature_id, titles.intern(
+                    match.group(2).strip().decode(RESULTS_ENCODING)), 0, 0, 0]
+            signatures[signature_id][3] = len(files)
+            signature = signature_id
+
+    files = numpy.array(files, dtype=SIGNSRCH_FILE_DTYPE)
+    signatures = numpy.array([tuple(row) for _, row in sorted(signatures.items())], dtype=SIGNSRCH_SIGNATURE_DTYPE)
+    # The files refer to the row of their signature, not to its id
+    rows = numpy.searchsorted(signatures["id"], files["signature"])
+    files["signature"] = rows
+    signatures["file_count"] = numpy.bincount(rows, minlength=len(signatures))
+    binaries, with_signatures = _header_counts(content)
+    return SignsrchHistory(binaries, with_signatures, signatures, files, titles, paths, dates)
+
+
+def load_results(results_path):
+    """
+    Function that reads a results file and parses it with the parser of its format.
+    :param results_path: Path to binwalk_results.dat or signsrch_results.dat.
+    :return: BinwalkHistory or SignsrchHistory.
+    """
+    with open(results_path, "rb") as results:
+        content = results.read()
+    if b"\nScan Time:" in content:
+        return parse_binwalk_results(content)
+    return parse_signsrch_results(content)
+
+
+def binwalk_hits(history, scan):
+    """
+    Function that returns the hits of a scan of the binwalk history.
+    :param history: BinwalkHistory.
+    :param scan: The row of the scan.
+    :return: List of (offset, description) tuples.
+    """
+    first = history.scans["first_hit"][scan]
+    hits = history.hits[first:first + history.scans["hit_count"][scan]]
+    return [(int(offset), history.descriptions[description])
+            for offset, description in zip(hits["offset"], hits["description"])]
+
+
+def find_binwalk(history, text):
+    """
+    Function that finds the binaries of the binwalk history where a description holding a text was found.
+    :param history: BinwalkHistory.
+    :param text: The text, the case is ignored.
+    :return: List of (path, offset, description) tuples, in the order of the results file.
+    """
+    hits = history.hits[numpy.isin(history.hits["description"], history.descriptions.find(text))]
+    paths = history.scans["path"][hits["scan"]]
+    return [(history.paths[path], int(offset), history.descriptions[description])
+            for path, offset, description in zip(paths, hits["offset"], hits["description"])]
+
+
+def signsrch_files(history, signature_id):
+    """
+    Function that returns the files of the signsrch history holding a signature.
+    :param history: SignsrchHistory.
+    :param signature_id: The signsrch id of the signature.
+    :return: List of (path, dates) tuples, empty when the signature was not found.
+    """
+    row = numpy.searchsorted(history.signatures["id"], signature_id)
+    if row == len(history.signatures) or history.signatures["id"][row] != signature_id:
+        return []
+    first = history.signatures["first_file"][row]
+    files = history.files[first:first + history.signatures["file_count"][row]]
+    return [(history.paths[path], history.dates[dates]) for path, dates in zip(files["path"], files["dates"])]
+
+
+def find_signsrch(history, text):
+    """
+    Function that finds the files of the signsrch history holding a signature whose title holds a text.
+    :param history: SignsrchHistory.
+    :param text: The text, the case is ignored.
+    :return: List of (signature id, title, path) tuples sorted by signature id.
+    """
+    files = history.files[numpy.isin(history.signatures["title"][history.files["signature"]],
+                                     history.titles.find(text))]
+    return [(int(history.signatures["id"][signature]), history.titles[history.signatures["title"][signature]],
+             history.paths[path]) for signature, path in zip(files["signature"], files["path"])]
+
+
+def binary_signatures(history):
+    """
+    Function that returns the signatures found in every binary of a history, like ResultStore.binary_signatures.
+    The binwalk signatures are named by the part of their description before the first comma, like the result store
+    names them, and the signsrch signatures by their id.
+    :param history: BinwalkHistory or SignsrchHistory.
+    :return: List of (path, signature, description) tuples.
+    """
+    if isinstance(history, BinwalkHistory):
+        paths = history.scans["path"][history.hits["scan"]]
+        return [(history.paths[path], history.descriptions[description].split(",", 1)[0].strip(),
+                 history.descriptions[description]) for path, description in zip(paths, history.hits["description"])]
+    return [(history.paths[path], "%d" % history.signatures["id"][signature],
+             history.titles[history.signatures["title"][signature]])
+            for signature, path in zip(history.files["signature"], history.files["path"])]
+
+
+if __name__ == "__main__":
+
+    # Load a results file and print its summary, or the binaries where a signature holding a text was found
+    if len(sys.argv) not in (2, 3):
+        print("Usage: %s [RESULTS FILE] [TEXT]" % sys.argv[0])
+        exit(1)
+
+    try:
+        start_time = time.perf_counter()
+        results_history = load_results(sys.argv[1])
+        load_time = time.perf_counter() - start_time
+    except (OSError, ValueError) as e:
+        print("An error occurred - %s" % e)
+        exit(1)
+
+    if len(sys.argv) == 3:
+        if isinstance(results_history, BinwalkHistory):
+            for found_path, found_offset, found_description in find_binwalk(results_history, sys.argv[2]):
+                print("  %08x %s - %s" % (found_offset, found_path, found_description))
+        else:
+            for found_id, found_title, found_path in find_signsrch(results_history, sys.argv[2]):
+                print("  %4d %s - %s" % (found_id, found_path, found_title))
+        exit(0)
+
+    print("Number of binaries: %d" % results_history.binaries)
+    print("Number of binaries with signatures: %d" % results_history.binaries_with_signatures)
+    if isinstance(results_history, BinwalkHistory):
+        print("Scans: %d, hits: %d, distinct paths: %d, distinct descriptions: %d" %
+              (len(results_history.scans), len(results_history.hits), len(results_history.paths),
+               len(results_history.descriptions)))
+    else:
+        print("Signatures: %d, files: %d, distinct paths: %d" %
+              (len(results_history.signatures), len(results_history.files), len(results_history.paths)))
+    print("Loaded in %.3f seconds" % load_time)
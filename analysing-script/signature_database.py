@@ -0,0 +1,652 @@
+"""
+Module responsible with compiling the signsrch signature file into a binary signature database.
+The signature file is parsed only once, the database is saved to disk and every scan memory maps it.
+The signature ids follow the numbering used by signsrch, so they line up with the existing reports.
+"""
+from collections import namedtuple
+from enum import Enum
+
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+
+from crc_tables import generate_crc_tables, load_crc_tables
+
+
+# Default path to the signsrch signature file shipped with the analysing script
+DEFAULT_SIGNATURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                                      "signsrch-analysing-script", "res", "signsrch.sig")
+# Default directory where the compiled databases and other caches are stored
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+# Database layout - header, fixed size index entries, string pool and data blob
+DATABASE_MAGIC = b"SIGSRCDB"
+DATABASE_VERSION = 2
+_HEADER = struct.Struct("<8sHI20sIII")
+_ENTRY = struct.Struct("<IBBBBIIIIII")
+
+# Signsrch searches the elements of an AND signature within about 3000 bytes
+AND_WINDOW = 3000
+# Signsrch does not load the tables wider than a byte that open with this many bytes of one repeated value
+REPEATED_VALUE_LENGTH = 64
+
+
+class EndianEnum(Enum):
+    """
+    Enum that holds the byte order of a compiled signature.
+    """
+    NONE = 0
+    LITTLE = 1
+    BIG = 2
+
+
+class KindEnum(Enum):
+    """
+    Enum that holds the kind of data a compiled signature holds.
+    """
+    INTEGER = 0
+    FLOAT = 1
+    CRC = 2
+
+
+class SignatureFileError(Exception):
+    """
+    Exception raised when the signature file or the compiled database cannot be used.
+    """
+    pass
+
+
+# A compiled signature. The data is a zero-copy view in the memory mapped database
+Signature = namedtuple("Signature", ["signature_id", "title", "tag", "kind", "endian", "width", "is_and", "data"])
+
+# A signature as it is written in the signature file, before being compiled
+SignatureDefinition = namedtuple("SignatureDefinition", ["title", "types", "lines"])
+
+
+def describe(signature):
+    """
+    Function that returns the description of a signature as signsrch prints it.
+    :param signature: The compiled signature.
+    :return: String holding the title and the [bits.endian.size] tag.
+    """
+    return "%s [%s]" % (signature.title, signature.tag)
+
+
+def report_line(signature):
+    """
+    Function that returns the line used for a signature in signsrch_results.dat.
+    :param signature: The compiled signature.
+    :return: String holding the id, the title and the tag.
+    """
+    return "%-4u %s" % (signature.signature_id, describe(signature))
+
+
+def _strip_comment(line):
+    """
+    Remove the /* */, // and ; comments and the lines starting with #, leaving the quoted strings untouched.
+    :param line: The line from the signature file.
+    :return: The line without comments.
+    """
+    result = []
+    quote = None
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if quote:
+            result.append(char)
+            if char == "\\" and i + 1 < len(line):
+                result.append(line[i + 1])
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+            result.append(char)
+        elif line.startswith("/*", i):
+            end = line.find("*/", i + 2)
+            if end < 0:
+                break
+            i = end + 1
+            result.append(" ")
+        elif char == ";" or line.startswith("//", i) or (char == "#" and not "".join(result).strip()):
+            break
+        else:
+            result.append(char)
+        i += 1
+    return "".join(result)
+
+
+def parse_signature_file(sig_path):
+    """
+    Function that parses the signsrch signature file into signature definitions, in file order.
+    :param sig_path: Path to the signsrch.sig file.
+    :return: List of SignatureDefinition.
+    """
+    definitions = []
+    title = []
+    types = []
+    lines = []
+    section = None
+
+    def _flush():
+        if title and types:
+            definitions.append(SignatureDefinition(" ".join(title), " ".join(types), list(lines)))
+
+    with open(sig_path, "r", encoding="latin-1") as sig_file:
+        for raw_line in sig_file:
+            line = _strip_comment(raw_line.rstrip("\r\n"))
+            keyword = line.strip().upper()
+            if keyword == "TITLE":
+                _flush()
+                title, types, lines = [], [], []
+                section = "title"
+            elif keyword == "TYPE" and section == "title":
+                section = "type"
+            elif keyword == "DATA" and section == "type":
+                section = "data"
+            elif section == "title" and line.strip():
+                title.append(line.strip())
+            elif section == "type" and line.strip():
+                types.append(line.strip())
+            elif section == "data" and line.strip():
+                lines.append(line)
+    _flush()
+
+    return definitions
+
+
+# Tokens of the DATA section - strings, characters, numbers and words
+_TOKEN_PATTERN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])+\'|[-+]?[\w.]+')
+_ESCAPES = {"n": 10, "t": 9, "r": 13, "0": 0, "a": 7, "b": 8, "f": 12, "v": 11, "e": 27}
+
+
+def _unescape(text):
+    """
+    Convert a printf style string or character literal body into bytes.
+    :param text: The literal without quotes.
+    :return: The bytes of the literal.
+    """
+    result = bytearray()
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char != "\\" or i + 1 == len(text):
+            result.append(ord(char) & 0xff)
+            i += 1
+            continue
+        char = text[i + 1]
+        if char == "x":
+            digits = re.match(r"[0-9a-fA-F]{1,2}", text[i + 2:])
+            if digits:
+                result.append(int(digits.group(), 16))
+                i += 2 + len(digits.group())
+                continue
+        elif char in "01234567":
+            digits = re.match(r"[0-7]{1,3}", text[i + 1:]).group()
+            result.append(int(digits, 8) & 0xff)
+            i += 1 + len(digits)
+            continue
+        result.append(_ESCAPES.get(char, ord(char) & 0xff))
+        i += 2
+    return bytes(result)
+
+
+def _parse_number(token, hex_numbers):
+    """
+    Parse a numeric token of the DATA section.
+    :param token: The token.
+    :param hex_numbers: True if the signature has the HEX type and plain numbers are hexadecimal.
+    :return: An int or a float, None if the token is not a number.
+    """
+    upper = token.upper()
+    if upper in ("INT_MIN", "-INT_MIN"):
+        return -0x80000000
+    if upper == "INT_MAX":
+        return 0x7fffffff
+    sign = -1 if token.startswith("-") else 1
+    body = token.lstrip("+-")
+    try:
+        if re.match(r"^0[xX][0-9a-fA-F]+(U?L{0,2}|L{0,2}U?|U?I64)$", body, re.IGNORECASE):
+            return sign * int(re.match(r"0[xX]([0-9a-fA-F]+)", body).group(1), 16)
+        if re.match(r"^[0-9][0-9a-fA-F]*[hH]$", body):
+            return sign * int(body[:-1], 16)
+        if hex_numbers and re.match(r"^[0-9a-fA-F]+$", body):
+            return sign * int(body, 16)
+        if re.match(r"^[0-9]+(U?L{0,2}|L{0,2}U?|U?I64)$", body, re.IGNORECASE):
+            digits = re.match(r"[0-9]+", body).group()
+            if len(digits) > 1 and digits.startswith("0"):
+                return sign * int(digits, 8)
+            return sign * int(digits)
+        if re.match(r"^([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?[fFlL]?$", body):
+            return sign * float(body.rstrip("fFlL"))
+    except ValueError:
+        return None
+    return None
+
+
+def parse_data(lines, hex_numbers=False):
+    """
+    Function that parses the DATA section of a signature.
+    :param lines: The lines of the DATA section, without comments.
+    :param hex_numbers: True if plain numbers must be read as hexadecimal.
+    :return: List of items, each one being an int, a float or bytes for strings.
+    """
+    items = []
+    for line in lines:
+        for token in _TOKEN_PATTERN.findall(line):
+            if token.startswith('"'):
+                items.append(_unescape(token[1:-1]))
+            elif token.startswith("'"):
+                value = _unescape(token[1:-1])
+                items.append(value[0] if value else 0)
+            else:
+                number = _parse_number(token, hex_numbers)
+                if number is not None:
+                    items.append(number)
+    return items
+
+
+def _pack_integers(items, width, endian):
+    """
+    Pack the DATA items as integer elements of the given width.
+    :param items: The parsed DATA items.
+    :param width: The element width in bytes.
+    :param endian: EndianEnum of the elements.
+    :return: The packed bytes.
+    """
+    byteorder = "big" if endian == EndianEnum.BIG else "little"
+    mask = (1 << (width * 8)) - 1
+    packed = bytearray()
+    for item in items:
+        if isinstance(item, bytes):
+            packed += item
+        else:
+            packed += (int(item) & mask).to_bytes(width, byteorder)
+    return bytes(packed)
+
+
+def _pack_floats(items, width, endian):
+    """
+    Pack the DATA items as float (4 bytes) or double (8 bytes) elements.
+    :param items: The parsed DATA items.
+    :param width: 4 for float, 8 for double.
+    :param endian: EndianEnum of the elements.
+    :return: The packed bytes.
+    """
+    fmt = "%s%s" % (">" if endian == EndianEnum.BIG else "<", "f" if width == 4 else "d")
+    packed = bytearray()
+    for item in items:
+        if isinstance(item, bytes):
+            packed += item
+        else:
+            packed += struct.pack(fmt, float(item))
+    return bytes(packed)
+
+
+def _pack_table(table, width, endian):
+    """
+    Pack a CRC table as integer elements of the given width.
+    :param table: numpy.uint64 array with the table entries.
+    :param width: The element width in bytes.
+    :param endian: EndianEnum of the elements.
+    :return: The packed bytes.
+    """
+    dtype = "%su%d" % (">" if endian == EndianEnum.BIG else "<", width)
+    return table.astype(dtype).tobytes()
+
+
+def crc_variants(bits):
+    """
+    Function that returns the variants generated for each polynomial of a CRC signature, in signsrch order.
+    :param bits: The CRC width in bits.
+    :return: List of (endian, reverse, msb_first) tuples.
+    """
+    endians = [EndianEnum.LITTLE] if bits <= 8 else [EndianEnum.LITTLE, EndianEnum.BIG]
+    return [(endian, reverse, msb_first)
+            for endian in endians
+            for reverse in (False, True)
+            for msb_first in (True, False)]
+
+
+def _crc_tag(poly, bits, endian, reverse, msb_first):
+    """
+    Build the tag signsrch prints for a CRC table, for example crc8.0x1d lenorev int_min.256
+    """
+    return "crc%d.0x%0*x %ce%s%s.%u" % (bits, max(bits // 4, 2), poly & ((1 << bits) - 1),
+                                      "b" if endian == EndianEnum.BIG else "l",
+                                      " rev" if reverse else "norev",
+                                      " int_min" if msb_first else " 1",
+                                      256 * max(bits // 8, 1))
+
+
+def _parse_types(types):
+    """
+    Parse the TYPE section of a signature.
+    :param types: The TYPE section text.
+    :return: Tuple of (element widths, set of flags, crc bits).
+    """
+    tokens = [token.upper() for token in re.split(r"[\s,]+", types) if token]
+    widths = []
+    flags = set()
+    crc_bits = 0
+    for i, token in enumerate(tokens):
+        if token == "CRC":
+            flags.add(token)
+        elif token in ("AND", "HEX", "NOBIG"):
+            flags.add(token)
+        elif token == "FLOAT":
+            widths.append(token)
+        elif token in ("8", "16", "32", "64"):
+            if "CRC" in flags and not crc_bits:
+                crc_bits = int(token)
+            else:
+                widths.append(int(token))
+    return widths, flags, crc_bits
+
+
+def crc_polynomials(definitions):
+    """
+    Function that collects the polynomials of the CRC signatures.
+    :param definitions: List of SignatureDefinition.
+    :return: List of (polynomial, bits) tuples.
+    """
+    polys = []
+    for definition in definitions:
+        _, flags, crc_bits = _parse_types(definition.types)
+        if "CRC" in flags:
+            polys.extend((int(poly), crc_bits) for poly in parse_data(definition.lines, "HEX" in flags)
+                         if not isinstance(poly, bytes))
+    return polys
+
+
+def is_repeated_value_table(data, width):
+    """
+    Function that tells whether signsrch skips a table as a fill of one repeated value, like the dct_basis table
+    opening with 64 bytes of 0x34. The tables of zeroes are kept, their runs are the padding of sparse tables.
+    :param data: The packed data of the signature.
+    :param width: The element width in bytes.
+    :return: True if the table is skipped.
+    """
+    head = data[:REPEATED_VALUE_LENGTH]
+    return width > 1 and len(head) == REPEATED_VALUE_LENGTH and head[0] != 0 and head.count(head[:1]) == len(head)
+
+
+def compile_signatures(definitions, big_endian=True, crc_tables=None):
+    """
+    Function that compiles the signature definitions into signatures, numbered as signsrch numbers them.
+    :param definitions: List of SignatureDefinition in file order.
+    :param big_endian: False to skip the big endian versions, like the signsrch -b option.
+    :param crc_tables: Optional. The CRC tables returned by the crc_tables module, generated when missing.
+    :return: List of Signature with bytes data.
+    """
+    if crc_tables is None:
+        crc_tables = generate_crc_tables(crc_polynomials(definitions))
+    signatures = []
+
+    def _add(title, tag, kind, endian, width, is_and, data):
+        compiled.add(data)
+        signatures.append(Signature(len(signatures) + 1, title, tag, kind, endian, width, is_and, data))
+
+    for definition in definitions:
+        widths, flags, crc_bits = _parse_types(definition.types)
+        items = parse_data(definition.lines, "HEX" in flags)
+        # Signsrch does not add a version identical to one already added, like the big endian version
+        # of byte palindromes or the 32 bit version of a string
+        compiled = set()
+        is_and = "AND" in flags
+        and_flag = "&" if is_and else ""
+        endians = [EndianEnum.LITTLE]
+        if big_endian and "NOBIG" not in flags:
+            endians.append(EndianEnum.BIG)
+
+        if "CRC" in flags:
+            for poly in items:
+                if isinstance(poly, bytes):
+                    continue
+                for endian, reverse, msb_first in crc_variants(crc_bits):
+                    if endian == EndianEnum.BIG and not big_endian:
+                        continue
+                    table = crc_tables[(int(poly) & ((1 << crc_bits) - 1), crc_bits, reverse, msb_first)]
+                    width = max(crc_bits // 8, 1)
+                    _add(definition.title, _crc_tag(int(poly), crc_bits, endian, reverse, msb_first),
+                         KindEnum.CRC, endian, width, False, _pack_table(table, width, endian))
+            continue
+
+        for width in widths:
+            if width == "FLOAT":
+                # The elements of an AND signature are only searched as doubles
+                float_widths = ((8, "double"),) if is_and else ((4, "float"), (8, "double"))
+                for float_width, name in float_widths:
+                    for endian in endians:
+                        data = _pack_floats(items, float_width, endian)
+                        if data in compiled:
+                            continue
+                        _add(definition.title, "%s.%s.%u%s" % (name, endian_name(endian), len(data), and_flag),
+                             KindEnum.FLOAT, endian, float_width, is_and, data)
+            elif width == 8:
+                data = _pack_integers(items, 1, EndianEnum.NONE)
+                if data in compiled:
+                    continue
+                _add(definition.title, "..%u%s" % (len(data), and_flag),
+                     KindEnum.INTEGER, EndianEnum.NONE, 1, is_and, data)
+            else:
+                for endian in endians:
+                    data = _pack_integers(items, width // 8, endian)
+                    if data in compiled or is_repeated_value_table(data, width // 8):
+                        continue
+                    _add(definition.title, "%u.%s.%u%s" % (width, endian_name(endian), len(data), and_flag),
+                         KindEnum.INTEGER, endian, width // 8, is_and, data)
+
+    return signatures
+
+
+def endian_name(endian):
+    """
+    Function that returns the endian name used in the signsrch tags.
+    :param endian: EndianEnum of the signature.
+    :return: "le", "be" or an empty string for byte signatures.
+    """
+    return {EndianEnum.LITTLE: "le", EndianEnum.BIG: "be"}.get(endian, "")
+
+
+def _file_digest(path):
+    """
+    Compute the SHA-1 digest of a file.
+    :param path: The file path.
+    :return: The 20 bytes digest.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def write_database(signatures, db_path, source_digest):
+    """
+    Function that writes compiled signatures to a database file.
+    The file is first written to a temporary path and then renamed so readers never see a partial database.
+    :param signatures: List of compiled Signature.
+    :param db_path: Path of the database file.
+    :param source_digest: SHA-1 digest of the signature file the signatures were compiled from.
+    """
+    strings = bytearray()
+    blob = bytearray()
+    entries = []
+    for signature in signatures:
+        title = signature.title.encode("latin-1", "replace")
+        tag = signature.tag.encode("latin-1", "replace")
+        title_offset = len(strings)
+        strings += title
+        tag_offset = len(strings)
+        strings += tag
+        data_offset = len(blob)
+        blob += signature.data
+        entries.append(_ENTRY.pack(signature.signature_id, signature.kind.value, signature.endian.value,
+                                   signature.width, 1 if signature.is_and else 0,
+                                   title_offset, len(title), tag_offset, len(tag), data_offset, len(signature.data)))
+
+    index_offset = _HEADER.size
+    strings_offset = index_offset + _ENTRY.size * len(entries)
+    data_offset = strings_offset + len(strings)
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    tmp_path = "%s.%d.tmp" % (db_path, os.getpid())
+    with open(tmp_path, "wb") as db_file:
+        db_file.write(_HEADER.pack(DATABASE_MAGIC, DATABASE_VERSION, len(entries), source_digest,
+                                   index_offset, strings_offset, data_offset))
+        db_file.write(b"".join(entries))
+        db_file.write(strings)
+        db_file.write(blob)
+    os.replace(tmp_path, db_path)
+
+
+class SignatureDatabase:
+    """
+    Class that represents a compiled signature database, memory mapped from disk.
+    The signatures are decoded lazily and their data is a view in the mapping, so loading costs milliseconds.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._file = open(db_path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            self._file.close()
+            raise SignatureFileError("Empty signature database %s - %s" % (db_path, e))
+
+        magic, version, self._count, self.source_digest, self._index_offset, self._strings_offset, \
+            self._data_offset = _HEADER.unpack_from(self._mmap, 0)
+        if magic != DATABASE_MAGIC or version != DATABASE_VERSION:
+            self.close()
+            raise SignatureFileError("%s is not a version %d signature database" % (db_path, DATABASE_VERSION))
+
+        self._view = memoryview(self._mmap)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self._entry(index)
+
+    def __getitem__(self, signature_id):
+        """
+        Return the signature with the given signsrch id.
+        :param signature_id: The signature id, starting from 1.
+        :return: The Signature.
+        """
+        if not 1 <= signature_id <= self._count:
+            raise KeyError(signature_id)
+        return self._entry(signature_id - 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _entry(self, index):
+        """
+        Decode the index entry at the given position.
+        """
+        signature_id, kind, endian, width, flags, title_offset, title_length, tag_offset, tag_length, \
+            data_offset, data_length = _ENTRY.unpack_from(self._mmap, self._index_offset + index * _ENTRY.size)
+        strings = self._strings_offset
+        data = self._data_offset + data_offset
+        return Signature(signature_id,
+                         bytes(self._view[strings + title_offset:strings + title_offset + title_length]).decode("latin-1"),
+                         bytes(self._view[strings + tag_offset:strings + tag_offset + tag_length]).decode("latin-1"),
+                         KindEnum(kind), EndianEnum(endian), width, bool(flags & 1),
+                         self._view[data:data + data_length])
+
+    def close(self):
+        """
+        Method that releases the memory mapping and the file.
+        """
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        if getattr(self, "_mmap", None) is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Signature data views are still referenced, the mapping is released together with them
+                pass
+            self._mmap = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def default_database_path(sig_path):
+    """
+    Function that returns the default cache path of the database compiled from a signature file.
+    :param sig_path: Path to the signature file.
+    :return: Path to the database file.
+    """
+    name = os.path.splitext(os.path.basename(sig_path))[0]
+    return os.path.join(DEFAULT_CACHE_PATH, "%s.sigdb" % name)
+
+
+def default_crc_cache_path(sig_path):
+    """
+    Function that returns the default cache path of the CRC tables generated from a signature file.
+    :param sig_path: Path to the signature file.
+    :return: Path to the CRC tables file.
+    """
+    name = os.path.splitext(os.path.basename(sig_path))[0]
+    return os.path.join(DEFAULT_CACHE_PATH, "%s.crc.npz" % name)
+
+
+def load_database(sig_path=DEFAULT_SIGNATURE_FILE, db_path=None):
+    """
+    Function that loads the compiled database, compiling the signature file only when it changed.
+    :param sig_path: Path to the signsrch.sig file.
+    :param db_path: Optional. Path to the database file, defaults to the cache directory.
+    :return: The SignatureDatabase.
+    """
+    if not db_path:
+        db_path = default_database_path(sig_path)
+
+    try:
+        digest = _file_digest(sig_path)
+    except OSError as e:
+        raise SignatureFileError("Cannot read the signature file %s - %s" % (sig_path, e))
+
+    if os.path.isfile(db_path):
+        try:
+            database = SignatureDatabase(db_path)
+            if database.source_digest == digest:
+                return database
+            database.close()
+        except (SignatureFileError, struct.error):
+            pass
+
+    definitions = parse_signature_file(sig_path)
+    crc_tables = load_crc_tables(crc_polynomials(definitions), default_crc_cache_path(sig_path), digest)
+    write_database(compile_signatures(definitions, crc_tables=crc_tables), db_path, digest)
+    return SignatureDatabase(db_path)
+
+
+if __name__ == "__main__":
+
+    # Compile the signature file and list the signatures like signsrch -l
+    if len(sys.argv) > 3:
+        print("Usage: %s [SIGNATURE FILE] [DATABASE FILE]" % sys.argv[0])
+        exit(1)
+
+    try:
+        with load_database(*sys.argv[1:]) as signature_database:
+            print("  num  description [bits.endian.size]")
+            print("-------------------------------------")
+            for listed_signature in signature_database:
+                print("  %s" % report_line(listed_signature))
+            print("\n%d signatures in %s" % (len(signature_database), signature_database.db_path))
+    except SignatureFileError as e:
+        print("A signature file error occurred - %s" % e)
+        exit(1)
@@ -0,0 +1,320 @@
+"""
+Module responsible with scanning binaries for the compiled signsrch signatures.
+All the signatures, in both endianness, are searched in a single pass with one Aho-Corasick automaton.
+"""
+from collections import namedtuple, deque
+
+import hashlib
+import mmap
+import os
+import re
+import sys
+
+from and_matcher import AndMatcher
+from region_map import load_region_map, PADDING_BYTES
+from signature_database import EndianEnum, load_database, report_line, SignatureFileError
+
+
+# Bump it when the hits change, the cached results of older versions are then not used
+SCANNER_VERSION = 2
+# The automaton is built over a short key of every signature, the rest of the signature is compared on a hit
+DEFAULT_KEY_LENGTH = 16
+# The key is the window with the most distinct bytes found in the first bytes of the signature
+_KEY_SEARCH_LENGTH = 256
+_KEY_SEARCH_STEP = 4
+
+# Runs of the padding bytes skipped by the region map
+_PADDING_RUN = re.compile(b"|".join(re.escape(bytes([padding_byte])) + b"+" for padding_byte in PADDING_BYTES))
+
+# A signature found in a binary
+Hit = namedtuple("Hit", ["signature_id", "offset", "endian"])
+
+
+def scanner_version(database):
+    """
+    Function that returns the version of the hits, which depend on the scanner and on the signature file.
+    :param database: The SignatureDatabase.
+    :return: String holding the scanner version and the digest of the signature file.
+    """
+    return "%d.%s" % (SCANNER_VERSION, database.source_digest.hex())
+
+
+def select_key(data, key_length):
+    """
+    Function that selects the key of a signature, avoiding the runs of zeros or 0xff many tables start with.
+    :param data: The signature bytes.
+    :param key_length: The key length.
+    :return: Tuple of (key offset in the signature, key bytes).
+    """
+    if len(data) <= key_length:
+        return 0, data
+    last = min(len(data) - key_length, _KEY_SEARCH_LENGTH)
+    best_offset = max(range(0, last + 1, _KEY_SEARCH_STEP),
+                      key=lambda offset: (len(set(data[offset:offset + key_length])), -offset))
+    return best_offset, data[best_offset:best_offset + key_length]
+
+
+def longest_padding_run(data):
+    """
+    Function that finds the longest run of a padding byte in a signature.
+    :param data: The signature bytes.
+    :return: The length of the run.
+    """
+    return max([len(run) for run in _PADDING_RUN.findall(data)] or [0])
+
+
+def format_hit(database, hit):
+    """
+    Function that formats a hit the way signsrch prints it in the .signdat reports.
+    :param database: The SignatureDatabase the hit refers to.
+    :param hit: The Hit.
+    :return: String holding the offset, the id and the description.
+    """
+    return "%08x %s" % (hit.offset, report_line(database[hit.signature_id]))
+
+
+class AhoCorasickAutomaton:
+    """
+    Class that represents a byte level Aho-Corasick automaton.
+    Every key is added with a value and the search returns the values of all the keys ending at each offset.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [()]
+        self._built = False
+
+    def add(self, key, value):
+        """
+        Method that adds a key to the automaton.
+        :param key: The bytes to be searched.
+        :param value: The value returned when the key is found.
+        """
+        state = 0
+        for byte in key:
+            next_state = self._goto[state].get(byte)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+                self._goto[state][byte] = next_state
+            state = next_state
+        self._outputs[state] = self._outputs[state] + ((len(key), value),)
+        self._built = False
+
+    def build(self):
+        """
+        Method that computes the failure links, breadth first, and merges the outputs along them.
+        """
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for byte, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and byte not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(byte, 0)
+                self._fail[next_state] = fail if fail != next_state else 0
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+        self._built = True
+
+    def __len__(self):
+        return len(self._goto)
+
+    def iter_matches(self, buffer):
+        """
+        Method that searches all the keys in a buffer in a single pass.
+        :param buffer: Object supporting the buffer protocol, for example a mmap.
+        :return: Generator of (start offset, value) tuples.
+        """
+        if not self._built:
+            self.build()
+
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        root = goto[0]
+        state = 0
+        view = memoryview(buffer).cast("B")
+        try:
+            for offset, byte in enumerate(view):
+                while state:
+                    next_state = goto[state].get(byte)
+                    if next_state is not None:
+                        state = next_state
+                        break
+                    state = fail[state]
+                else:
+                    state = root.get(byte, 0)
+                if outputs[state]:
+                    for key_length, value in outputs[state]:
+                        yield offset - key_length + 1, value
+        finally:
+            view.release()
+
+
+class SignatureScanner:
+    """
+    Class that scans buffers and files for all the signatures of a signature database.
+    """
+
+    def __init__(self, database, key_length=DEFAULT_KEY_LENGTH):
+        """
+        Build the automaton from every signature of the database.
+        The AND signatures are not searched as a whole, their elements are added to the same automaton and the
+        signatures are confirmed by the and_matcher module.
+        :param database: The SignatureDatabase.
+        :param key_length: Optional. The number of leading bytes of each signature used by the automaton.
+        """
+        self.database = database
+        self.key_length = key_length
+        self.version = scanner_version(database)
+        self.and_matcher = AndMatcher(database)
+        self._automaton = AhoCorasickAutomaton()
+        # A signature holding at most this many padding bytes in a row is found next to the padding runs
+        self.padding_margin = 0
+
+        # Signatures sharing the same key are kept together and told apart by comparing the remaining bytes
+        groups = {}
+        self.longest_signature = 0
+        for signature in database:
+            if signature.is_and or not len(signature.data):
+                continue
+            data = bytes(signature.data)
+            self.longest_signature = max(self.longest_signature, len(data))
+            self.padding_margin = max(self.padding_margin, longest_padding_run(data))
+            key_offset, key = select_key(data, key_length)
+            groups.setdefault(key, []).append((signature.signature_id, signature.endian, data, key_offset))
+        and_keys = self.and_matcher.element_keys()
+        for element in and_keys:
+            self.padding_margin = max(self.padding_margin, longest_padding_run(element))
+        for key in set(groups) | set(and_keys):
+            self._automaton.add(key, (tuple(groups.get(key, ())), and_keys.get(key, ())))
+        self._automaton.build()
+        # A hit of the element of a single element signature is a match of its own, its runs are kept whole
+        self._single_element_ids = set(signature_id for signature_id, and_signature in
+                                       self.and_matcher.signatures.items() if len(and_signature.elements) == 1)
+
+    def search(self, buffer):
+        """
+        Method that runs the automaton over a buffer, without confirming the AND signatures.
+        :param buffer: A bytes like object or a mmap.
+        :return: Tuple of (list of Hit, dictionary of AND signature id to its element hits).
+        """
+        hits = []
+        element_hits = {}
+        length = len(buffer)
+        for key_start, (group, and_references) in self._automaton.iter_matches(buffer):
+            for signature_id, endian, data, key_offset in group:
+                offset = key_start - key_offset
+                end = offset + len(data)
+                if offset >= 0 and end <= length and (len(data) <= self.key_length or buffer[offset:end] == data):
+                    hits.append(Hit(signature_id, offset, endian))
+            # The automaton reports the offsets in order, so the element hits are already sorted
+            for signature_id, element_index in and_references:
+                signature_hits = element_hits.setdefault(signature_id, [])
+                if len(signature_hits) > 1 and signature_hits[-1][1] == signature_hits[-2][1] == element_index \
+                        and signature_id not in self._single_element_ids:
+                    # Only the first and the last hit of a run of the same element can bound the smallest window
+                    signature_hits[-1] = (key_start, element_index)
+                else:
+                    signature_hits.append((key_start, element_index))
+        return hits, element_hits
+
+    def scan(self, buffer, regions=None):
+        """
+        Method that searches all the signatures in a buffer.
+        :param buffer: A bytes like object or a mmap.
+        :param regions: Optional. List of (start, end) regions to be searched, sorted and not overlapping, like the
+        data regions of a RegionMap. The whole buffer is searched by default.
+        :return: List of Hit sorted by offset and signature id.
+        """
+        if regions is None:
+            hits, element_hits = self.search(buffer)
+        else:
+            hits = []
+            element_hits = {}
+            with memoryview(buffer) as view:
+                for start, end in regions:
+                    with view[start:end] as region:
+                        region_hits, region_element_hits = self.search(region)
+                    hits.extend(Hit(hit.signature_id, start + hit.offset, hit.endian) for hit in region_hits)
+                    for signature_id, signature_hits in region_element_hits.items():
+                        element_hits.setdefault(signature_id, []).extend(
+                            (start + offset, element_index) for offset, element_index in signature_hits)
+        for signature_id, offset, endian in self.and_matcher.match(element_hits):
+            hits.append(Hit(signature_id, offset, endian))
+        hits.sort(key=lambda hit: (hit.offset, hit.signature_id))
+        return hits
+
+    def scan_file(self, binary_path, skip_padding=True, cache=None):
+        """
+        Method that memory maps a binary and searches all the signatures in it.
+        :param binary_path: Path to the binary.
+        :param skip_padding: Optional. False to search the padding runs of the binary too.
+        :param cache: Optional. The ResultCache, a content already scanned by this version is not scanned again.
+        :return: List of Hit sorted by offset and signature id.
+        """
+        with open(binary_path, "rb") as binary:
+            if os.fstat(binary.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+                return self.scan_mapped(binary_path, mapped_binary, skip_padding, cache)
+
+    def scan_mapped(self, binary_path, buffer, skip_padding=True, cache=None, sha256=None):
+        """
+        Method that searches all the signatures in a binary already mapped.
+        :param binary_path: Path to the binary, its padding map is cached for it.
+        :param buffer: The mmap of the binary.
+        :param skip_padding: Optional. False to search the padding runs of the binary too.
+        :param cache: Optional. The ResultCache, a content already scanned by this version is not scanned again.
+        :param sha256: Optional. The SHA-256 digest of the binary, computed from the buffer when the cache needs it.
+        :return: List of Hit sorted by offset and signature id.
+        """
+        if cache is not None:
+            if sha256 is None:
+                sha256 = hashlib.sha256(buffer).hexdigest()
+            cache.add_alias(sha256, binary_path)
+            cached = cache.get(sha256, "signsrch", self.version)
+            if cached is not None:
+                return [Hit(signature_id, offset, EndianEnum(endian)) for signature_id, offset, endian in cached]
+
+        regions = None
+        if skip_padding:
+            regions = load_region_map(binary_path, buffer).data_regions(self.padding_margin)
+        hits = self.scan(buffer, regions)
+        if cache is not None:
+            cache.put(sha256, "signsrch", self.version,
+                      [(hit.signature_id, hit.offset, hit.endian.value) for hit in hits])
+        return hits
+
+
+if __name__ == "__main__":
+
+    # Scan the given binaries and print the hits like signsrch does
+    if len(sys.argv) < 2:
+        print("Usage: %s [BINARY] ... [BINARY]" % sys.argv[0])
+        exit(1)
+
+    try:
+        signature_database = load_database()
+    except SignatureFileError as e:
+        print("A signature file error occurred - %s" % e)
+        exit(1)
+
+    scanner = SignatureScanner(signature_database)
+    for binary_file in sys.argv[1:]:
+        try:
+            print("%s" % binary_file)
+            print("  offset   num  description [bits.endian.size]")
+            print("--------------------------------------------")
+            for found_hit in scanner.scan_file(binary_file):
+                print("%s" % format_hit(signature_database, found_hit))
+            print("")
+        except OSError as e:
+            print("An OS error occurred - %s" % e)
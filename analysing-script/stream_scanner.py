@@ -0,0 +1,154 @@
+"""
+Module responsible with scanning images larger than the memory, from a file or a pipe.
+The data is read in fixed size chunks and every chunk is scanned together with the first bytes of the next one,
+as many as the longest signature, so the signatures crossing a chunk boundary are found exactly once.
+"""
+import sys
+
+from prefilter import PrefilterScanner
+from signature_database import load_database, SignatureFileError
+from signature_scanner import format_hit, Hit
+
+
+# The default memory, in bytes, used for the data of the scan
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+def _read_fully(stream, view):
+    """
+    Read from a stream until the view is full or the stream ends, pipes may return less than asked.
+    :param stream: Binary stream supporting readinto.
+    :param view: memoryview to be filled.
+    :return: The number of bytes read.
+    """
+    filled = 0
+    while filled < len(view):
+        read = stream.readinto(view[filled:])
+        if not read:
+            break
+        filled += read
+    return filled
+
+
+def chunk_size(memory_budget, overlap, copies=1):
+    """
+    Function that computes the chunk size which keeps the scan within a memory budget.
+    :param memory_budget: The memory, in bytes, available for the data.
+    :param overlap: The number of bytes read past every chunk.
+    :param copies: Optional. The number of copies of the window held at the same time.
+    :return: The chunk size in bytes.
+    """
+    size = memory_budget // copies - overlap
+    if size <= 0:
+        raise ValueError("The memory budget of %d bytes is too small for an overlap of %d bytes" %
+                         (memory_budget, overlap))
+    return size
+
+
+def iter_windows(stream, size, overlap):
+    """
+    Function that reads a stream in chunks, every chunk followed by the first bytes of the next one.
+    The same buffer is reused for all the windows, so a window must be used before the next one is read.
+    :param stream: Binary stream supporting readinto, like an opened file or sys.stdin.buffer.
+    :param size: The chunk size.
+    :param overlap: The number of bytes read past every chunk.
+    :return: Generator of (chunk offset, chunk length, window memoryview) tuples. Only the matches starting in
+    the first chunk length bytes of a window belong to it.
+    """
+    buffer = bytearray(size + overlap)
+    view = memoryview(buffer)
+    base = 0
+    length = _read_fully(stream, view)
+    while length:
+        if length < len(buffer):
+            # The stream ended, the whole window belongs to the last chunk
+            yield base, length, view[:length]
+            break
+        yield base, size, view
+        buffer[:overlap] = buffer[size:]
+        base += size
+        length = overlap + _read_fully(stream, view[overlap:])
+
+
+def stream_signatures(scanner, stream, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Function that searches the signsrch signatures in a stream, chunk by chunk.
+    The AND signatures are confirmed after every chunk, only the element hits of the windows still open are kept.
+    :param scanner: The SignatureScanner or the PrefilterScanner.
+    :param stream: Binary stream supporting readinto.
+    :param memory_budget: Optional. The memory, in bytes, used for the data.
+    :return: Generator of Hit with absolute offsets, sorted by offset within every chunk. An AND signature is
+    returned with the chunk its window ends in.
+    """
+    overlap = scanner.longest_signature
+    open_element_hits = {}
+    for base, length, window in iter_windows(stream, chunk_size(memory_budget, overlap), overlap):
+        hits, element_hits = scanner.search(window)
+        chunk_hits = [Hit(hit.signature_id, base + hit.offset, hit.endian) for hit in hits if hit.offset < length]
+        for signature_id, signature_hits in element_hits.items():
+            open_element_hits.setdefault(signature_id, []).extend(
+                (base + offset, element_index) for offset, element_index in signature_hits if offset < length)
+        chunk_hits.extend(Hit(signature_id, offset, endian) for signature_id, offset, endian
+                          in scanner.and_matcher.confirm(open_element_hits, base + length))
+        for hit in sorted(chunk_hits, key=lambda chunk_hit: (chunk_hit.offset, chunk_hit.signature_id)):
+            yield hit
+
+
+def stream_binwalk(scanner, stream, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Function that scans a stream with the binwalk signatures, chunk by chunk.
+    :param scanner: The BinwalkScanner.
+    :param stream: Binary stream supporting readinto.
+    :param memory_budget: Optional. The memory, in bytes, used for the data.
+    :return: Generator of BinwalkResult with absolute offsets.
+    """
+    from binwalk_scanner import BINWALK_OVERLAP
+
+    scanner.reset()
+    # Binwalk scans a string copy of every window
+    for base, length, window in iter_windows(stream, chunk_size(memory_budget, BINWALK_OVERLAP, 2),
+                                             BINWALK_OVERLAP):
+        # The size of the stream is only known at its last window, the results going past the others are kept
+        size = base + len(window) if len(window) == length else sys.maxsize
+        for result in scanner.scan(window, length, base, size):
+            yield result
+
+
+if __name__ == "__main__":
+
+    # Parse the options and scan the file, or the standard input for -
+    arguments = sys.argv[1:]
+    budget = DEFAULT_MEMORY_BUDGET
+    analyser = "signsrch"
+    while len(arguments) > 1 and arguments[0] in ("-m", "-a"):
+        if arguments[0] == "-m":
+            budget = int(arguments[1]) * 1024 * 1024
+        else:
+            analyser = arguments[1]
+        arguments = arguments[2:]
+
+    if len(arguments) != 1 or analyser not in ("signsrch", "binwalk"):
+        print("Usage: %s [-m MEGABYTES] [-a binwalk|signsrch] [FILE|-]" % sys.argv[0])
+        exit(1)
+
+    try:
+        input_stream = sys.stdin.buffer if arguments[0] == "-" else open(arguments[0], "rb")
+        with input_stream:
+            if analyser == "signsrch":
+                signature_database = load_database()
+                for found_hit in stream_signatures(PrefilterScanner(signature_database), input_stream, budget):
+                    print("%s" % format_hit(signature_database, found_hit))
+            else:
+                from binwalk_scanner import BinwalkScanner, format_result
+
+                for found_result in stream_binwalk(BinwalkScanner(), input_stream, budget):
+                    print("%s" % format_result(found_result))
+    except SignatureFileError as e:
+        print("A signature file error occurred - %s" % e)
+        exit(1)
+    except ValueError as e:
+        print("%s" % e)
+        exit(1)
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
+        exit(1)
@@ -0,0 +1,155 @@
+"""
+Module responsible with extracting the strings of the binaries and the dates and times among them.
+It replaces the strings64 step of Analyse-Reports and its date regular expression. The ASCII and UTF-16LE strings are
+found with NumPy masks over the buffer the other analysers use, only the strings which can be a date or a time are
+matched with the expression of the PowerShell script, and the matches are returned as typed values.
+"""
+from collections import namedtuple
+
+import datetime
+import mmap
+import os
+import re
+import sys
+
+import numpy
+
+
+# Like strings64, the strings are runs of at least 3 printable characters, ASCII or UTF-16LE
+MIN_STRING_LENGTH = 3
+# The longest string the date expression matches, like "31/12/2018 11:59:59 PM"
+MAX_DATE_LENGTH = 22
+
+# The date and time expression of Analyse-Reports, a whole string must match it
+DATE_PATTERN = re.compile(
+    r"^(?=\d)(?:(?:31(?!.(?:0?[2469]|11))|(?:30|29)(?!.0?2)|29(?=.0?2.(?:(?:(?:1[6-9]|[2-9]\d)?"
+    r"(?:0[48]|[2468][048]|[13579][26])|(?:(?:16|[2468][048]|[3579][26])00)))(?:\x20|$))|(?:2[0-8]|1\d|0?[1-9]))"
+    r"([-.\/])(?:1[012]|0?[1-9])\1(?:1[6-9]|[2-9]\d)?\d\d(?:(?=\x20\d)\x20|$))?(((0?[1-9]|1[012])(:[0-5]\d){0,2}"
+    r"(\x20[AP]M))|([01]\d|2[0-3])(:[0-5]\d){1,2})?$", re.IGNORECASE)
+# A date or a time holds at least one of these separators, the space comes before AM or PM
+_SEPARATORS = re.compile(r"[-./: ]")
+
+# A date or a time found in a binary. The value is a datetime.date, a datetime.time or a datetime.datetime
+DateString = namedtuple("DateString", ["offset", "text", "value"])
+
+
+def _runs(mask, min_length):
+    """
+    Find the runs of True values of a mask.
+    :param mask: numpy boolean array.
+    :param min_length: The shortest run reported.
+    :return: Tuple of numpy arrays of (run starts, run lengths).
+    """
+    edges = numpy.diff(numpy.concatenate(([0], mask.view(numpy.int8), [0])))
+    starts = numpy.flatnonzero(edges == 1)
+    lengths = numpy.flatnonzero(edges == -1) - starts
+    long_runs = lengths >= min_length
+    return starts[long_runs], lengths[long_runs]
+
+
+def _string_runs(data):
+    """
+    Find the ASCII and UTF-16LE strings of a byte array.
+    :param data: numpy uint8 array.
+    :return: List of (offset, length in bytes, bytes per character) tuples, the ASCII strings first.
+    """
+    printable = (data >= 0x20) & (data <= 0x7e)
+    runs = []
+    starts, lengths = _runs(printable, MIN_STRING_LENGTH)
+    runs.append((starts, lengths, 1))
+    # The UTF-16LE characters are a printable byte followed by a zero, at both alignments
+    for alignment in (0, 1):
+        pairs = max(len(data) - alignment, 0) // 2
+        characters = printable[alignment:alignment + 2 * pairs:2] & (data[alignment + 1:alignment + 2 * pairs:2] == 0)
+        starts, lengths = _runs(characters, MIN_STRING_LENGTH)
+        runs.append((alignment + 2 * starts, 2 * lengths, 2))
+    return runs
+
+
+def find_strings(buffer, start=0, end=None):
+    """
+    Function that finds the ASCII and UTF-16LE strings of a buffer.
+    :param buffer: A bytes like object or a mmap.
+    :param start: Optional. The offset where the search starts.
+    :param end: Optional. The offset where the search ends.
+    :return: List of (offset, string) tuples, the ASCII strings first.
+    """
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)[start:end]
+    strings = []
+    for starts, lengths, width in _string_runs(data):
+        encoding = "ascii" if width == 1 else "utf-16-le"
+        strings.extend((start + offset, data[offset:offset + length].tobytes().decode(encoding))
+                       for offset, length in zip(starts.tolist(), lengths.tolist()))
+    return strings
+
+
+def parse_date(text):
+    """
+    Function that turns a string matched by the date expression into a typed value.
+    The dates are day first, like the expression expects, and the years of two digits follow strptime.
+    :param text: The string.
+    :return: A datetime.date, a datetime.time or a datetime.datetime.
+    """
+    date = None
+    time = None
+    words = text.upper().split(" ")
+    if re.search(r"[-./]", words[0]):
+        day, month, year = (int(number) for number in re.split(r"[-./]", words.pop(0)))
+        if year < 100:
+            year += 2000 if year < 69 else 1900
+        date = datetime.date(year, month, day)
+    if words:
+        numbers = [int(number) for number in words[0].split(":")] + [0, 0]
+        hour, minute, second = numbers[:3]
+        if len(words) > 1:
+            hour = hour % 12 + (12 if words[1] == "PM" else 0)
+        time = datetime.time(hour, minute, second)
+    if date is not None and time is not None:
+        return datetime.datetime.combine(date, time)
+    return date if date is not None else time
+
+
+def find_dates(buffer, regions=None):
+    """
+    Function that finds the strings of a buffer which are dates or times.
+    The strings too long, not starting with a digit or without a separator are left out before the expression.
+    :param buffer: A bytes like object or a mmap.
+    :param regions: Optional. List of (start, end) regions to be searched, the whole buffer by default.
+    :return: List of DateString sorted by offset.
+    """
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    digits = (data >= 0x30) & (data <= 0x39)
+    dates = []
+    for start, end in regions if regions is not None else [(0, len(data))]:
+        for starts, lengths, width in _string_runs(data[start:end]):
+            starts += start
+            # The expression only matches short strings starting with a digit
+            candidates = (lengths <= MAX_DATE_LENGTH * width) & digits[starts]
+            encoding = "ascii" if width == 1 else "utf-16-le"
+            for offset, length in zip(starts[candidates].tolist(), lengths[candidates].tolist()):
+                text = data[offset:offset + length].tobytes().decode(encoding)
+                if _SEPARATORS.search(text) and DATE_PATTERN.match(text):
+                    dates.append(DateString(offset, text, parse_date(text)))
+    dates.sort(key=lambda date: date.offset)
+    return dates
+
+
+if __name__ == "__main__":
+
+    # Print the dates and times found in the given binaries
+    if len(sys.argv) < 2:
+        print("Usage: %s [BINARY] ... [BINARY]" % sys.argv[0])
+        exit(1)
+
+    for binary_file in sys.argv[1:]:
+        try:
+            print("%s" % binary_file)
+            with open(binary_file, "rb") as binary:
+                if os.fstat(binary.fileno()).st_size:
+                    with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped_binary:
+                        for found_date in find_dates(mapped_binary):
+                            print("  %08x %-22s %s" % (found_date.offset, found_date.text,
+                                                       found_date.value.isoformat()))
+            print("")
+        except OSError as e:
+            print("An OS error occurred - %s" % e)
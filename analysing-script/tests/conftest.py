@@ -0,0 +1,39 @@
+"""
+Fixtures shared by the tests of the analysing script.
+The modules of the analysing script are flat scripts, their directory is put on the path so they import each other.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from signature_database import load_database  # noqa: E402
+from signature_scanner import SignatureScanner  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    The signature database compiled from the signsrch.sig shipped with the analysing script.
+    """
+    with load_database() as signature_database:
+        yield signature_database
+
+
+@pytest.fixture(scope="session")
+def scanner(database):
+    """
+    The SignatureScanner over every signature of the database.
+    """
+    return SignatureScanner(database)
+
+
+@pytest.fixture(scope="session")
+def find_signature(database):
+    """
+    Function that finds a signature of the database by its title and tag, like find_signature("DES S-boxes", "..512").
+    """
+    signatures = dict(((signature.title, signature.tag), signature) for signature in database)
+    return lambda title, tag: signatures[(title, tag)]
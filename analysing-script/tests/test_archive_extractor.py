@@ -0,0 +1,159 @@
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import zipfile
+
+import pytest
+
+from archive_extractor import archive_members, ArchiveError, ExpansionBudget, extract_archive, extract_archives, \
+    member_path, write_member
+from binary_store import BinaryStore
+
+
+def _zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return path
+
+
+def _zip_bytes(members):
+    buffer = io.BytesIO()
+    _zip(buffer, members)
+    return buffer.getvalue()
+
+
+def _tar(path, members):
+    with tarfile.open(path, "w:gz") as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+def _read(archive_path, budget=None, seen=None, archiver="7z"):
+    return [(name, bytes(data)) for name, data in archive_members(archive_path, archiver=archiver, budget=budget,
+                                                                  seen=seen)]
+
+
+def test_only_the_binaries_are_read(tmp_path):
+    archive_path = _zip(str(tmp_path / "dump.zip"), [("a.bin", b"a"), ("readme.txt", b"r"), ("sub/B.BIN", b"b")])
+    assert _read(archive_path) == [("a.bin", b"a"), ("sub/B.BIN", b"b")]
+
+
+def test_zip_bomb_stops_at_the_size_budget(tmp_path):
+    # A few kilobytes which expand to 64 MB
+    archive_path = _zip(str(tmp_path / "bomb.zip"), [("bomb.bin", bytes(64 * 1024 * 1024))])
+    assert os.path.getsize(archive_path) < 1024 * 1024
+    budget = ExpansionBudget(max_size=1024 * 1024)
+    with pytest.raises(ArchiveError):
+        _read(archive_path, budget)
+    assert budget.size <= budget.max_size + 1
+
+
+def test_member_budget(tmp_path):
+    archive_path = _zip(str(tmp_path / "many.zip"), [("%d.txt" % index, b"") for index in range(20)])
+    with pytest.raises(ArchiveError):
+        _read(archive_path, ExpansionBudget(max_members=10))
+
+
+def test_tar_charges_the_members_left_out(tmp_path):
+    archive_path = _tar(str(tmp_path / "dump.tar.gz"), [("big.txt", bytes(5000)), ("fw.bin", b"fw")])
+    budget = ExpansionBudget()
+    assert _read(archive_path, budget) == [("fw.bin", b"fw")]
+    assert budget.size == 5002
+    with pytest.raises(ArchiveError):
+        _read(archive_path, ExpansionBudget(max_size=4000))
+
+
+def test_traversal_stays_in_the_archive_directory(tmp_path):
+    bins_path = str(tmp_path / "bins")
+    for name in ("../../evil.bin", "/etc/evil.bin", "..\\..\\evil.bin", "a/./../evil.bin"):
+        binary_path = write_member(bins_path, "dump.zip", name, b"evil")
+        assert os.path.commonpath([binary_path, os.path.join(bins_path, "dump")]) == os.path.join(bins_path, "dump")
+    assert member_path("bins", "downloads/dump.zip", "../../x/fw.bin") == os.path.join("bins", "dump", "x", "fw.bin")
+
+
+def test_nested_archives_are_expanded_once(tmp_path):
+    inner = _zip_bytes([("fw.bin", b"firmware")])
+    archive_path = _tar(str(tmp_path / "x.tar.gz"), [("inner.zip", inner), ("copy/inner.zip", inner)])
+    budget = ExpansionBudget()
+    assert _read(archive_path, budget) == [("inner.zip/fw.bin", b"firmware")]
+    assert budget.skipped == ["%s/copy/inner.zip is a copy of %s/inner.zip" % (archive_path, archive_path)]
+
+
+def test_nested_archives_deeper_than_the_budget_are_skipped(tmp_path):
+    innermost = _zip_bytes([("fw.bin", b"firmware")])
+    archive_path = _zip(str(tmp_path / "outer.zip"), [("middle.zip", _zip_bytes([("inner.zip", innermost)]))])
+    budget = ExpansionBudget(max_depth=1)
+    assert _read(archive_path, budget) == []
+    assert budget.skipped == ["%s/middle.zip/inner.zip is nested too deep" % archive_path]
+    assert _read(archive_path) == [("middle.zip/inner.zip/fw.bin", b"firmware")]
+
+
+def _patch_zip(data, method=None, flag_bits=None):
+    # The method and the flags are written in the local header and in the central directory of every member
+    data = bytearray(data)
+    for signature, offset in ((b"PK\x03\x04", 6), (b"PK\x01\x02", 8)):
+        start = data.find(signature)
+        while start >= 0:
+            if flag_bits is not None:
+                data[start + offset:start + offset + 2] = flag_bits.to_bytes(2, "little")
+            if method is not None:
+                data[start + offset + 2:start + offset + 4] = method.to_bytes(2, "little")
+            start = data.find(signature, start + 1)
+    return bytes(data)
+
+
+@pytest.mark.parametrize("method, flag_bits", [(9, None), (99, None), (None, 0x40)])
+def test_zip_methods_zipfile_does_not_read(tmp_path, method, flag_bits):
+    # Deflate64, WinZip AES and the strong encryption are left to the archiver or reported, never raised past it
+    archive_path = str(tmp_path / "dump.zip")
+    with open(archive_path, "wb") as archive:
+        archive.write(_patch_zip(_zip_bytes([("fw.bin", b"firmware")]), method, flag_bits))
+    for archiver in ("7z", "bsdtar"):
+        with pytest.raises(ArchiveError):
+            _read(archive_path, archiver=archiver)
+    error = extract_archive((archive_path, str(tmp_path / "bins"), ["password"], "7z", (4, 1024, 10), {}, None))[4]
+    assert error
+
+
+
+@pytest.mark.skipif(shutil.which("bsdtar") is None, reason="bsdtar is not installed")
+@pytest.mark.parametrize("passwords", [[], ["password"]])
+def test_bsdtar_reads_the_archives_without_a_password(tmp_path, passwords):
+    binary_path = tmp_path / "fw.bin"
+    binary_path.write_bytes(b"firmware")
+    archive_path = str(tmp_path / "dump.7z")
+    subprocess.run(["bsdtar", "-c", "--format", "7zip", "-f", archive_path, "-C", str(tmp_path), "fw.bin"],
+                   check=True)
+    assert [(name, bytes(data)) for name, data in archive_members(archive_path, passwords, "bsdtar")] == \
+        [("fw.bin", b"firmware")]
+
+
+def test_extract_archive_reports_the_error(tmp_path):
+    archive_path = str(tmp_path / "broken.zip")
+    with open(archive_path, "wb") as archive:
+        archive.write(b"not a zip")
+    path, extracted, skipped, copies, error = extract_archive((archive_path, str(tmp_path / "bins"), ["password"],
+                                                               "7z", (4, 1024, 10), {}, None))
+    assert (path, extracted, skipped, copies) == (archive_path, [], [], []) and error
+
+
+def test_the_copies_of_the_nested_archives_are_named_in_the_store(tmp_path):
+    source_path = tmp_path / "downloads"
+    source_path.mkdir()
+    inner = _zip_bytes([("fw.bin", b"firmware")])
+    # The middle archive holds a copy of the inner one, and is copied in turn
+    middle = _zip_bytes([("inner.zip", inner)])
+    _tar(str(source_path / "x.tar.gz"), [("inner.zip", inner), ("middle.zip", middle), ("again/middle.zip", middle)])
+    store_path = str(tmp_path / "store")
+    assert extract_archives(str(source_path), store_path=store_path, processes=1) == (0, 1, 0)
+    with BinaryStore(store_path) as store:
+        assert store.sources(hashlib.sha256(b"firmware").hexdigest()) == [
+            "%s/x.tar.gz/%s" % (source_path, name) for name in ("again/middle.zip/inner.zip/fw.bin", "inner.zip/fw.bin",
+                                                                "middle.zip/inner.zip/fw.bin")]
@@ -0,0 +1,49 @@
+import os
+
+from binwalk_report import create_report, find_report_directories, merge_reports
+
+
+def _report(name, results=()):
+    lines = ["", "Scan Time:     2020-01-02 03:04:05", "Target File:   %s" % name, "MD5 Checksum:  %s" % ("0" * 32),
+             "Signatures:    391", "DECIMAL       HEXADECIMAL     DESCRIPTION", "-" * 80]
+    return "\r\n".join(lines + list(results) + [""]) + "\r\n"
+
+
+def _tree(tmp_path):
+    """
+    Write the reports of a tree, with and without signatures, and return them in the order Get-ChildItem lists them.
+    """
+    # The subdirectories of a directory come before its own reports, the names are sorted ignoring the case
+    reports = [("b/A/x.bin.walkdat", ["16            0x10            gzip compressed data"]),
+               ("b/A/y.bin.walkdat", []),
+               ("b/z.bin.walkdat", ["0             0x0             CRC32 polynomial table, little endian"]),
+               ("a.bin.walkdat", ["32            0x20            LZMA compressed data"])]
+    for name, results in reversed(reports):
+        os.makedirs(str(tmp_path / os.path.dirname(name)), exist_ok=True)
+        (tmp_path / name).write_bytes(_report(str(tmp_path / name), results).encode())
+    (tmp_path / "b" / "A" / "x.bin").write_bytes(b"binary")
+    return [(str(tmp_path / name), results) for name, results in reports]
+
+
+def test_the_reports_are_walked_like_get_childitem(tmp_path):
+    reports = _tree(tmp_path)
+    assert find_report_directories(str(tmp_path)) == [[reports[0][0], reports[1][0]], [reports[2][0]], [reports[3][0]]]
+
+
+def test_merge_reports_keeps_the_reports_with_signatures(tmp_path):
+    reports = _tree(tmp_path)
+    count, with_signatures, merged, errors = merge_reports([reports[0][0], reports[1][0], str(tmp_path / "gone")])
+    assert (count, with_signatures, errors) == (3, 1, [str(tmp_path / "gone")])
+    # The line breaks are written again like Set-Content does
+    assert merged == _report(*reports[0]).replace("\r\n", "\n").encode()
+
+
+def test_create_report(tmp_path):
+    reports = _tree(tmp_path / "reports")
+    results_path = str(tmp_path / "results" / "binwalk_results.dat")
+    assert create_report(str(tmp_path / "reports"), results_path, 1) == (4, 3)
+    expected = "Number of binaries: 4\nNumber of binaries with signatures: 3\n" + "".join(
+        _report(name, results).replace("\r\n", "\n") for name, results in reports if results)
+    with open(results_path, "rb") as results:
+        assert results.read() == expected.encode()
+    assert os.listdir(str(tmp_path / "results")) == ["binwalk_results.dat"]
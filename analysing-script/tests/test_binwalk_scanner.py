@@ -0,0 +1,113 @@
+import datetime
+import os
+import re
+import types
+
+import pytest
+
+pytest.importorskip("binwalk.core.magic")
+
+import binwalk_scanner  # noqa: E402
+from binwalk_scanner import BinwalkResult, BinwalkScanner, module_scan, walkdat_report  # noqa: E402
+
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "results",
+                            "binwalk_results.dat")
+_RESULT_LINE = re.compile(r"^(\d+) +0x([0-9A-F]+) +(.*)$")
+
+
+def _result(offset, description="CRC32 polynomial table, little endian", **fields):
+    values = {"offset": offset, "description": description, "valid": True, "size": 0, "jump": 0, "many": False,
+              "id": description, "adjust": 0}
+    values.update(fields)
+    return types.SimpleNamespace(**values)
+
+
+class _Magic:
+    """
+    The binwalk magic engine, finding the given results in every buffer.
+    """
+
+    def __init__(self, results):
+        self.results = results
+        self.signatures = []
+
+    def reset(self):
+        pass
+
+    def scan(self, data, length):
+        return list(self.results)
+
+
+def _scan(results, size=1000):
+    scanner = BinwalkScanner([])
+    scanner._magic = _Magic(results)
+    scanner.reset()
+    return scanner.scan(bytes(size))
+
+
+def test_the_invalid_results_are_dropped():
+    assert _scan([_result(10, valid=False), _result(20, ""), _result(30, size=971), _result(40, jump=961),
+                  _result(50, size=950)]) == [BinwalkResult(50, "CRC32 polynomial table, little endian")]
+
+
+def test_the_results_jumped_over_are_skipped():
+    results = _scan([_result(300, "gzip compressed data"), _result(100, "LZMA compressed data", jump=250),
+                     _result(200, "gzip compressed data"), _result(360, "gzip compressed data", adjust=-10)])
+    assert [result.offset for result in results] == [100, 350]
+
+
+def test_the_signatures_repeated_many_times_are_shown_once():
+    results = _scan([_result(offset, "JFFS2 filesystem", many=True) for offset in (0, 100, 200)] +
+                    [_result(300), _result(400, "JFFS2 filesystem", many=True)])
+    assert [result.offset for result in results] == [0, 300, 400]
+
+    # The results of the engines without signature ids are all shown
+    results = _scan([types.SimpleNamespace(offset=offset, description="CRC32 polynomial table, little endian",
+                                           valid=True) for offset in (0, 100)])
+    assert [result.offset for result in results] == [0, 100]
+
+
+def test_the_regions_keep_the_size_of_the_file():
+    scanner = BinwalkScanner([])
+    scanner._magic = _Magic([_result(0, size=600)])
+    scanner.reset()
+    assert [result.offset for result in scanner.scan_regions(bytes(1000), [(0, 100), (500, 600)])] == [0]
+
+
+def test_the_reports_match_the_binwalk_results():
+    with open(RESULTS_PATH, encoding="latin-1") as results_file:
+        blocks = re.split(r"\n+(?=Scan Time:)", results_file.read())
+    assert len(blocks) > 1000
+    for block in blocks[1:]:
+        lines = block.rstrip("\n").split("\n")
+        results = [BinwalkResult(int(match.group(1)), match.group(3))
+                   for match in map(_RESULT_LINE.match, lines[6:])]
+        assert all(int(match.group(2), 16) == int(match.group(1)) for match in map(_RESULT_LINE.match, lines[6:]))
+        report = walkdat_report(lines[1][len("Target File:   "):], lines[2][len("MD5 Checksum:  "):],
+                                int(lines[3][len("Signatures:    "):]), results,
+                                datetime.datetime.strptime(lines[0][len("Scan Time:     "):], "%Y-%m-%d %H:%M:%S"))
+        assert report[1:-1] == lines
+
+
+def test_module_scan_keeps_the_results_binwalk_shows(monkeypatch, tmp_path):
+    first, second = str(tmp_path / "first.bin"), str(tmp_path / "second.bin")
+
+    def scan(*binary_paths, **options):
+        assert binary_paths == (first, second) and options["signature"]
+        results = [_result(40, file=types.SimpleNamespace(path=second), display=True),
+                   _result(30, file=types.SimpleNamespace(path=first), display=True),
+                   _result(10, file=types.SimpleNamespace(path=first), display=True),
+                   _result(20, file=types.SimpleNamespace(path=first), display=False),
+                   _result(50, file=types.SimpleNamespace(path=first), display=True, valid=False)]
+        return [types.SimpleNamespace(name="General", results=[]),
+                types.SimpleNamespace(name="Signature", magic=types.SimpleNamespace(signatures=[1] * 7),
+                                      results=results)]
+
+    monkeypatch.setattr(binwalk_scanner.binwalk, "scan", scan, raising=False)
+    signature_count, results = module_scan([first, second])
+    description = "CRC32 polynomial table, little endian"
+    assert signature_count == 7
+    assert results == {first: [BinwalkResult(10, description), BinwalkResult(30, description)],
+                       second: [BinwalkResult(40, description)]}
+    assert module_scan([]) == (None, {})
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import types
+
+import pytest
+
+pytest.importorskip("binwalk.core.magic")
+
+import binwalk_service  # noqa: E402
+from binwalk_scanner import BinwalkResult  # noqa: E402
+from manifest import Manifest  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+from result_store import ResultStore  # noqa: E402
+
+
+CRC32_RESULT = BinwalkResult(16, "CRC32 polynomial table, little endian")
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    cache_path = tmp_path / "cache"
+    cache_path.mkdir()
+    state = {"cache": ResultCache(str(cache_path / "results.sqlite")),
+             "manifest": Manifest(str(cache_path / "manifest.sqlite")),
+             "store": ResultStore(str(cache_path / "store.sqlite")),
+             "version": "module.1.test", "signature_count": None}
+    monkeypatch.setattr(binwalk_service, "_worker", state)
+    # Loading the magic files only counts the signatures of a worker that did not run binwalk
+    monkeypatch.setattr(binwalk_service, "BinwalkScanner", lambda: types.SimpleNamespace(signature_count=7))
+    yield state
+    for name in ("cache", "manifest", "store"):
+        state[name].close()
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """
+    The binwalk.scan calls of the worker, every binary holds a CRC32 table.
+    """
+    calls = []
+
+    def module_scan(binary_paths):
+        calls.append(list(binary_paths))
+        results = {os.path.abspath(binary_path): [CRC32_RESULT] for binary_path in binary_paths}
+        return 42 if binary_paths else None, results
+
+    monkeypatch.setattr(binwalk_service, "module_scan", module_scan)
+    return calls
+
+
+def _write(tmp_path, name, data):
+    binary_path = str(tmp_path / name)
+    with open(binary_path, "wb") as binary:
+        binary.write(data)
+    return binary_path
+
+
+def test_a_content_is_scanned_once_per_batch(tmp_path, worker, scans):
+    first = _write(tmp_path, "first.bin", b"\x01" * 64)
+    copy = _write(tmp_path, "copy.bin", b"\x01" * 64)
+    other = _write(tmp_path, "other.bin", b"\x02" * 32)
+    empty = _write(tmp_path, "empty.bin", b"")
+    missing = str(tmp_path / "missing.bin")
+    jobs = binwalk_service._scan_batch([first, copy, missing, empty, other])
+    assert [job.path for job in jobs] == [first, copy, missing, empty, other]
+    assert [(job.results, job.error is None) for job in jobs] == [(1, True), (1, True), (0, False), (0, True),
+                                                                 (1, True)]
+    assert scans == [[first, other]]
+    assert worker["signature_count"] == 42
+    with open(copy + ".walkdat", encoding="latin-1") as log:
+        report = log.read()
+    assert hashlib.md5(b"\x01" * 64).hexdigest() in report and CRC32_RESULT.description in report
+    assert os.path.exists(empty + ".walkdat") and not os.path.exists(missing + ".walkdat")
+    sha256 = hashlib.sha256(b"\x01" * 64).hexdigest()
+    assert worker["cache"].get(sha256, "binwalk", "module.1.test") == [list(CRC32_RESULT)]
+    assert sorted(worker["cache"].aliases(sha256)) == sorted(os.path.abspath(path) for path in (first, copy))
+    assert [scan["path"] for scan in worker["store"].latest_scans("binwalk")] == \
+        sorted(os.path.abspath(path) for path in (copy, empty, first, other))
+    assert worker["store"].find_signature("binwalk", "CRC32 polynomial table")[0] == (os.path.abspath(copy), 16)
+    assert sorted(worker["manifest"].entries(str(tmp_path), "binwalk")) == \
+        sorted(os.path.abspath(path) for path in (copy, empty, first, other))
+
+
+def test_the_cached_contents_are_not_scanned_again(tmp_path, worker, scans):
+    first = _write(tmp_path, "first.bin", b"\x01" * 64)
+    binwalk_service._scan_batch([first])
+    worker["signature_count"] = None
+    renamed = _write(tmp_path, "renamed.bin", b"\x01" * 64)
+    jobs = binwalk_service._scan_batch([renamed])
+    assert [(job.results, job.error) for job in jobs] == [(1, None)]
+    assert [paths for paths in scans if paths] == [[first]]
+    with open(renamed + ".walkdat", encoding="latin-1") as log:
+        assert "Signatures:    7" in log.read().splitlines()
+
+
+def test_a_failed_scan_fails_its_binaries_only(tmp_path, worker, monkeypatch):
+    cached = _write(tmp_path, "cached.bin", b"\x01" * 64)
+    worker["cache"].put(hashlib.sha256(b"\x01" * 64).hexdigest(), "binwalk", "module.1.test", [list(CRC32_RESULT)])
+    broken = _write(tmp_path, "broken.bin", b"\x02" * 64)
+
+    def module_scan(binary_paths):
+        raise OSError("binwalk failed")
+
+    monkeypatch.setattr(binwalk_service, "module_scan", module_scan)
+    jobs = binwalk_service._scan_batch([broken, cached])
+    assert [(job.path, job.results, job.error) for job in jobs] == [(broken, 0, "binwalk failed"), (cached, 1, None)]
+    assert [scan["path"] for scan in worker["store"].latest_scans("binwalk")] == [os.path.abspath(cached)]
+
+
+def test_the_paths_are_grouped_in_batches():
+    assert list(binwalk_service._batches(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(binwalk_service._batches([], 3)) == []
@@ -0,0 +1,107 @@
+import math
+
+import numpy
+import pytest
+
+from cooccurrence import CooccurrenceMatrix, write_report
+
+
+def _records(rows):
+    records = []
+    for path, signatures in sorted(rows.items()):
+        records.extend((path, signature, "%s table" % signature) for signature in signatures)
+        if not signatures:
+            records.append((path, None, None))
+    return records
+
+
+def _corpus():
+    """
+    20 binaries, the AES tables are found together in 6 of them and CRC32 in every other one.
+    """
+    rows = {}
+    for binary in range(20):
+        signatures = []
+        if binary < 6:
+            signatures += ["AES S-box", "AES rcon"]
+        if binary % 2:
+            signatures.append("CRC32")
+        if binary == 19:
+            signatures.append("SHA1")
+        rows["%02d.bin" % binary] = signatures
+    return rows
+
+
+def _dense_counts(cooccurrence):
+    matrix = cooccurrence.matrix.toarray()
+    return matrix.T.dot(matrix)
+
+
+def _named_counts(cooccurrence):
+    counts = cooccurrence.counts.toarray()
+    names = cooccurrence.signatures.strings
+    return {(names[a], names[b]): int(counts[a, b]) for a in range(len(names)) for b in range(len(names))
+            if counts[a, b]}
+
+
+@pytest.fixture
+def cooccurrence(tmp_path):
+    matrix = CooccurrenceMatrix(str(tmp_path / "signsrch"))
+    assert matrix.update(_records(_corpus())) == (20, 0)
+    return matrix
+
+
+def test_the_counts_are_the_product_of_the_matrix(cooccurrence):
+    assert numpy.array_equal(cooccurrence.counts.toarray(), _dense_counts(cooccurrence))
+    counts = _named_counts(cooccurrence)
+    assert (counts[("AES S-box", "AES rcon")], counts[("AES S-box", "CRC32")], counts[("CRC32", "CRC32")]) == (6, 3, 10)
+
+
+def test_only_the_changed_binaries_update_the_counts(cooccurrence, tmp_path):
+    rows = _corpus()
+    del rows["00.bin"]
+    rows["01.bin"] = ["SHA1"]
+    rows["20.bin"] = ["AES S-box", "AES rcon", "MD5"]
+    assert cooccurrence.update(_records(rows)) == (2, 1)
+    rebuilt = CooccurrenceMatrix(str(tmp_path / "rebuilt"))
+    rebuilt.update(_records(rows))
+    assert _named_counts(cooccurrence) == _named_counts(rebuilt)
+    assert numpy.array_equal(cooccurrence.counts.toarray(), _dense_counts(cooccurrence))
+    assert cooccurrence.update(_records(rows)) == (0, 0)
+
+
+def test_the_matrix_is_saved_and_opened_again(cooccurrence):
+    cooccurrence.save()
+    opened = CooccurrenceMatrix(cooccurrence.directory)
+    assert opened.binaries == cooccurrence.binaries
+    assert opened.signatures.strings == cooccurrence.signatures.strings
+    assert opened.descriptions == cooccurrence.descriptions
+    assert _named_counts(opened) == _named_counts(cooccurrence)
+    assert CooccurrenceMatrix(cooccurrence.directory + "-missing").binaries == []
+
+
+def test_pairs(cooccurrence):
+    first, second, counts, pmi, npmi = cooccurrence.pairs(min_count=3)
+    names = cooccurrence.signatures.strings
+    pairs = {(names[a], names[b]): (count, value, normalised)
+             for a, b, count, value, normalised in zip(first, second, counts, pmi, npmi)}
+    assert sorted(pairs) == [("AES S-box", "AES rcon"), ("AES S-box", "CRC32"), ("AES rcon", "CRC32")]
+    assert pairs[("AES S-box", "AES rcon")] == pytest.approx((6, math.log2(6 * 20 / 36.0), 1.0))
+    assert pairs[("AES S-box", "CRC32")] == pytest.approx((3, 0.0, 0.0))
+    # The pairs are sorted by decreasing PMI, and a larger corpus raises it
+    assert pmi[0] == max(pmi)
+    assert cooccurrence.pairs(3, binary_count=40)[3][0] == pytest.approx(math.log2(6 * 40 / 36.0))
+
+
+def test_groups_and_report(cooccurrence, tmp_path):
+    groups = cooccurrence.groups(min_count=3)
+    assert [([cooccurrence.signatures[member] for member in members], together)
+            for members, _, together in groups] == [(["AES S-box", "AES rcon"], 6)]
+    report_path = str(tmp_path / "results" / "signsrch_cooccurrence.dat")
+    assert write_report(cooccurrence, report_path, min_count=3) == 1
+    with open(report_path, encoding="utf-8") as report:
+        lines = report.read().splitlines()
+    assert lines[:3] == ["Number of binaries: 20", "Number of signatures: 4",
+                         "Number of pairs found in at least 3 binaries: 3"]
+    assert lines[4:7] == ["Group 1: 2 signatures, mean PMI %.2f, all found in 6 binaries" % math.log2(120 / 36.0),
+                          "  AES S-box", "  AES rcon"]
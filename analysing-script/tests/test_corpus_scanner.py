@@ -0,0 +1,90 @@
+import hashlib
+import os
+import random
+
+import pytest
+
+import corpus_scanner
+from manifest import Manifest
+from prefilter import PrefilterScanner
+from result_cache import ResultCache
+from result_store import ResultStore
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    cache_path = tmp_path / "cache"
+    cache_path.mkdir()
+    state = {"cache": ResultCache(str(cache_path / "results.sqlite")),
+             "manifest": Manifest(str(cache_path / "manifest.sqlite")),
+             "store": ResultStore(str(cache_path / "store.sqlite"))}
+    monkeypatch.setattr(corpus_scanner, "_worker", state)
+    yield state
+    for name in ("cache", "manifest", "store"):
+        state[name].close()
+
+
+@pytest.fixture
+def entropy_worker(worker):
+    worker.update(analysers=("entropy",), versions={"entropy": corpus_scanner.entropy_version()})
+    return worker
+
+
+@pytest.fixture
+def signsrch_worker(worker, database):
+    scanner = PrefilterScanner(database)
+    worker.update(analysers=("signsrch", "entropy"), database=database, scanner=scanner,
+                  versions={"signsrch": scanner.version, "entropy": corpus_scanner.entropy_version()})
+    return worker
+
+
+def test_scan_binary_profiles_the_selected_analyser(tmp_path, entropy_worker):
+    randomness = random.Random(1)
+    data = bytes(4096) + bytes(randomness.getrandbits(8) for _ in range(16384)) + bytes(4096)
+    binary_path = str(tmp_path / "fw.bin")
+    with open(binary_path, "wb") as binary:
+        binary.write(data)
+    size, path, found, _, error = corpus_scanner.scan_binary((len(data), binary_path))
+    assert (size, path, found, error) == (len(data), binary_path, 1, None)
+    with open(binary_path + ".entdat") as report:
+        lines = report.read().splitlines()
+    assert lines[0].endswith(" " + binary_path) and lines[1].startswith("  00001000 - 00005000")
+    entries = entropy_worker["manifest"].entries(str(tmp_path), "entropy")
+    assert entries[os.path.abspath(binary_path)][2] == hashlib.sha256(data).hexdigest()
+
+
+def test_scan_binary_reads_the_empty_binaries(tmp_path, entropy_worker):
+    binary_path = str(tmp_path / "empty.bin")
+    open(binary_path, "wb").close()
+    _, _, found, _, error = corpus_scanner.scan_binary((0, binary_path))
+    assert (found, error) == (0, None)
+    with open(binary_path + ".entdat") as report:
+        assert report.read() == "0.0000 %s\n" % binary_path
+
+
+def test_the_signsrch_scan_stores_the_entropy_alongside(tmp_path, signsrch_worker):
+    randomness = random.Random(1)
+    data = bytes(1024) + bytes(randomness.getrandbits(8) for _ in range(8192)) + bytes(4096)
+    binary_path = str(tmp_path / "fw.bin")
+    with open(binary_path, "wb") as binary:
+        binary.write(data)
+    _, _, found, _, error = corpus_scanner.scan_binary((len(data), binary_path))
+    assert error is None
+    assert os.path.exists(binary_path + ".signdat") and os.path.exists(binary_path + ".entdat")
+    store = signsrch_worker["store"]
+    signsrch_scan, = store.latest_scans("signsrch")
+    entropy_scan, = store.latest_scans("entropy")
+    assert signsrch_scan["sha256"] == entropy_scan["sha256"] == hashlib.sha256(data).hexdigest()
+    assert len(store.hits(signsrch_scan["scan_id"])) == found
+    assert [hit[:2] for hit in store.hits(entropy_scan["scan_id"])] == [(1024, "encrypted")]
+    for analyser in ("signsrch", "entropy"):
+        assert os.path.abspath(binary_path) in signsrch_worker["manifest"].entries(str(tmp_path), analyser)
+
+
+def test_scan_mapped_gives_the_hits_of_scan_file(scanner, tmp_path):
+    binary_path = str(tmp_path / "fw.bin")
+    with open(binary_path, "wb") as binary:
+        binary.write(bytes(1000) + bytes(range(256)) * 4)
+    with open(binary_path, "rb") as binary:
+        data = binary.read()
+    assert scanner.scan_mapped(binary_path, data) == scanner.scan_file(binary_path)
@@ -0,0 +1,68 @@
+import pytest
+
+import crc_tables
+from crc_tables import CRC_VARIANTS, crc_tables as generate, generate_crc_tables, load_crc_tables
+
+
+def _reflect(value, bits):
+    return int("{:0{}b}".format(value, bits)[::-1], 2)
+
+
+def _reference_table(poly, bits, reverse, msb_first):
+    """
+    The table the signsrch CRC type builds, one entry at a time.
+    """
+    mask = (1 << bits) - 1
+    table = []
+    for index in range(256):
+        value = index
+        if msb_first:
+            value = (value << (bits - 8)) & mask if bits >= 8 else value
+            for _ in range(8):
+                value = ((value << 1) & mask) ^ (poly if value & (1 << (bits - 1)) else 0)
+        else:
+            for _ in range(8):
+                value = (value >> 1) ^ (poly if value & 1 else 0)
+        table.append(value & mask)
+    if reverse:
+        table = [_reflect(table[_reflect(index, 8)], bits) for index in range(256)]
+    return table
+
+
+def test_the_crc32_table():
+    table = generate([0xedb88320], 32, False, False)[0]
+    assert [int(entry) for entry in table[:4]] == [0x00000000, 0x77073096, 0xee0e612c, 0x990951ba]
+
+
+@pytest.mark.parametrize("polys, bits", [([0xedb88320, 0x04c11db7, 0x82f63b78], 32), ([0x1021, 0xa001], 16),
+                                         ([0x07, 0x31], 8), ([0x42f0e1eba9ea3693], 64), ([0x15], 5)])
+@pytest.mark.parametrize("reverse, msb_first", CRC_VARIANTS)
+def test_the_tables_of_every_variant(polys, bits, reverse, msb_first):
+    tables = generate(polys, bits, reverse, msb_first)
+    assert tables.shape == (len(polys), 256)
+    for poly, table in zip(polys, tables):
+        assert [int(entry) for entry in table] == _reference_table(poly, bits, reverse, msb_first)
+
+
+def test_generate_crc_tables_keeps_every_polynomial_once():
+    tables = generate_crc_tables([(0xedb88320, 32), (0x1edb88320, 32), (0x1021, 16)])
+    assert sorted(tables) == sorted((poly, bits, reverse, msb_first) for poly, bits in ((0xedb88320, 32), (0x1021, 16))
+                                    for reverse, msb_first in CRC_VARIANTS)
+
+
+def test_the_tables_are_cached_for_a_signature_file(tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "crc_tables.npz")
+    polys = [(0xedb88320, 32), (0x1021, 16)]
+    tables = load_crc_tables(polys, cache_path, b"digest")
+
+    def generate_again(crc_polys):
+        raise AssertionError("The tables were generated again")
+
+    monkeypatch.setattr(crc_tables, "generate_crc_tables", generate_again)
+    cached = load_crc_tables(polys, cache_path, b"digest")
+    assert sorted(cached) == sorted(tables)
+    assert all((cached[key] == tables[key]).all() for key in tables)
+    # Another signature file or a polynomial missing from the cache generates the tables again
+    for crc_polys, digest in ((polys, b"other digest"), (polys + [(0x07, 8)], b"digest")):
+        with pytest.raises(AssertionError):
+            load_crc_tables(crc_polys, cache_path, digest)
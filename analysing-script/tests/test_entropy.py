@@ -0,0 +1,81 @@
+import math
+import random
+
+import numpy
+import pytest
+
+from entropy import EntropyRegion, block_counts, block_entropy, find_regions, profile_report, region_records, \
+    shannon_entropy
+
+
+def _random_bytes(size, seed=1):
+    return random.Random(seed).getrandbits(8 * size).to_bytes(size, "little")
+
+
+def _reference_entropy(data):
+    counts = [data.count(bytes([value])) for value in range(256)]
+    return -sum(count / len(data) * math.log2(count / len(data)) for count in counts if count)
+
+
+@pytest.mark.parametrize("data", [b"", bytes(100), bytes(range(256)), b"ab" * 50 + b"c", _random_bytes(5000)])
+def test_shannon_entropy(data):
+    assert shannon_entropy(data) == pytest.approx(_reference_entropy(data) if data else 0.0)
+
+
+@pytest.mark.parametrize("block_size, step", [(1024, None), (256, 100), (7, 3), (5000, None)])
+def test_block_counts_counts_every_block(block_size, step):
+    data = _random_bytes(3000) + bytes(1000)
+    offsets, counts = block_counts(data, block_size, step)
+    expected_offsets = list(range(0, len(data) - block_size + 1, step or block_size))
+    assert offsets.tolist() == expected_offsets
+    assert counts.shape == (len(expected_offsets), 256)
+    for offset, block in zip(expected_offsets, counts):
+        assert numpy.array_equal(block, numpy.bincount(numpy.frombuffer(data[offset:offset + block_size],
+                                                                        dtype=numpy.uint8), minlength=256))
+
+
+def test_block_counts_rejects_the_empty_blocks():
+    with pytest.raises(ValueError):
+        block_counts(bytes(10), 0)
+
+
+def test_block_entropy_matches_the_entropy_of_every_block():
+    data = bytes(1024) + bytes(range(256)) * 4 + _random_bytes(1024)
+    offsets, entropies = block_entropy(data)
+    assert offsets.tolist() == [0, 1024, 2048]
+    assert entropies.tolist() == pytest.approx([0.0, 8.0, _reference_entropy(data[2048:])])
+
+
+def test_find_regions_merges_the_high_entropy_blocks():
+    data = bytes(4096) + _random_bytes(8192) + bytes(4096) + _random_bytes(2048, 2)
+    regions = find_regions(data)
+    assert [(region.start, region.end, region.kind) for region in regions] == \
+        [(4096, 12288, "encrypted"), (16384, 18432, "encrypted")]
+    assert all(7.5 <= region.entropy <= 8 for region in regions)
+
+
+def test_find_regions_tells_compressed_data_from_encrypted_data():
+    # Every block is above the threshold, but the bytes of the region are far from uniform
+    skewed = bytes(range(256)) * 3 + bytes(range(128)) * 2
+    assert [region.kind for region in find_regions(skewed * 8)] == ["compressed"]
+
+
+def test_find_regions_with_overlapping_blocks():
+    data = bytes(4096) + _random_bytes(8192) + bytes(4096)
+    regions = find_regions(data, step=256)
+    assert len(regions) == 1 and regions[0].kind == "encrypted"
+    assert 3072 <= regions[0].start <= 4096 and 12288 <= regions[0].end <= 13312
+
+
+def test_profile_report():
+    data = bytes(4096) + _random_bytes(8192) + bytes(100)
+    regions, lines = profile_report("fw.bin", data)
+    assert regions == find_regions(data)
+    assert lines[0] == "%.4f fw.bin" % shannon_entropy(data)
+    assert lines[1].startswith("  00001000 - 00003000  ") and lines[1].endswith(" encrypted")
+    assert profile_report("empty.bin", b"") == ([], ["0.0000 empty.bin"])
+
+
+def test_region_records():
+    assert region_records([EntropyRegion(4096, 12288, 7.97, "encrypted")]) == \
+        [(4096, "encrypted", "Encrypted data, 8192 bytes, entropy 7.9700")]
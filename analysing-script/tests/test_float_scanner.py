@@ -0,0 +1,50 @@
+import random
+
+import numpy
+import pytest
+
+from float_scanner import FloatScanner, _ulp_distance
+from signature_scanner import Hit
+
+
+@pytest.fixture(scope="module")
+def float_scanner(database):
+    return FloatScanner(database)
+
+
+def _shifted(signature, ulps):
+    """
+    The data of a FLOAT signature with every raw value moved by a number of ULPs.
+    """
+    dtype = numpy.dtype("u%d" % signature.width).newbyteorder("<" if signature.endian.name == "LITTLE" else ">")
+    values = numpy.frombuffer(bytes(signature.data), dtype=dtype)
+    return (values + numpy.array(ulps, dtype=dtype)).astype(dtype).tobytes()
+
+
+def _noise(size, seed=1):
+    return random.Random(seed).getrandbits(8 * size).to_bytes(size, "little")
+
+
+@pytest.mark.parametrize("tag", ["float.le.1024", "float.be.1024", "double.le.2048", "double.be.2048"])
+def test_the_tables_are_found_within_the_tolerance(float_scanner, find_signature, tag):
+    signature = find_signature("Standard huffman HuffFreq table (0.14473691)", tag)
+    hit = Hit(signature.signature_id, 1001, signature.endian)
+    for ulps in (0, 1, 4):
+        assert hit in float_scanner.scan(_noise(1001) + _shifted(signature, ulps) + _noise(999, 2))
+    assert hit not in float_scanner.scan(_noise(1001) + _shifted(signature, 5) + _noise(999, 2))
+
+
+def test_a_table_cut_short_is_not_found(float_scanner, find_signature):
+    signature = find_signature("Standard huffman HuffFreq table (0.14473691)", "float.le.1024")
+    assert all(hit.signature_id != signature.signature_id for hit in float_scanner.scan(bytes(signature.data)[:-1]))
+
+
+def test_nothing_is_found_in_noise(float_scanner):
+    assert float_scanner.scan(_noise(100000)) == []
+    assert float_scanner.scan(b"") == [] and float_scanner.scan(b"\x00") == []
+
+
+def test_the_ulp_distance_goes_across_zero():
+    values = numpy.array([0x3f800001, 0x00000001, 0x80000001, 0xbf800000], dtype=numpy.uint64)
+    expected = numpy.array([0x3f800000, 0x80000001, 0x00000000, 0x3f800000], dtype=numpy.uint64)
+    assert _ulp_distance(values, expected, 4).tolist() == [1, 2, 1, 2 * 0x3f800000]
@@ -0,0 +1,64 @@
+import pytest
+
+from hex_decoder import decode_image, GAP_FILL, HexRecordError, INTEL_HEX, sniff_format, SREC
+
+
+def _ihex(record_type, address, data):
+    fields = bytes([len(data)]) + address.to_bytes(2, "big") + bytes([record_type]) + data
+    return b":" + (fields + bytes([-sum(fields) & 0xff])).hex().upper().encode()
+
+
+def _srec(record_type, address, data, address_length=4):
+    fields = bytes([address_length + len(data) + 1]) + address.to_bytes(address_length, "big") + data
+    return b"S" + record_type + (fields + bytes([~sum(fields) & 0xff])).hex().upper().encode()
+
+
+@pytest.fixture
+def intel_hex():
+    records = [_ihex(0x04, 0, b"\x08\x00"), _ihex(0x00, 0x0000, b"\x01\x02\x03\x04"),
+               _ihex(0x00, 0x0008, b"\x05\x06"), _ihex(0x04, 0, b"\x08\x10"), _ihex(0x00, 0x0000, b"\x07\x08"),
+               _ihex(0x01, 0, b"")]
+    return b"\r\n".join(records) + b"\r\n"
+
+
+def test_intel_hex_segments_and_gaps(intel_hex):
+    assert sniff_format(intel_hex) == INTEL_HEX
+    image = decode_image(intel_hex)
+    assert image.format == INTEL_HEX
+    # The first records are 4 bytes apart and share a segment, the last one is 1 MB further
+    assert [tuple(segment) for segment in image.segments] == [(0, 0x08000000, 10), (10, 0x08100000, 2)]
+    assert image.buffer == b"\x01\x02\x03\x04" + bytes([GAP_FILL]) * 4 + b"\x05\x06\x07\x08"
+
+
+def test_intel_hex_addresses_and_file_offsets(intel_hex):
+    image = decode_image(intel_hex)
+    assert [image.address(offset) for offset in (0, 3, 9, 10, 11)] == \
+        [0x08000000, 0x08000003, 0x08000009, 0x08100000, 0x08100001]
+    # Every byte points at its two hexadecimal digits in the text
+    for offset in (0, 3, 8, 9, 10, 11):
+        file_offset = image.file_offset(offset)
+        assert intel_hex[file_offset:file_offset + 2] == b"%02X" % image.buffer[offset]
+    # The gap between the records has no text
+    assert image.file_offset(5) is None
+
+
+def test_srec_decoding():
+    srec = b"\n".join([_srec(b"0", 0, b"header", 2), _srec(b"3", 0x20000000, b"\xde\xad"),
+                       _srec(b"3", 0x20000002, b"\xbe\xef"), _srec(b"7", 0x20000000, b"")])
+    assert sniff_format(srec) == SREC
+    image = decode_image(srec)
+    assert image.buffer == b"\xde\xad\xbe\xef"
+    assert image.address(2) == 0x20000002
+    file_offset = image.file_offset(2)
+    assert srec[file_offset:file_offset + 4] == b"BEEF"
+
+
+def test_invalid_records(intel_hex):
+    broken = intel_hex.replace(b":0400000001020304F2", b":0400000001020304F3")
+    assert broken != intel_hex
+    assert sniff_format(broken) is None
+    with pytest.raises(HexRecordError):
+        decode_image(broken)
+    assert sniff_format(b"\x7fELF\x02\x01\x01") is None
+    with pytest.raises(HexRecordError):
+        decode_image(_srec(b"1", 0, b"\x00", 2) + b"\n" + intel_hex)
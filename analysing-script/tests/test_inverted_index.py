@@ -0,0 +1,81 @@
+import json
+import os
+
+import numpy
+import pytest
+
+from inverted_index import InvertedIndex, build_index, parse_query
+
+
+@pytest.mark.parametrize("query, tree", [
+    ("AES S-box", ("term", "AES S-box")),
+    ("AES S-box and not (CRC32 or CRC16)",
+     ("and", ("term", "AES S-box"), ("not", ("or", ("term", "CRC32"), ("term", "CRC16"))))),
+    ('"AES S-box" or CRC32', ("or", ("term", "AES S-box"), ("term", "CRC32"))),
+    ('"and" or "not"', ("or", ("term", "and"), ("term", "not"))),
+    ("a or b and c", ("or", ("term", "a"), ("and", ("term", "b"), ("term", "c")))),
+])
+def test_parse_query(query, tree):
+    assert parse_query(query) == tree
+
+
+@pytest.mark.parametrize("query", ['"AES S-box" CRC32', 'CRC32 "AES"', "(CRC32", "CRC32 and", "not"])
+def test_parse_query_rejects_the_broken_queries(query):
+    # A bare word after a quoted term is not glued onto it
+    with pytest.raises(ValueError):
+        parse_query(query)
+
+
+_RECORDS = [("a.bin", "CRC32", "CRC32 table"), ("a.bin", "AES", "AES S-box"), ("b.bin", "AES", "AES S-box"),
+            ("c.bin", "CRC16", "CRC16 table"), ("d.bin", None, None)]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    assert build_index(_RECORDS, str(tmp_path)) == (4, 3)
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("query, paths", [
+    ("AES", ["a.bin", "b.bin"]),
+    ("S-box and not CRC32", ["b.bin"]),
+    ("not (AES or table)", ["d.bin"]),
+    ("crc32 or CRC16", ["a.bin", "c.bin"]),
+    ("SHA1", []),
+])
+def test_query(index_path, query, paths):
+    assert InvertedIndex(index_path).query(query) == paths
+
+
+def test_signatures_of(index_path):
+    index = InvertedIndex(index_path)
+    assert index.signatures_of("a.bin") == [("CRC32", "CRC32 table"), ("AES", "AES S-box")]
+    assert index.signatures_of("d.bin") == []
+    assert index.signatures_of("missing.bin") == []
+
+
+def test_an_index_whose_arrays_were_replaced_without_its_names_is_not_opened(index_path, tmp_path):
+    # The arrays of a larger index are written, but not its names
+    build_index(_RECORDS + [("e.bin", "SHA1", "SHA1 constants")], str(tmp_path / "larger"))
+    for name in os.listdir(str(tmp_path / "larger")):
+        if name.endswith(".npy"):
+            os.replace(os.path.join(str(tmp_path / "larger"), name), os.path.join(index_path, name))
+    with pytest.raises(ValueError):
+        InvertedIndex(index_path)
+
+
+def test_an_index_of_an_older_version_is_not_opened(index_path):
+    names_path = os.path.join(index_path, "names.json")
+    with open(names_path, encoding="utf-8") as names_file:
+        names = json.load(names_file)
+    names["version"] = 1
+    with open(names_path, "w", encoding="utf-8") as names_file:
+        json.dump(names, names_file)
+    with pytest.raises(ValueError):
+        InvertedIndex(index_path)
+
+
+def test_an_empty_index(tmp_path):
+    build_index([], str(tmp_path))
+    index = InvertedIndex(str(tmp_path))
+    assert index.query("AES") == [] and numpy.array_equal(index.evaluate(("not", ("term", "AES"))), [])
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import pathlib
+
+import pytest
+
+from corpus_scanner import find_binaries
+from manifest import Manifest
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+    A directory of three scanned binaries, each with its report, and their manifest.
+    """
+    binaries_path = tmp_path / "binaries"
+    binaries_path.mkdir()
+    manifest = Manifest(str(tmp_path / "manifest.sqlite"))
+    for name in ("a.bin", "b.bin", "c.bin"):
+        _write(binaries_path / name, name.encode() * 100)
+        _scanned(manifest, str(binaries_path / name))
+    yield str(binaries_path), manifest
+    manifest.close()
+
+
+def _write(binary_path, data):
+    binary_path.write_bytes(data)
+    (binary_path.parent / (binary_path.name + ".signdat")).write_text("report")
+
+
+def _scanned(manifest, binary_path, version="1"):
+    with open(binary_path, "rb") as binary:
+        sha256 = hashlib.sha256(binary.read()).hexdigest()
+    manifest.update(binary_path, "signsrch", version, sha256, os.stat(binary_path))
+
+
+def _plan(binaries_path, manifest, version="1"):
+    changed, removed = manifest.plan(binaries_path, find_binaries(binaries_path), "signsrch", version, ".signdat")
+    return sorted(os.path.basename(binary_path) for _, binary_path in changed), \
+        [os.path.basename(binary_path) for binary_path in removed]
+
+
+def test_nothing_is_scanned_again_when_nothing_changed(corpus):
+    assert _plan(*corpus) == ([], [])
+
+
+def test_the_new_and_changed_binaries_are_scanned(corpus):
+    binaries_path, manifest = corpus
+    _write(pathlib.Path(binaries_path, "d.bin"), b"d")
+    _write(pathlib.Path(binaries_path, "a.bin"), b"changed")
+    assert _plan(binaries_path, manifest) == (["a.bin", "d.bin"], [])
+
+
+def test_a_binary_only_touched_keeps_its_report(corpus):
+    binaries_path, manifest = corpus
+    binary_path = os.path.join(binaries_path, "b.bin")
+    os.utime(binary_path, ns=(0, 10 ** 18))
+    assert _plan(binaries_path, manifest) == ([], [])
+    # Its new time is recorded, so it is not digested again
+    assert manifest.entries(binaries_path, "signsrch")[binary_path][1] == 10 ** 18
+
+
+def test_the_binaries_missing_their_report_or_scanned_by_another_version_are_scanned(corpus):
+    binaries_path, manifest = corpus
+    os.remove(os.path.join(binaries_path, "c.bin.signdat"))
+    assert _plan(binaries_path, manifest) == (["c.bin"], [])
+    assert _plan(binaries_path, manifest, "2") == (["a.bin", "b.bin", "c.bin"], [])
+
+
+def test_the_deleted_binaries_are_removed(corpus):
+    binaries_path, manifest = corpus
+    os.remove(os.path.join(binaries_path, "a.bin"))
+    assert _plan(binaries_path, manifest) == ([], ["a.bin"])
+    assert sorted(manifest.entries(binaries_path, "signsrch")) == [os.path.join(binaries_path, name)
+                                                                  for name in ("b.bin", "c.bin")]
+    assert _plan(binaries_path, manifest) == ([], [])
+
+
+def test_the_analysers_have_their_own_entries(corpus):
+    binaries_path, manifest = corpus
+    assert manifest.entries(binaries_path, "binwalk") == {}
+    changed, _ = manifest.plan(binaries_path, find_binaries(binaries_path), "binwalk", "1", ".walkdat")
+    assert len(changed) == 3
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import zipfile
+
+import pytest
+
+from pipeline import EntropyAnalyser, StringsAnalyser, SignatureAnalyser, analyse_archives, analyse_binary, \
+    analyse_member
+
+
+def _ihex(record_type, address, data):
+    fields = bytes([len(data)]) + address.to_bytes(2, "big") + bytes([record_type]) + data
+    return b":" + (fields + bytes([-sum(fields) & 0xff])).hex().upper().encode()
+
+
+class _FailingAnalyser:
+    name = "binwalk"
+
+    def analyse(self, binary):
+        raise RuntimeError("no magic files")
+
+
+@pytest.fixture(scope="module")
+def analysers(database):
+    return [SignatureAnalyser(database), StringsAnalyser(), EntropyAnalyser()]
+
+
+def test_analyse_binary_runs_every_analyser_over_one_mapping(analysers, find_signature, tmp_path):
+    des = find_signature("DES S-boxes", "..512")
+    data = bytes(4096) + bytes(des.data) + b"\x0017.05.2019" + bytes(4096)
+    binary_path = str(tmp_path / "fw.bin")
+    with open(binary_path, "wb") as binary:
+        binary.write(data)
+    record = analyse_binary(binary_path, analysers)
+    assert (record["path"], record["size"], record["md5"], record["sha256"]) == \
+        (binary_path, len(data), hashlib.md5(data).hexdigest(), hashlib.sha256(data).hexdigest())
+    assert (4096, des.signature_id, "DES S-boxes") in \
+        [(hit["offset"], hit["signature"], hit["title"]) for hit in record["signsrch"]]
+    assert [(date["offset"], date["value"]) for date in record["strings"]] == \
+        [(4096 + len(des.data) + 1, "2019-05-17")]
+    assert record["entropy"]["padding"] == 8192
+    assert record["errors"] == {} and sorted(record["seconds"]) == ["entropy", "signsrch", "strings"]
+    assert "image" not in record
+
+
+def test_a_failing_analyser_leaves_its_error_and_the_others_run(tmp_path):
+    binary_path = str(tmp_path / "fw.bin")
+    with open(binary_path, "wb") as binary:
+        binary.write(b"17.05.2019")
+    record = analyse_binary(binary_path, [_FailingAnalyser(), StringsAnalyser()])
+    assert record["errors"] == {"binwalk": "no magic files"}
+    assert "binwalk" not in record and len(record["strings"]) == 1
+
+
+def test_the_archive_members_are_analysed_without_being_extracted(tmp_path):
+    archive_path = str(tmp_path / "fw.zip")
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("ecu/fw.bin", b"17.05.2019")
+        archive.writestr("ecu/other.bin", bytes(100))
+    results_path = str(tmp_path / "results.jsonl")
+    bins_path = str(tmp_path / "bins")
+    assert analyse_archives([archive_path], [StringsAnalyser()], results_path, keep_patterns=["*FW.BIN"],
+                            bins_path=bins_path) == 2
+    with open(results_path, encoding="utf-8") as results:
+        records = sorted((json.loads(line) for line in results), key=lambda record: record["member"])
+    assert [(record["path"], record["member"], len(record["strings"])) for record in records] == \
+        [(archive_path, "ecu/fw.bin", 1), (archive_path, "ecu/other.bin", 0)]
+    assert records[0]["sha256"] == hashlib.sha256(b"17.05.2019").hexdigest()
+    # Only the members matching a pattern are written
+    assert "extracted" not in records[1]
+    with open(records[0]["extracted"], "rb") as extracted:
+        assert extracted.read() == b"17.05.2019"
+    assert [name for _, _, names in os.walk(bins_path) for name in names] == ["fw.bin"]
+
+
+def test_the_hex_files_are_analysed_as_their_memory_image(tmp_path):
+    text = b"\r\n".join([_ihex(0x04, 0, b"\x08\x00"), _ihex(0x00, 0x0010, b"17.05.2019"), _ihex(0x01, 0, b"")])
+    binary_path = str(tmp_path / "fw.bin")
+    with open(binary_path, "wb") as binary:
+        binary.write(text + b"\r\n")
+    record = analyse_binary(binary_path, [StringsAnalyser(), EntropyAnalyser()])
+    assert record["image"] == {"format": "ihex", "size": 10,
+                               "segments": [{"offset": 0, "address": 0x08000010, "length": 10}]}
+    assert record["size"] == len(text) + 2
+    date, = record["strings"]
+    assert (date["offset"], date["address"]) == (0, 0x08000010)
+    # The file offset points at the hexadecimal digits of the first byte of the date
+    assert text[date["file_offset"]:date["file_offset"] + 2] == b"31"
+
+
+def test_a_binary_only_looking_like_hex_is_analysed_as_it_is():
+    # Only the first records are sniffed, the broken one comes after them
+    records = [_ihex(0x00, 16 * index, bytes(16)) for index in range(200)] + [b":0400000001020304F3"]
+    record = analyse_member("fw.zip", "fw.hex", b"\r\n".join(records), [StringsAnalyser()])
+    assert record["errors"].keys() == {"image"} and "image" not in record
+    assert record["strings"] == []
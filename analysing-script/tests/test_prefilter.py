@@ -0,0 +1,48 @@
+import random
+import struct
+
+import numpy
+import pytest
+
+from prefilter import collapse_runs, covered_bytes, PrefilterScanner
+
+
+@pytest.fixture(scope="module")
+def prefilter_scanner(database):
+    return PrefilterScanner(database)
+
+
+def test_covered_bytes_count_the_overlaps_once():
+    assert covered_bytes(numpy.array([0, 5, 20]), numpy.array([10, 15, 30])) == 25
+
+
+def test_collapse_runs_keep_the_single_element_runs():
+    hits = collapse_runs(numpy.array([1, 1, 1, 2, 2, 2]), numpy.array([0, 10, 20, 0, 10, 20]),
+                         numpy.array([0, 0, 0, 0, 0, 0]), numpy.array([2, 2, 2, 1, 1, 1]))
+    assert hits == {1: [(0, 0), (20, 0)], 2: [(0, 0), (10, 0), (20, 0)]}
+
+
+def test_prefilter_finds_the_hits_of_the_automaton(scanner, prefilter_scanner, find_signature):
+    randomness = random.Random(2)
+    planted = [find_signature("DES S-boxes", "..512"), find_signature("base64 decoding table", "32.le.512"),
+               find_signature("MD5 digest", "32.le.272&"), find_signature("DMC compression", "32.be.16&")]
+    parts = [b"Text like input has many short runs    and frequent bytes.\n" * 1000]
+    for signature in planted * 3:
+        parts.append(bytes(randomness.getrandbits(8) for _ in range(2000)))
+        parts.append(b"\xff" * randomness.randrange(0, 64))
+        parts.append(bytes(signature.data))
+    binary = b"".join(parts)
+
+    fallback_bytes = prefilter_scanner.fallback_bytes
+    hits = prefilter_scanner.scan(binary)
+    assert prefilter_scanner.fallback_bytes == fallback_bytes
+    assert hits == scanner.scan(binary)
+    assert set(signature.signature_id for signature in planted) <= set(hit.signature_id for hit in hits)
+
+
+def test_dense_candidates_fall_back_to_the_automaton(scanner, prefilter_scanner):
+    # Small 32 bit numbers match the anchors of many tables at almost every offset
+    binary = b"".join(struct.pack("<I", number % 64) for number in range(1 << 16))
+    fallback_bytes = prefilter_scanner.fallback_bytes
+    assert prefilter_scanner.scan(binary) == scanner.scan(binary)
+    assert prefilter_scanner.fallback_bytes == fallback_bytes + len(binary)
@@ -0,0 +1,48 @@
+import random
+import struct
+
+import numpy
+import pytest
+
+import region_map
+from region_map import find_padding, RegionMap
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(region_map, "DEFAULT_CACHE_PATH", str(tmp_path / "cache"))
+
+
+def test_find_padding_reports_the_long_runs_only():
+    buffer = b"data" + b"\xff" * 5000 + b"data" + b"\x00" * 100 + b"data" + b"\x00" * 4096
+    assert find_padding(buffer).tolist() == [[4, 5004], [5112, 9208]]
+
+
+def test_data_regions_keep_the_margin_around_the_padding():
+    padding = numpy.array([[100, 10000], [10050, 20000]], dtype=numpy.int64)
+    assert RegionMap(padding, 20100).data_regions(10) == [(0, 110), (9990, 10060), (19990, 20100)]
+
+
+def test_region_scan_finds_the_hits_of_the_full_scan(tmp_path, scanner, find_signature):
+    randomness = random.Random(0)
+    ork = find_signature("Black Hole Entertainment ORK encryption", "32.le.12&")
+    tables = [find_signature("base64 decoding table", "32.le.512"), find_signature("DES S-boxes", "..512"),
+              find_signature("libavcodec mimic vlcdec_lookup", "..576")]
+    parts = []
+    for index, table in enumerate(tables * 2):
+        padding = b"\xff" if index % 2 else b"\x00"
+        parts.append(bytes(randomness.getrandbits(8) for _ in range(3000)))
+        # The tables and the AND elements are planted right against the padding on both sides
+        parts.append(bytes(table.data))
+        parts.append(bytes(ork.data[:4]) * 3)
+        parts.append(padding * 10000)
+        parts.append(bytes(ork.data[:4]) + struct.pack("<I", index))
+    binary_path = str(tmp_path / "firmware.bin")
+    with open(binary_path, "wb") as binary:
+        binary.write(b"".join(parts))
+
+    full_hits = scanner.scan_file(binary_path, skip_padding=False)
+    region_hits = scanner.scan_file(binary_path, skip_padding=True)
+    assert region_hits == full_hits
+    assert set(table.signature_id for table in tables) <= set(hit.signature_id for hit in full_hits)
+    assert len([hit for hit in full_hits if hit.signature_id == ork.signature_id]) == 24
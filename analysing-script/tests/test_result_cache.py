@@ -0,0 +1,42 @@
+import hashlib
+
+from result_cache import ResultCache, file_digests
+
+
+def test_the_results_are_kept_per_analyser_and_version(tmp_path):
+    with ResultCache(str(tmp_path / "results.sqlite")) as cache:
+        assert cache.get("ab", "signsrch", "1") is None
+        cache.put("ab", "signsrch", "1", [[16, 641]])
+        cache.put("ab", "binwalk", "1", [])
+        assert cache.get("ab", "signsrch", "1") == [[16, 641]]
+        assert cache.get("ab", "binwalk", "1") == []
+        assert cache.get("ab", "signsrch", "2") is None
+        assert cache.get("cd", "signsrch", "1") is None
+        # A result stored again by the same version replaces the old one
+        cache.put("ab", "signsrch", "1", [[32, 641]])
+        assert cache.get("ab", "signsrch", "1") == [[32, 641]]
+        assert cache.analysers("ab") == [("binwalk", "1"), ("signsrch", "1")]
+
+
+def test_the_cache_is_shared_between_connections(tmp_path):
+    cache_path = str(tmp_path / "results.sqlite")
+    with ResultCache(cache_path) as writer, ResultCache(cache_path) as reader:
+        writer.put("ab", "signsrch", "1", [[16, 641]])
+        assert reader.get("ab", "signsrch", "1") == [[16, 641]]
+
+
+def test_the_aliases_are_recorded_once_by_absolute_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    with ResultCache("results.sqlite") as cache:
+        cache.add_alias("ab", "b.bin")
+        cache.add_alias("ab", str(tmp_path / "b.bin"))
+        cache.add_alias("ab", "a.bin")
+        assert cache.aliases("ab") == [str(tmp_path / "a.bin"), str(tmp_path / "b.bin")]
+        assert cache.aliases("cd") == []
+
+
+def test_file_digests(tmp_path):
+    for name, data in (("fw.bin", bytes(range(256)) * 10), ("empty.bin", b"")):
+        binary_path = tmp_path / name
+        binary_path.write_bytes(data)
+        assert file_digests(str(binary_path)) == (hashlib.sha256(data).hexdigest(), hashlib.md5(data).hexdigest())
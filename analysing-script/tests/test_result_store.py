@@ -0,0 +1,69 @@
+import datetime
+import os
+
+import pytest
+
+from result_store import ResultStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ResultStore(str(tmp_path / "store.sqlite")) as result_store:
+        yield result_store
+
+
+def _add(store, binary_path, hits, analyser="signsrch", sha256="ab"):
+    return store.add_scan(analyser, "1", binary_path, sha256, "cd", 1024, hits, datetime.datetime(2020, 1, 2, 3, 4, 5))
+
+
+def test_add_scan_records_the_scan_and_its_hits(store, tmp_path):
+    binary_path = str(tmp_path / "fw.bin")
+    scan_id = _add(store, binary_path, [(64, "641", "CRC32 [32.le.1024]"), (16, "1016", "AES S-box")])
+    scan, = store.latest_scans("signsrch")
+    assert (scan["scan_id"], scan["path"], scan["sha256"], scan["md5"], scan["size"], scan["scan_time"]) == \
+        (scan_id, binary_path, "ab", "cd", 1024, "2020-01-02 03:04:05")
+    assert store.hits(scan_id) == [(16, "1016", "AES S-box"), (64, "641", "CRC32 [32.le.1024]")]
+
+
+def test_only_the_latest_scan_of_a_binary_is_reported(store, tmp_path):
+    binary_path = str(tmp_path / "fw.bin")
+    _add(store, binary_path, [(16, "1016", "AES S-box")])
+    latest_id = _add(store, binary_path, [(64, "641", "CRC32")], sha256="ef")
+    _add(store, binary_path, [(0, "uImage header", "uImage header")], analyser="binwalk")
+    assert [scan["scan_id"] for scan in store.latest_scans("signsrch")] == [latest_id]
+    assert store.find_signature("signsrch", "1016") == []
+    assert store.find_signature("signsrch", "641") == [(binary_path, 64)]
+    assert store.find_signature("binwalk", "641") == []
+
+
+def test_the_deleted_binaries_are_not_reported(store, tmp_path):
+    kept_path, deleted_path = str(tmp_path / "a.bin"), str(tmp_path / "b.bin")
+    _add(store, kept_path, [(16, "1016", "AES S-box")])
+    _add(store, deleted_path, [(16, "1016", "AES S-box")])
+    store.remove_binaries("signsrch", [deleted_path])
+    assert [scan["path"] for scan in store.latest_scans("signsrch")] == [kept_path]
+    assert store.find_signature("signsrch", "1016") == [(kept_path, 16)]
+    # A binary found again is reported again
+    _add(store, deleted_path, [])
+    assert [scan["path"] for scan in store.latest_scans("signsrch")] == [kept_path, deleted_path]
+
+
+def test_latest_scans_under_a_directory(store, tmp_path):
+    inside_path = str(tmp_path / "topic" / "fw.bin")
+    _add(store, inside_path, [])
+    _add(store, str(tmp_path / "topic2" / "fw.bin"), [])
+    assert [scan["path"] for scan in store.latest_scans("signsrch", str(tmp_path / "topic"))] == [inside_path]
+
+
+def test_binary_signatures(store, tmp_path):
+    with_hits, without_hits = str(tmp_path / "a.bin"), str(tmp_path / "b.bin")
+    _add(store, with_hits, [(64, "641", "CRC32"), (128, "641", "CRC32"), (16, "1016", "AES S-box")])
+    _add(store, without_hits, [])
+    assert store.binary_signatures("signsrch") == [(with_hits, "1016", "AES S-box"), (with_hits, "641", "CRC32"),
+                                                   (without_hits, None, None)]
+
+
+def test_the_paths_are_stored_absolute(store, tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    _add(store, "fw.bin", [])
+    assert store.latest_scans("signsrch")[0]["path"] == os.path.join(str(tmp_path), "fw.bin")
@@ -0,0 +1,97 @@
+import os
+
+import numpy
+import pytest
+
+from results_history import BinwalkHistory, SignsrchHistory, StringPool, binary_signatures, binwalk_hits, \
+    find_binwalk, find_signsrch, load_results, parse_binwalk_results, parse_signsrch_results, signsrch_files
+
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "results")
+
+BINWALK_RESULTS = b"""Number of binaries: 3
+Number of binaries with signatures: 2
+
+Scan Time:     2018-03-27 19:51:36
+Target File:   C:\\bins\\a.bin
+MD5 Checksum:  f1d0545d0c4bae486900362f1e789ed4
+Signatures:    386
+DECIMAL       HEXADECIMAL     DESCRIPTION
+--------------------------------------------------------------------------------
+369710        0x5A42E         MySQL ISAM compressed data file Version 5
+400000        0x61A80         CRC32 polynomial table, little endian
+
+
+Scan Time:     2018-03-27 19:51:37
+Target File:   C:\\bins\\b\xe9.bin
+MD5 Checksum:  f67d412a4e52724848f389c97e027a9c
+Signatures:    386
+DECIMAL       HEXADECIMAL     DESCRIPTION
+--------------------------------------------------------------------------------
+16            0x10            CRC32 polynomial table, little endian
+
+"""
+
+SIGNSRCH_RESULTS = b"""Number of binaries: 5
+Number of binaries with signatures: 2
+
+641  CRC-32-IEEE 802.3 [crc32.0x04c11db7 lenorev 1.1024]: 2
+
+129  Adler CRC32 (0x191b3141) [32.le.1024]: 1
+
+129  Adler CRC32 (0x191b3141) [32.le.1024]
+C:\\bins\\a.bin
+
+641  CRC-32-IEEE 802.3 [crc32.0x04c11db7 lenorev 1.1024]
+C:\\bins\\a.bin
+C:\\bins\\b.bin ----------------->DATE= 17.05.2019 12:30
+"""
+
+
+def test_string_pool_interns_every_string_once():
+    pool = StringPool()
+    assert [pool.intern(string) for string in ("CRC32", "AES", "CRC32")] == [0, 1, 0]
+    assert len(pool) == 2 and pool[1] == "AES"
+    assert pool.find("crc").tolist() == [0] and pool.find("SHA").tolist() == []
+
+
+def test_parse_binwalk_results():
+    history = parse_binwalk_results(BINWALK_RESULTS)
+    assert (history.binaries, history.binaries_with_signatures) == (3, 2)
+    assert history.scans["scan_time"].tolist() == [numpy.datetime64("2018-03-27T19:51:36"),
+                                                   numpy.datetime64("2018-03-27T19:51:37")]
+    assert [history.paths[path] for path in history.scans["path"]] == ["C:\\bins\\a.bin", "C:\\bins\\b\xe9.bin"]
+    assert history.scans["md5"][1] == b"f67d412a4e52724848f389c97e027a9c"
+    assert history.scans["hit_count"].tolist() == [2, 1] and history.scans["first_hit"].tolist() == [0, 2]
+    assert binwalk_hits(history, 1) == [(16, "CRC32 polynomial table, little endian")]
+    # The same description is interned once
+    assert len(history.descriptions) == 2
+    assert find_binwalk(history, "crc32") == [("C:\\bins\\a.bin", 400000, "CRC32 polynomial table, little endian"),
+                                              ("C:\\bins\\b\xe9.bin", 16, "CRC32 polynomial table, little endian")]
+    assert binary_signatures(history)[0] == ("C:\\bins\\a.bin", "MySQL ISAM compressed data file Version 5",
+                                             "MySQL ISAM compressed data file Version 5")
+
+
+def test_parse_signsrch_results():
+    history = parse_signsrch_results(SIGNSRCH_RESULTS)
+    assert (history.binaries, history.binaries_with_signatures) == (5, 2)
+    assert history.signatures["id"].tolist() == [129, 641] and history.signatures["count"].tolist() == [1, 2]
+    assert signsrch_files(history, 641) == [("C:\\bins\\a.bin", ""), ("C:\\bins\\b.bin", "17.05.2019 12:30")]
+    assert signsrch_files(history, 129) == [("C:\\bins\\a.bin", "")]
+    assert signsrch_files(history, 1) == [] and signsrch_files(history, 1000) == []
+    assert find_signsrch(history, "adler") == [(129, "Adler CRC32 (0x191b3141) [32.le.1024]", "C:\\bins\\a.bin")]
+    crc32 = "CRC-32-IEEE 802.3 [crc32.0x04c11db7 lenorev 1.1024]"
+    assert binary_signatures(history)[1:] == [("C:\\bins\\a.bin", "641", crc32), ("C:\\bins\\b.bin", "641", crc32)]
+
+
+@pytest.mark.parametrize("name, history_type", [("binwalk_results.dat", BinwalkHistory),
+                                                ("signsrch_results.dat", SignsrchHistory)])
+def test_load_results_reads_the_results_files(name, history_type):
+    history = load_results(os.path.join(RESULTS_PATH, name))
+    assert isinstance(history, history_type)
+    assert history.binaries == 15576 and history.binaries_with_signatures > 0
+    if history_type is BinwalkHistory:
+        assert len(history.scans) == history.binaries_with_signatures
+        assert history.scans["hit_count"].sum() == len(history.hits)
+    else:
+        assert history.signatures["file_count"].sum() == len(history.files)
@@ -0,0 +1,46 @@
+import os
+import re
+
+import pytest
+
+from signature_database import describe, is_repeated_value_table, parse_data, REPEATED_VALUE_LENGTH
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "results",
+                            "signsrch_results.dat")
+_RESULTS_COUNT = re.compile(r"^(\d+)\s+(.*): \d+$")
+
+
+def test_ids_match_the_signsrch_results(database):
+    reported = {}
+    with open(RESULTS_FILE, "r", encoding="latin-1") as results:
+        for line in results:
+            match = _RESULTS_COUNT.match(line.rstrip("\r\n"))
+            if match:
+                reported[int(match.group(1))] = match.group(2)
+    assert len(reported) == 300
+    mismatches = dict((signature_id, (description, describe(database[signature_id])))
+                      for signature_id, description in reported.items()
+                      if describe(database[signature_id]) != description)
+    assert mismatches == {}
+
+
+def test_the_repeated_value_tables_are_skipped(database):
+    titles = set(signature.title for signature in database)
+    assert "Open H323 pwlib bv dct_basis" not in titles
+    assert "base64 decoding table" in titles
+
+
+@pytest.mark.parametrize("data, width, skipped", [
+    (b"4" * REPEATED_VALUE_LENGTH + b"data", 4, True),
+    (b"\x00" * REPEATED_VALUE_LENGTH + b"data", 4, False),
+    (b"4" * REPEATED_VALUE_LENGTH + b"data", 1, False),
+    (b"4" * (REPEATED_VALUE_LENGTH - 1) + b"data", 4, False),
+])
+def test_is_repeated_value_table(data, width, skipped):
+    assert is_repeated_value_table(data, width) == skipped
+
+
+def test_parse_data_reads_the_c_literals():
+    lines = ['{0x10, 010, 10, -1, 0ffh, 1.5f, INT_MIN,', '"ab\\n", \'c\'}']
+    assert parse_data(lines) == [16, 8, 10, -1, 255, 1.5, -0x80000000, b"ab\n", 99]
+    assert parse_data(["10 ff"], hex_numbers=True) == [16, 255]
@@ -0,0 +1,75 @@
+import random
+
+from and_matcher import AndMatcher, find_windows, split_elements
+from signature_database import AND_WINDOW, EndianEnum
+from signature_scanner import AhoCorasickAutomaton, Hit, select_key
+
+
+def _noise(length, seed=0):
+    randomness = random.Random(seed)
+    return bytes(randomness.getrandbits(8) for _ in range(length))
+
+
+def test_automaton_finds_the_overlapping_keys():
+    automaton = AhoCorasickAutomaton()
+    for key in (b"he", b"she", b"his", b"hers"):
+        automaton.add(key, key)
+    assert sorted(automaton.iter_matches(b"ushers")) == [(1, b"she"), (2, b"he"), (2, b"hers")]
+
+
+def test_select_key_avoids_the_leading_padding():
+    data = bytes(64) + bytes(range(64))
+    key_offset, key = select_key(data, 16)
+    assert key_offset == 64 and key == bytes(range(16))
+
+
+def test_scan_finds_the_tables_at_their_offset(scanner, find_signature):
+    little = find_signature("DES S-boxes", "..512")
+    big = find_signature("base64 decoding table", "32.be.512")
+    binary = _noise(1000) + bytes(little.data) + _noise(777, 1) + bytes(big.data) + _noise(1000, 2)
+    hits = [hit for hit in scanner.scan(binary) if hit.signature_id in (little.signature_id, big.signature_id)]
+    assert hits == [Hit(little.signature_id, 1000, EndianEnum.NONE),
+                    Hit(big.signature_id, 1000 + len(little.data) + 777, EndianEnum.BIG)]
+
+
+def test_and_signature_needs_every_element_within_the_window(scanner, find_signature):
+    md5 = find_signature("MD5 digest", "32.le.272&")
+    elements = split_elements(md5.data, md5.width)
+    close = b"".join(element + _noise(8, index) for index, element in enumerate(elements))
+    spread = b"".join(element + _noise(AND_WINDOW // len(elements) + 8, index) for index, element in
+                      enumerate(elements))
+    binary = _noise(500) + close + _noise(AND_WINDOW * 2, 3) + spread
+    assert [hit.offset for hit in scanner.scan(binary) if hit.signature_id == md5.signature_id] == [500]
+
+
+def test_single_element_and_signature_reports_every_hit(scanner, find_signature):
+    ork = find_signature("Black Hole Entertainment ORK encryption", "32.le.12&")
+    assert len(split_elements(ork.data, ork.width)) == 1
+    binary = bytearray(90000)
+    for offset in range(10000, 80001, 10000):
+        binary[offset:offset + 4] = ork.data[:4]
+    hits = [hit.offset for hit in scanner.scan(bytes(binary)) if hit.signature_id == ork.signature_id]
+    assert hits == list(range(10000, 80001, 10000))
+
+
+def test_find_windows_do_not_overlap():
+    hits = [(0, 0), (10, 1), (20, 0), (30, 1), (5000, 0), (9000, 1)]
+    assert find_windows(hits, 2) == [0, 20]
+    assert find_windows(hits, 2, window=5000) == [0, 20, 5000]
+
+
+def test_confirm_keeps_only_the_open_windows(database, find_signature):
+    md5 = find_signature("MD5 digest", "32.le.272&")
+    element_count = len(split_elements(md5.data, md5.width))
+    matcher = AndMatcher(database)
+    element_hits = {md5.signature_id: [(offset * 4, offset) for offset in range(element_count)] + [(10000, 0)]}
+    assert matcher.confirm(element_hits, 11000) == [(md5.signature_id, 0, md5.endian)]
+    assert element_hits == {md5.signature_id: [(10000, 0)]}
+    assert matcher.confirm(element_hits, 10000 + AND_WINDOW) == []
+    assert element_hits == {}
+
+
+def test_scan_file_of_an_empty_binary(tmp_path, scanner):
+    binary_path = str(tmp_path / "empty.bin")
+    open(binary_path, "wb").close()
+    assert scanner.scan_file(binary_path) == []
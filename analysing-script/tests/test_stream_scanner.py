@@ -0,0 +1,52 @@
+import collections
+import io
+import random
+
+import pytest
+
+from stream_scanner import chunk_size, iter_windows, stream_signatures
+
+
+def test_iter_windows_overlap_the_next_chunk():
+    windows = [(base, length, bytes(window)) for base, length, window in iter_windows(io.BytesIO(b"abcdefghij"), 4, 2)]
+    assert windows == [(0, 4, b"abcdef"), (4, 4, b"efghij"), (8, 2, b"ij")]
+
+
+def test_chunk_size_needs_room_for_the_overlap():
+    assert chunk_size(100, 20, 2) == 30
+    with pytest.raises(ValueError):
+        chunk_size(100, 100)
+
+
+@pytest.fixture(scope="module")
+def planted(find_signature):
+    randomness = random.Random(1)
+    signatures = [find_signature("DES S-boxes", "..512"), find_signature("MD5 digest", "32.le.272&"),
+                  find_signature("SHA1 / SHA0 / RIPEMD-160 initialization", "32.be.20&"),
+                  find_signature("Black Hole Entertainment ORK encryption", "32.le.12&"),
+                  find_signature("DMC compression", "32.be.16&")]
+    parts = []
+    for _ in range(40):
+        for signature in signatures:
+            parts.append(bytes(randomness.getrandbits(8) for _ in range(randomness.randrange(500, 5000))))
+            data = bytes(signature.data)
+            if not signature.is_and:
+                parts.append(data)
+                continue
+            # The elements are spread over up to 2000 bytes, so the windows cross the chunk boundaries
+            for offset in range(0, len(data), signature.width):
+                parts.append(data[offset:offset + signature.width] +
+                             bytes(randomness.randrange(0, 2000 * signature.width // len(data))))
+    return b"".join(parts), [signature for signature in signatures if signature.is_and]
+
+
+def test_stream_scan_finds_the_hits_of_the_full_scan(scanner, planted):
+    binary, planted_and = planted
+    full_hits = scanner.scan(binary)
+    # Chunks of a few kilobytes, much shorter than the binary and than the AND windows crossing them
+    stream_hits = list(stream_signatures(scanner, io.BytesIO(binary), scanner.longest_signature + 4096))
+    assert sorted(stream_hits) == sorted(full_hits)
+
+    # Every planted AND signature is found in every repeat, the single element ones at every element
+    found = collections.Counter(hit.signature_id for hit in full_hits)
+    assert [found[signature.signature_id] for signature in planted_and] == [40, 40, 120, 160]
@@ -0,0 +1,41 @@
+import datetime
+
+import pytest
+
+from strings_extractor import DateString, find_dates, find_strings, parse_date
+
+
+def test_find_strings_finds_the_ascii_and_utf16_strings():
+    # A byte followed by a zero is a UTF-16LE character, so the strings are split by other bytes
+    buffer = b"\x01ab\x02abc\x01\x01" + "ECU v1".encode("utf-16-le") + b"\x01" + "odd".encode("utf-16-le")
+    # The ASCII strings come first, then the UTF-16LE strings at even and at odd offsets
+    assert find_strings(buffer) == [(4, "abc"), (22, "odd"), (9, "ECU v1")]
+    assert find_strings(buffer, 9) == [(9, "ECU v1"), (22, "odd")]
+
+
+@pytest.mark.parametrize("text, value", [
+    ("17.05.2019", datetime.date(2019, 5, 17)),
+    ("17.05.19", datetime.date(2019, 5, 17)),
+    ("1/2/70", datetime.date(1970, 2, 1)),
+    ("29-02-2020", datetime.date(2020, 2, 29)),
+    ("12:30", datetime.time(12, 30)),
+    ("7:05 pm", datetime.time(19, 5)),
+    ("12:00:01 AM", datetime.time(0, 0, 1)),
+    ("31/12/2018 11:59:59 PM", datetime.datetime(2018, 12, 31, 23, 59, 59)),
+])
+def test_parse_date(text, value):
+    assert parse_date(text) == value
+
+
+def test_find_dates_keeps_the_strings_matching_the_expression():
+    strings = ["17.05.2019", "29.02.2019", "2019-05-17", "v1.2.3", "12:30", "12:30:00 build", "31.04.2019"]
+    buffer = b"\x00".join(text.encode() for text in strings) + b"\x01" + "01.02.2003".encode("utf-16-le")
+    assert find_dates(buffer) == [DateString(0, "17.05.2019", datetime.date(2019, 5, 17)),
+                                  DateString(buffer.index(b"12:30"), "12:30", datetime.time(12, 30)),
+                                  DateString(len(buffer) - 20, "01.02.2003", datetime.date(2003, 2, 1))]
+
+
+def test_find_dates_searches_the_regions():
+    buffer = b"17.05.2019\x00" + bytes(100) + b"18.05.2019\x00"
+    assert [date.offset for date in find_dates(buffer, [(50, len(buffer))])] == [111]
+    assert find_dates(b"") == []
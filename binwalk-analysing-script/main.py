@@ -1,55 +1,81 @@
 import sys
 import os
-import fnmatch
+import time
 import binwalk
 
-# If we have a basepath arg, good
-# Otherwise bad
-if len(sys.argv) > 2:
-    print("You cannot pass more then one argument - the base path!")
-    exit(1)
-
-# Check if a basepath is provided, or we provide a default one
-if len(sys.argv) == 2:
-    basepath = sys.argv[1]
-else:
-    basepath = r'C:\Users\Andreea Gheorghe\PycharmProjects\axb1080\data-collection-script\downloads'
-
-# Test the path for existence
-try:
-    if not os.path.exists(basepath):
-        print("Base path does not exist!")
+# The binwalk service lives with the Python analysing script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysing-script"))
+from binwalk_scanner import binwalk_module_version
+from binwalk_service import BinwalkService
+from corpus_scanner import find_binaries
+from manifest import Manifest
+from result_store import ResultStore
+
+
+# The workers of the service import this file again on Windows, so the script only runs in the main process
+if __name__ == "__main__":
+
+    # If we have a basepath arg, good
+    # Otherwise bad
+    if len(sys.argv) > 2:
+        print("You cannot pass more then one argument - the base path!")
+        exit(1)
+
+    # Check if a basepath is provided, or we provide a default one
+    if len(sys.argv) == 2:
+        basepath = sys.argv[1]
+    else:
+        basepath = r'C:\Users\Andreea Gheorghe\PycharmProjects\axb1080\data-collection-script\downloads'
+
+    # Test the path for existence
+    try:
+        if not os.path.exists(basepath):
+            print("Base path does not exist!")
+            exit(1)
+    except OSError as e:
+        print("An OS error occurred - %s" % e)
         exit(1)
-except OSError as e:
-    print("An OS error occurred - %s" % e)
-    exit(1)
-except Exception as e:
-    print("A general exception occurred - %s" % e)
-    exit(1)
-
-# Binaries with signature paths will be hold here
-binaries_with_signature = []
-binaries_analysed = 0
-
-try:
-    # Get the binaries paths
-    for root_path, dirnames, filenames in os.walk(basepath):
-        for filename in fnmatch.filter(filenames, "*.bin"):
-            # Go through all the binaries and analyse them one by one
-            binary = os.path.join(root_path, filename)
-            # Analyse each binary and log the output 1 at a time
-            print("Analysing binary %s..." % binary)
-            for binwalk_module in binwalk.scan("--log=%s.walkdat" % binary, "--verbose", binary, signature=True, quiet=True):
-                binaries_analysed = binaries_analysed + 1
-                if len(binwalk_module.results) > 0:
-                    # If the binary has signatures, append it to the list
-                    binaries_with_signature.append(binary)
-
-except OSError as e:
-    print("An OSError occurred - %s" % e)
-except binwalk.ModuleException as e:
-    print("A binwalk error courred - %s" % e)
-except Exception as e:
-    print("A general exception occurred - %s" % e)
-
-print("Done")
\ No newline at end of file
+    except Exception as e:
+        print("A general exception occurred - %s" % e)
+        exit(1)
+
+    # Binaries with signature paths will be hold here
+    binaries_with_signature = []
+    binaries_analysed = 0
+
+    try:
+        # Only the binaries added or changed since the last run are analysed
+        start = time.perf_counter()
+        binaries = find_binaries(basepath)
+        with Manifest() as manifest:
+            changed, removed = manifest.plan(basepath, binaries, "binwalk", binwalk_module_version(), ".walkdat")
+        with ResultStore() as store:
+            store.remove_binaries("binwalk", removed)
+        print("%d of %d binaries changed since the last run, %d removed" %
+              (len(changed), len(binaries), len(removed)))
+
+        if changed:
+            # The binwalk magic files are loaded once per batch of binaries, not once per binary
+            with BinwalkService() as service:
+                # Analyse each binary and log the output, the results come back in the largest first order
+                for job in service.scan(binary for _, binary in changed):
+                    print("Analysing binary %s..." % job.path)
+                    if job.error:
+                        print("An error occurred for %s - %s" % (job.path, job.error))
+                        continue
+                    print("Found %d signatures in %.3f seconds" % (job.results, job.seconds))
+                    binaries_analysed = binaries_analysed + 1
+                    if job.results > 0:
+                        # If the binary has signatures, append it to the list
+                        binaries_with_signature.append(job.path)
+        print("Analysed %d binaries in %.2f seconds, %d with signatures" %
+              (binaries_analysed, time.perf_counter() - start, len(binaries_with_signature)))
+
+    except OSError as e:
+        print("An OSError occurred - %s" % e)
+    except binwalk.ModuleException as e:
+        print("A binwalk error courred - %s" % e)
+    except Exception as e:
+        print("A general exception occurred - %s" % e)
+
+    print("Done")